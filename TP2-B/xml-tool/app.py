@@ -1,55 +1,84 @@
-from flask import Flask, request, render_template, redirect, jsonify
+from flask import Flask, Response, g, request, render_template, redirect, jsonify
 from pathlib import Path
 from werkzeug.utils import secure_filename
 import os
-import xmlrpc.client
+import time
+import compressed
+import instrumentation
+from catalog import FileCatalog
+from rpc_client import get_client
+from uploads import UploadError, UploadStore
 
 app = Flask(__name__)
 
 DATAFOLDER = Path("/data/shared").resolve()
 DATAFOLDER.mkdir(parents=True, exist_ok=True)
 
-def listcsvfiles():
-    try:
-        return sorted([p.name for p in DATAFOLDER.glob("*.csv") if p.is_file()])
-    except Exception:
-        return []
+# Cached listing of the shared folder; routes render from it instead of globbing
+catalog = FileCatalog(DATAFOLDER, poll_interval=float(os.environ.get("CATALOG_POLL_INTERVAL", 2)))
+uploads = UploadStore(DATAFOLDER)
 
-def list_xml_xsd_pairs():
-    try:
-        xml_files = [p for p in DATAFOLDER.glob("*.xml") if p.is_file()]
-        pairs = []
-        for xml in xml_files:
-            xsd = DATAFOLDER / f"{xml.stem}.xsd"
-            if xsd.exists():
-                pairs.append((xml.name, xsd.name))
-        return sorted(pairs)
-    except Exception:
-        return []
-    
-@app.route("/", methods=["GET", "POST"])
-def index():
+instrumentation.configure("xml-tool")
+
+@app.before_request
+def metrics_start():
+    # Labelled by route pattern (e.g. /jobs/<job_id>), not by concrete URL
+    name = request.url_rule.rule if request.url_rule else "unmatched"
+    g.metrics = (name, time.perf_counter())
+    instrumentation.IN_FLIGHT.labels(instrumentation.SERVICE, "route", name).inc()
+
+@app.after_request
+def metrics_status(response):
+    if response.status_code >= 400 and "metrics" in g:
+        instrumentation.count_error("route", g.metrics[0], f"http_{response.status_code}")
+    return response
+
+@app.teardown_request
+def metrics_end(error=None):
+    name, started = g.pop("metrics", (None, None))
+    if name is None:
+        return
+    instrumentation.observe("route", name, time.perf_counter() - started,
+                            type(error).__name__ if error is not None else None)
+    instrumentation.IN_FLIGHT.labels(instrumentation.SERVICE, "route", name).dec()
+
+@app.route("/metrics")
+def metrics():
+    body, content_type = instrumentation.render()
+    return Response(body, content_type=content_type)
+
+@app.route("/debug/profile", methods=["GET"], defaults={"action": ""})
+@app.route("/debug/profile/<action>", methods=["GET", "POST"])
+def debug_profile(action):
+    """Sampling profiler of this process; see instrumentation.profile_request."""
+    status, body = instrumentation.profile_request(
+        request.method, action, request.args, request.headers.get(instrumentation.PROFILER_TOKEN_HEADER))
+    return Response(body, status=status, content_type="text/plain; charset=utf-8")
+
+def render_page(status=200, **context):
+    """Render the tool page with the file listings from the catalog."""
     return render_template(
         "xml_tool.html",
         page="xml_tool",
-        csv_files=listcsvfiles(),
-        xml_xsd_pairs=list_xml_xsd_pairs(),
-        db_collections=get_db_collections()
-    )
+        csv_files=catalog.csv_files(),
+        xml_xsd_pairs=catalog.xml_xsd_pairs(),
+        db_collections=get_db_collections(),
+        **context
+    ), status
+
+@app.route("/", methods=["GET", "POST"])
+def index():
+    return render_page()
 
 @app.route("/rpc_generate_xml", methods=["POST"])
 def rpc_generate_xml():
     """Generate XML for a CSV using remote XML-RPC service."""
     csv_name = request.form.get("csv_name")
     if not csv_name:
-        return render_template(
-            "xml_tool.html", page="xml_tool", error="No CSV filename provided.", csv_files=listcsvfiles(),xml_xsd_pairs=list_xml_xsd_pairs(),db_collections=get_db_collections(),
-        ), 400
+        return render_page(400, error="No CSV filename provided.")
     filename = secure_filename(csv_name)
-    if not filename.lower().endswith('.csv'):
-        return render_template(
-            "xml_tool.html", page="xml_tool", error="Invalid CSV filename.", csv_files=listcsvfiles(),xml_xsd_pairs=list_xml_xsd_pairs(),db_collections=get_db_collections()
-        ), 400
+    if not compressed.has_extension(filename, '.csv'):
+        return render_page(400, error="Invalid CSV filename.")
     # Optional: quickly verify local existence (may not exist if volume not shared but keep soft check)
     local_file = DATAFOLDER / filename
     if not local_file.exists():
@@ -57,41 +86,34 @@ def rpc_generate_xml():
         missing_note = f"(local copy missing)"
     else:
         missing_note = ""
-    server_url = os.environ.get("XMLRPC_SERVER_URL", "http://xmlrpc-server:8000")
     try:
-        proxy = xmlrpc.client.ServerProxy(server_url, allow_none=True)
-        proxy.csv_to_xml(filename)
-        
+        job_id = get_client().submit_job("csv_to_xml", [filename])
     except Exception as e:
-        return render_template(
-            "xml_tool.html", page="xml_tool", error=f"RPC error: {e}", csv_files=listcsvfiles(),xml_xsd_pairs=list_xml_xsd_pairs(),db_collections=get_db_collections()
-        ), 500
-    xml_filename = filename.rsplit('.', 1)[0] + '.xml'
-    xsd_filename = filename.rsplit('.', 1)[0] + '.xsd'
-    return render_template(
-        "xml_tool.html",
-        page="xml_tool",
-        message=f"XML generation requested for '{filename}' {missing_note}. '{xml_filename}' and '{xsd_filename}' generated.",
-        success=True,
-        csv_files=listcsvfiles(),
-        xml_xsd_pairs = list_xml_xsd_pairs(),
-        db_collections=get_db_collections(),
-    ), 200
+        return render_page(500, error=f"RPC error: {e}")
+    return render_page(202, message=f"XML generation started for '{filename}' {missing_note}.", job_id=job_id)
 
-@app.route("/convert", methods=["POST"])
-def convert():
-    uploaded_file = request.files.get("csvfile")
-    if not uploaded_file or uploaded_file.filename == "":
-        return jsonify(error="No CSV file uploaded."), 400
+@app.route("/rpc_generate_xml_all", methods=["POST"])
+def rpc_generate_xml_all():
+    """Convert every CSV in the shared folder in one batch job; files whose
+    XML/XSD are already newer than the CSV are skipped by the server."""
+    force = request.form.get("force") == "1"
+    try:
+        job_id = get_client().submit_job("csv_to_xml_many", ["*.csv", force])
+    except Exception as e:
+        return render_page(500, error=f"RPC error: {e}")
+    return render_page(202, message="Converting all CSV files.", job_id=job_id)
 
-    original_name = secure_filename(uploaded_file.filename) or "upload.csv"
-    if not original_name.lower().endswith(".csv"):
+def unique_csv_path(filename):
+    """Free path in DATAFOLDER for an uploaded CSV (name_1.csv, name_2.csv, ...).
+    Compressed CSVs keep their codec suffix (name_1.csv.gz) and are stored as is."""
+    original_name = secure_filename(filename or "") or "upload.csv"
+    if not compressed.has_extension(original_name, ".csv"):
         original_name += ".csv"
 
     target_path = DATAFOLDER / original_name
     if target_path.exists():
-        stem = target_path.stem
-        suffix = target_path.suffix  # .csv
+        stem = compressed.stem(original_name)
+        suffix = original_name[len(stem):]  # .csv, .csv.gz, .csv.zst
         counter = 1
         while True:
             candidate = DATAFOLDER / f"{stem}_{counter}{suffix}"
@@ -99,29 +121,74 @@ def convert():
                 target_path = candidate
                 break
             counter += 1
+    return target_path
+
+@app.route("/convert", methods=["POST"])
+def convert():
+    uploaded_file = request.files.get("csvfile")
+    if not uploaded_file or uploaded_file.filename == "":
+        return jsonify(error="No CSV file uploaded."), 400
+
+    target_path = unique_csv_path(uploaded_file.filename)
 
     try:
         uploaded_file.save(target_path)
     except Exception as e:
-        return render_template(
-            "xml_tool.html",
-            page="xml_tool",
-            message=f"Failed to save file: {e}",
-            success=False,
-            csv_files=listcsvfiles(),
-            xml_xsd_pairs = list_xml_xsd_pairs(),
-            db_collections=get_db_collections(),
-        ), 400
-            
-    return render_template(
-        "xml_tool.html",
-        page="xml_tool",
-        message="CSV uploaded successfully",
-        success=True,
-        csv_files=listcsvfiles(),
-        xml_xsd_pairs=list_xml_xsd_pairs(),
-        db_collections=get_db_collections(),
-    ), 200
+        return render_page(400, message=f"Failed to save file: {e}", success=False)
+    catalog.refresh()
+
+    return render_page(200, message="CSV uploaded successfully", success=True)
+
+# Resumable uploads: POST /uploads to start, PUT /uploads/<id>?offset=N with
+# raw bytes for each chunk (GET /uploads/<id> gives the offset to resume from),
+# then POST /uploads/<id>/complete to check the checksum and publish the file.
+
+@app.errorhandler(UploadError)
+def upload_error(e):
+    return jsonify(error=str(e), **e.extra), e.status
+
+@app.route("/uploads", methods=["POST"])
+def upload_create():
+    body = request.get_json(silent=True) or {}
+    if not body.get("filename"):
+        return jsonify(error="Missing filename."), 400
+    size = body.get("size")
+    if size is not None and (not isinstance(size, int) or size < 0):
+        return jsonify(error="Invalid size."), 400
+    upload = uploads.create(body["filename"], size=size, sha256=body.get("sha256"),
+                            convert=bool(body.get("convert")))
+    return jsonify(upload), 201
+
+@app.route("/uploads/<upload_id>", methods=["GET"])
+def upload_status(upload_id):
+    return jsonify(uploads.status(upload_id))
+
+@app.route("/uploads/<upload_id>", methods=["PUT"])
+def upload_chunk(upload_id):
+    try:
+        offset = int(request.args.get("offset", request.headers.get("Upload-Offset", "")))
+    except ValueError:
+        return jsonify(error="Missing or invalid offset."), 400
+    # request.stream is read as it arrives, without Werkzeug spooling it first
+    end = uploads.write(upload_id, offset, request.stream)
+    return jsonify(id=upload_id, offset=end)
+
+@app.route("/uploads/<upload_id>", methods=["DELETE"])
+def upload_abort(upload_id):
+    uploads.abort(upload_id)
+    return "", 204
+
+@app.route("/uploads/<upload_id>/complete", methods=["POST"])
+def upload_complete(upload_id):
+    body = request.get_json(silent=True) or {}
+    upload = uploads.complete(upload_id, unique_csv_path, sha256=body.get("sha256"))
+    catalog.refresh()
+    if upload["convert"] or body.get("convert"):
+        try:
+            upload["job_id"] = get_client().submit_job("csv_to_xml", [upload["filename"]])
+        except Exception as e:
+            upload["convert_error"] = f"RPC error: {e}"
+    return jsonify(upload)
 
 @app.route("/rpc_validate", methods=["POST"])
 def rpc_validate():
@@ -129,94 +196,128 @@ def rpc_validate():
     xml_name = request.form.get("xml_name")
     xsd_name = request.form.get("xsd_name")
     if not xml_name or not xsd_name:
-        return render_template(
-            "xml_tool.html",
-            page="xml_tool",
-            error="Missing XML or XSD filename.",
-            csv_files=listcsvfiles(),
-            xml_xsd_pairs=list_xml_xsd_pairs(),
-            db_collections=get_db_collections(),
-        ), 400
-    server_url = os.environ.get("XMLRPC_SERVER_URL", "http://xmlrpc-server:8000")
+        return render_page(400, error="Missing XML or XSD filename.")
     try:
-        proxy = xmlrpc.client.ServerProxy(server_url, allow_none=True)
-        result = proxy.validate_xml(xml_name, xsd_name)
+        options = {"mode": request.form.get("mode", "collect_all"), "max_errors": 50}
+        job_id = get_client().submit_job("validate_xml_report", [xml_name, xsd_name, options])
     except Exception as e:
-        return render_template(
-            "xml_tool.html",
-            page="xml_tool",
-            error=f"RPC error: {e}",
-            csv_files=listcsvfiles(),
-            xml_xsd_pairs=list_xml_xsd_pairs(),
-            db_collections=get_db_collections(),
-        ), 500
-    success = result.startswith("XML é válido") or result == "VALID"
-    return render_template(
-        "xml_tool.html",
-        page="xml_tool",
-        message=result,
-        success=success,
-        csv_files=listcsvfiles(),
-        xml_xsd_pairs=list_xml_xsd_pairs(),
-        db_collections=get_db_collections(),
-    ), 200 if success else 400
+        return render_page(500, error=f"RPC error: {e}")
+    return render_page(202, message=f"Validating '{xml_name}' against '{xsd_name}'.", job_id=job_id)
     
 @app.route("/rpc_process_xml", methods=["POST"])
 def send_to_db():
     xml_name = request.form.get("xml_name")
-    server_url = request.form.get("server_url") or "http://xmlrpc-server:8000"
 
     try:
-        proxy = xmlrpc.client.ServerProxy(server_url, allow_none=True)
-        result = proxy.process_xml(xml_name)
-        return render_template(
-            "xml_tool.html",
-            page="xml_tool",
-            message=result,
-            success=True,
-            csv_files=listcsvfiles(),
-            xml_xsd_pairs=list_xml_xsd_pairs(),
-            db_collections=get_db_collections(),
-        ), 200
+        # Same server as every other job, so /jobs/<id> polls the one that has it
+        if request.form.get("mode") == "incremental":
+            # Deterministic IDs: only new or changed records are written
+            job_id = get_client().submit_job(
+                "process_xml_incremental", [xml_name, request.form.get("key", "").strip()])
+        else:
+            job_id = get_client().submit_job("process_xml", [xml_name])
+        return render_page(202, message=f"Sending '{xml_name}' to the database.", job_id=job_id)
     except Exception as e:
-        return render_template(
-            "xml_tool.html",
-            page="xml_tool",
-            error= f"Failed to send XML to XML-RPC server: {e}",
-            csv_files=listcsvfiles(),
-            xml_xsd_pairs=list_xml_xsd_pairs(),
-            db_collections=get_db_collections(),
-        ), 500
+        return render_page(500, error= f"Failed to send XML to XML-RPC server: {e}")
 
-def get_db_collections():
-    server_url = os.environ.get("XMLRPC_SERVER_URL", "http://xmlrpc-server:8000")
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    """Progress of a job, polled by the page while it runs."""
     try:
-        proxy = xmlrpc.client.ServerProxy(server_url, allow_none=True)
-        cols = proxy.get_collections()
-        return cols if isinstance(cols, list) else []
-    except Exception:
-        return []
+        status = get_client().call("job_status", job_id, timeout=5)
+    except Exception as e:
+        return jsonify(error=f"RPC error: {e}"), 502
+    if not isinstance(status, dict):
+        return jsonify(error=status), 404
+    if status["kind"].startswith("process_xml") and status["state"] == "done":
+        # A finished ingestion may have created a new collection
+        get_client().invalidate_collections()
+    if status["kind"] == "csv_to_xml_many":
+        # Files finished since the last poll (the page sends the last seq seen)
+        try:
+            items = get_client().call("job_items", job_id, request.args.get("after", 0, type=int), timeout=5)
+        except Exception as e:
+            return jsonify(error=f"RPC error: {e}"), 502
+        if isinstance(items, dict):
+            status.update(items=items["items"], next=items["next"])
+    return jsonify(status)
+
+def describe_job_result(job):
+    """Turn a finished job into the (message, success, details) shown on the page."""
+    result = job.get("result", job.get("error", ""))
+    if job["kind"] in ("process_xml", "process_xml_incremental"):
+        # On success the server returns a dict with counts and timings
+        message = result["message"] if isinstance(result, dict) else result
+        return message, job["state"] == "done", []
+    if job["kind"] == "validate_xml_report" and isinstance(result, dict):
+        if result["valid"]:
+            return (f"XML is valid against the XSD ({result['records']} records checked "
+                    f"in {result['elapsed']:.2f}s)."), True, []
+        details = [
+            f"line {e['line']}, column {e['column']}{' (' + e['path'] + ')' if e['path'] else ''}: {e['message']}"
+            for e in result["errors"]
+        ]
+        more = "+" if not result["complete"] else ""
+        return (f"{result['error_count']}{more} validation error(s) in {result['records']} records "
+                f"checked ({result['elapsed']:.2f}s)."), False, details
+    if job["kind"] == "validate_xml":
+        return result, result.startswith("XML é válido") or result == "VALID", []
+    if job["kind"] == "csv_to_xml_many" and isinstance(result, dict):
+        details = [f"{f['name']}: {f['error']}" for f in result["failed"]]
+        message = (f"{len(result['converted'])} CSV file(s) converted, {len(result['skipped'])} already "
+                   f"up to date, {len(result['failed'])} failed ({result['elapsed']:.2f}s).")
+        return message, not result["failed"], details
+    if job["kind"] == "csv_to_xml" and job["state"] == "done":
+        csv_name = job["args"][0]
+        stem = compressed.stem(csv_name)
+        # The XML is compressed like its CSV unless the server sets XML_COMPRESSION
+        return f"'{stem}.xml{compressed.codec(csv_name)}' and '{stem}.xsd' generated.", True, []
+    return result, job["state"] == "done", []
+
+def record_job_outcome(job, success):
+    """Remember conversion/validation outcomes so the listings can show them."""
+    if job["kind"] == "csv_to_xml":
+        catalog.record_conversion(job["args"][0], success)
+    elif job["kind"] == "csv_to_xml_many" and isinstance(job.get("result"), dict):
+        outcomes = dict.fromkeys(job["result"]["converted"], True)
+        outcomes.update((f["name"], False) for f in job["result"]["failed"])
+        catalog.record_conversions(outcomes)
+    elif job["kind"].startswith("process_xml"):
+        get_client().invalidate_collections()
+    elif job["kind"] == "validate_xml_report" and isinstance(job.get("result"), dict):
+        result = job["result"]
+        catalog.record_validation(result["xml"], result["valid"], result["error_count"])
+
+@app.route("/jobs/<job_id>/done")
+def job_done(job_id):
+    """Render the outcome of a finished job with freshly listed files."""
+    try:
+        job = get_client().call("job_result", job_id)
+    except Exception as e:
+        return render_page(500, error=f"RPC error: {e}")
+    if not isinstance(job, dict):
+        return render_page(404, error=job)
+    message, success, details = describe_job_result(job)
+    record_job_outcome(job, success)
+    if success:
+        return render_page(200, message=message, success=True)
+    return render_page(400, error=message or f"Job {job['state']}", details=details)
+
+def get_db_collections():
+    return get_client().get_collections()
 
 @app.route("/remove_csv", methods=["POST"])
 def remove_csv():
     csv_name = request.form.get("csv_name")
     target = DATAFOLDER / csv_name if csv_name else None
     if not target or not target.exists():
-        return render_template(
-            "xml_tool.html", page="xml_tool", error="CSV not found.",
-            csv_files=listcsvfiles(), xml_xsd_pairs=list_xml_xsd_pairs(), db_collections=get_db_collections()
-        ), 404
+        return render_page(404, error="CSV not found.")
     try:
         target.unlink()
     except Exception as e:
-        return render_template(
-            "xml_tool.html", page="xml_tool", error=f"Error removing CSV: {e}",
-            csv_files=listcsvfiles(), xml_xsd_pairs=list_xml_xsd_pairs(), db_collections=get_db_collections()
-        ), 500
-    return render_template(
-        "xml_tool.html", page="xml_tool", message=f"Removed {csv_name}", success=True,
-        csv_files=listcsvfiles(), xml_xsd_pairs=list_xml_xsd_pairs(), db_collections=get_db_collections()
-    ), 200
+        return render_page(500, error=f"Error removing CSV: {e}")
+    catalog.refresh()
+    return render_page(200, message=f"Removed {csv_name}", success=True)
 
 @app.route("/remove_xml_xsd", methods=["POST"])
 def remove_xml_xsd():
@@ -225,10 +326,7 @@ def remove_xml_xsd():
     xml_path = DATAFOLDER / xml_name if xml_name else None
     xsd_path = DATAFOLDER / xsd_name if xsd_name else None
     if not xml_path or not xsd_path:
-        return render_template(
-            "xml_tool.html", page="xml_tool", error="Missing filenames.",
-            csv_files=listcsvfiles(), xml_xsd_pairs=list_xml_xsd_pairs(), db_collections=get_db_collections()
-        ), 400
+        return render_page(400, error="Missing filenames.")
     removed_any = False
     try:
         if xml_path.exists():
@@ -237,20 +335,14 @@ def remove_xml_xsd():
         if xsd_path.exists():
             xsd_path.unlink()
             removed_any = True
+        # Columnar copy of the records written next to the XML by csv_to_xml
+        (DATAFOLDER / (compressed.stem(xml_path) + ".arrow")).unlink(missing_ok=True)
     except Exception as e:
-        return render_template(
-            "xml_tool.html", page="xml_tool", error=f"Error removing files: {e}",
-            csv_files=listcsvfiles(), xml_xsd_pairs=list_xml_xsd_pairs(), db_collections=get_db_collections()
-        ), 500
+        return render_page(500, error=f"Error removing files: {e}")
+    catalog.refresh()
     if not removed_any:
-        return render_template(
-            "xml_tool.html", page="xml_tool", error="Files not found.",
-            csv_files=listcsvfiles(), xml_xsd_pairs=list_xml_xsd_pairs(), db_collections=get_db_collections()
-        ), 404
-    return render_template(
-        "xml_tool.html", page="xml_tool", message=f"Removed {xml_name} and {xsd_name}", success=True,
-        csv_files=listcsvfiles(), xml_xsd_pairs=list_xml_xsd_pairs(), db_collections=get_db_collections()
-    ), 200
+        return render_page(404, error="Files not found.")
+    return render_page(200, message=f"Removed {xml_name} and {xsd_name}", success=True)
 
 @app.route("/xmltool")
 def xml_tool_redirect():
@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+
+import compressed
+
+
+class FileCatalog:
+    """In-memory index of the shared data folder.
+
+    A background thread rescans the folder every ``poll_interval`` seconds
+    (one ``os.scandir`` pass) and swaps in freshly built listings, so page
+    renders just read precomputed lists instead of globbing and stat-ing every
+    file. Routes that change the folder call ``refresh()`` to see the change
+    immediately. Row counts are computed in the background thread only, and
+    only again when a file's size or mtime changes.
+
+    Compressed files (``.csv.gz``, ``.xml.zst``, ...) are listed like plain
+    ones: a compressed XML pairs with the plain XSD of the same stem.
+    """
+
+    def __init__(self, folder, poll_interval=2.0):
+        self.folder = folder
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._thread = None
+        self._entries = {}
+        self._csv_files = []
+        self._pairs = []
+        self._conversions = {}
+        self._validations = {}
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._poll, name="file-catalog", daemon=True)
+        self.refresh()
+        self._thread.start()
+
+    def _poll(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.refresh(count_rows=True)
+            except Exception:
+                pass
+
+    def refresh(self, count_rows=False):
+        """Rescan the folder and rebuild the listings."""
+        entries = {}
+        with os.scandir(self.folder) as it:
+            for d in it:
+                if not d.is_file() or d.name.startswith("."):
+                    continue
+                st = d.stat()
+                entry = {"name": d.name, "size": st.st_size, "mtime": st.st_mtime, "rows": None}
+                old = self._entries.get(d.name)
+                if old is not None and old["size"] == st.st_size and old["mtime"] == st.st_mtime:
+                    entry["rows"] = old["rows"]
+                if entry["rows"] is None and count_rows and compressed.has_extension(d.name, ".csv"):
+                    entry["rows"] = _count_csv_rows(d.path)
+                entries[d.name] = entry
+
+        csv_files = sorted(n for n in entries if compressed.has_extension(n, ".csv"))
+        pairs = []
+        for name in entries:
+            if compressed.base_name(name).endswith(".xml"):
+                xsd = compressed.stem(name) + ".xsd"
+                if xsd in entries:
+                    pairs.append((name, xsd))
+        pairs.sort()
+
+        with self._lock:
+            self._entries = entries
+            self._csv_files = [self._csv_view(n) for n in csv_files]
+            self._pairs = [self._pair_view(x, s) for x, s in pairs]
+
+    def _csv_view(self, name):
+        entry = dict(self._entries[name])
+        entry["conversion"] = self._conversions.get(name)
+        return entry
+
+    def _pair_view(self, xml, xsd):
+        entry = self._entries[xml]
+        validation = self._validations.get(xml)
+        # A validation only counts for the XML it was run against
+        if validation is not None and validation["mtime"] != entry["mtime"]:
+            validation = None
+        return {"xml": xml, "xsd": xsd, "size": entry["size"], "mtime": entry["mtime"],
+                "validation": validation}
+
+    def csv_files(self):
+        self.start()
+        return self._csv_files
+
+    def xml_xsd_pairs(self):
+        self.start()
+        return self._pairs
+
+    def entry(self, name):
+        self.start()
+        return self._entries.get(name)
+
+    def record_conversion(self, csv_name, ok):
+        self.record_conversions({csv_name: ok})
+
+    def record_conversions(self, outcomes):
+        """``{csv_name: ok}`` for several files at once (one refresh)."""
+        now = time.time()
+        with self._lock:
+            for csv_name, ok in outcomes.items():
+                self._conversions[csv_name] = {"ok": ok, "time": now}
+        self.refresh()
+
+    def record_validation(self, xml_name, valid, error_count):
+        entry = self._entries.get(xml_name)
+        with self._lock:
+            self._validations[xml_name] = {
+                "valid": valid,
+                "error_count": error_count,
+                "time": time.time(),
+                "mtime": entry["mtime"] if entry else None,
+            }
+            self._pairs = [self._pair_view(p["xml"], p["xsd"]) for p in self._pairs]
+
+
+def _count_csv_rows(path, block_size=1 << 20):
+    """Data rows in a CSV (newline count minus the header; quoted newlines
+    inside fields are counted too, so this is an estimate for such files)."""
+    if compressed.codec(path) and not compressed.available(compressed.codec(path)):
+        return None
+    lines = 0
+    last = b"\n"
+    with compressed.open_read(path) as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            lines += block.count(b"\n")
+            last = block[-1:]
+    if last != b"\n":
+        lines += 1
+    return max(lines - 1, 0)
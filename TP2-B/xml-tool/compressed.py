@@ -0,0 +1,168 @@
+"""Transparent gzip/zstd file I/O for the shared data folder.
+
+Each service folder is its own Docker build context, so this file is copied
+into each of them (like instrumentation.py); keep the copies identical.
+
+A compressed file keeps its logical name plus the codec suffix
+(``vendas.csv.gz``, ``vendas.xml.zst``). ``open_read``/``open_write`` return
+binary streams that (de)compress on the fly, so callers stream through them
+exactly as through a plain file; ``position()`` gives the bytes consumed from
+the file on disk, for progress against ``st_size``.
+
+gzip is always available. zstd uses ``compression.zstd`` (Python 3.14+) or
+the ``zstandard`` package; without either, ``.zst`` files raise
+``CompressionUnavailable``.
+"""
+import gzip
+import io
+import os
+from pathlib import Path
+
+CODECS = (".gz", ".zst")
+_ALIASES = {"gz": ".gz", "gzip": ".gz", "zst": ".zst", "zstd": ".zst"}
+_LEVELS = {".gz": 6, ".zst": 3}
+BUFFER_SIZE = 1 << 20
+
+
+class CompressionUnavailable(RuntimeError):
+    pass
+
+
+def codec(path):
+    """``".gz"``, ``".zst"`` or ``""`` for a plain file."""
+    suffix = Path(path).suffix.lower()
+    return suffix if suffix in CODECS else ""
+
+
+def base_name(path):
+    """Logical name without the codec suffix (``a.xml.gz`` -> ``a.xml``)."""
+    name = Path(path).name
+    suffix = codec(name)
+    return name[:-len(suffix)] if suffix else name
+
+
+def stem(path):
+    """``a.xml.gz`` -> ``a``."""
+    return Path(base_name(path)).stem
+
+
+def has_extension(path, extension):
+    """``has_extension("a.csv.zst", ".csv")`` -> True."""
+    return base_name(path).lower().endswith(extension)
+
+
+def variants(folder, name):
+    """Existing files for logical ``name`` in ``folder`` (plain first)."""
+    folder = Path(folder)
+    return [folder / (name + c) for c in ("", *CODECS) if (folder / (name + c)).is_file()]
+
+
+def parse_codec(value):
+    """``"gz"``/``"gzip"`` -> ``".gz"``, ``"zst"``/``"zstd"`` -> ``".zst"``,
+    ``""``/``"none"`` -> ``""``."""
+    value = (value or "").strip().lower()
+    if value in ("", "none", "off"):
+        return ""
+    if value.lstrip(".") not in _ALIASES:
+        raise ValueError(f"unknown compression '{value}' (none, gz or zst)")
+    return _ALIASES[value.lstrip(".")]
+
+
+def _zstd():
+    try:
+        from compression import zstd
+        return "stdlib", zstd
+    except ImportError:
+        pass
+    try:
+        import zstandard
+        return "zstandard", zstandard
+    except ImportError:
+        raise CompressionUnavailable("zstd support needs Python 3.14+ or the 'zstandard' package") from None
+
+
+def available(suffix):
+    if suffix != ".zst":
+        return True
+    try:
+        _zstd()
+    except CompressionUnavailable:
+        return False
+    return True
+
+
+class _Decompressing(io.RawIOBase):
+    """Raw stream over a decompressor that also knows how far into the file
+    on disk it has read."""
+
+    def __init__(self, raw, stream):
+        self._raw = raw
+        self._stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        return self._stream.readinto(b)
+
+    def source_tell(self):
+        return self._raw.tell()
+
+    def close(self):
+        if not self.closed:
+            try:
+                self._stream.close()
+            finally:
+                self._raw.close()
+                super().close()
+
+
+def open_read(path):
+    """Binary stream of the (decompressed) contents of ``path``."""
+    suffix = codec(path)
+    if not suffix:
+        return open(path, "rb", buffering=BUFFER_SIZE)
+    raw = open(path, "rb")
+    try:
+        if suffix == ".gz":
+            stream = gzip.GzipFile(fileobj=raw, mode="rb")
+        else:
+            kind, zstd = _zstd()
+            if kind == "stdlib":
+                stream = zstd.ZstdFile(raw, "rb")
+            else:
+                stream = zstd.ZstdDecompressor().stream_reader(raw, read_size=BUFFER_SIZE,
+                                                               read_across_frames=True)
+    except BaseException:
+        raw.close()
+        raise
+    return io.BufferedReader(_Decompressing(raw, stream), buffer_size=BUFFER_SIZE)
+
+
+def open_text(path, encoding="utf-8", newline=None):
+    return io.TextIOWrapper(open_read(path), encoding=encoding, newline=newline)
+
+
+def open_write(path, level=None, suffix=None):
+    """Binary stream that writes ``path``, compressed according to its suffix
+    (or ``suffix``, e.g. for a temporary file that is renamed afterwards).
+    ``level`` defaults to COMPRESSION_LEVEL or the codec's default."""
+    suffix = codec(path) if suffix is None else suffix
+    if not suffix:
+        return open(path, "wb", buffering=BUFFER_SIZE)
+    level = int(level or os.environ.get("COMPRESSION_LEVEL") or _LEVELS[suffix])
+    if suffix == ".gz":
+        return io.BufferedWriter(gzip.GzipFile(path, "wb", compresslevel=level), buffer_size=BUFFER_SIZE)
+    kind, zstd = _zstd()
+    if kind == "stdlib":
+        return io.BufferedWriter(zstd.ZstdFile(path, "wb", level=level), buffer_size=BUFFER_SIZE)
+    return zstd.ZstdCompressor(level=level).stream_writer(open(path, "wb"), write_size=BUFFER_SIZE)
+
+
+def position(fh):
+    """Bytes of the file on disk consumed so far by a stream from
+    ``open_read`` (or any plain binary file)."""
+    raw = getattr(fh, "raw", None)
+    if isinstance(raw, _Decompressing):
+        return raw.source_tell()
+    return fh.tell()
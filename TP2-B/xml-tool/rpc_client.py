@@ -0,0 +1,130 @@
+import os
+import queue
+import threading
+import time
+import xmlrpc.client
+
+import instrumentation
+
+DEFAULT_URL = "http://xmlrpc-server:8000"
+
+
+class TimeoutTransport(xmlrpc.client.Transport):
+    """Transport with a socket timeout that can be changed between calls.
+
+    The stock Transport already keeps its HTTP connection open when the server
+    speaks HTTP/1.1; this one just makes sure every call, on a new or reused
+    connection, runs with the current ``timeout``.
+    """
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def make_connection(self, host):
+        conn = super().make_connection(host)
+        conn.timeout = self.timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(self.timeout)
+        return conn
+
+
+class RpcClient:
+    """Shared access to one XML-RPC server.
+
+    ServerProxy objects are not thread-safe, so each call checks a proxy (and
+    its keep-alive connection) out of a pool of at most ``pool_size`` and
+    returns it when done; when all are busy the call waits for one. The pool
+    is LIFO, so the connections in use stay warm and the extra ones left idle
+    are closed by the server's keep-alive timeout. ``get_collections`` is
+    memoized for ``collections_ttl`` seconds so page renders don't hit
+    Firestore.
+    """
+
+    def __init__(self, url, timeout=10.0, collections_ttl=30.0, pool_size=8):
+        self.url = url
+        self.timeout = timeout
+        self.collections_ttl = collections_ttl
+        self.pool_size = max(1, int(pool_size))
+        self._pool = queue.LifoQueue(maxsize=self.pool_size)
+        self._created = 0
+        self._pool_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._collections = None
+        self._collections_at = 0.0
+
+    def _checkout(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        with self._pool_lock:
+            if self._created < self.pool_size:
+                self._created += 1
+                transport = TimeoutTransport(self.timeout)
+                return xmlrpc.client.ServerProxy(self.url, transport=transport, allow_none=True), transport
+        # Every call holding one is bounded by its socket timeout
+        return self._pool.get()
+
+    def call(self, method, *args, timeout=None):
+        """Call ``method`` on the server with a per-call timeout (seconds)."""
+        proxy, transport = self._checkout()
+        transport.timeout = timeout or self.timeout
+        try:
+            with instrumentation.track("rpc_client", method):
+                return getattr(proxy, method)(*args)
+        except (OSError, xmlrpc.client.ProtocolError):
+            # Drop the connection so the next call starts on a fresh one
+            transport.close()
+            raise
+        finally:
+            self._pool.put((proxy, transport))
+
+    def submit_job(self, kind, args):
+        """Submit a long-running RPC as a server-side job and return its id."""
+        job_id = self.call("submit_job", kind, args)
+        if job_id.startswith("Erro"):
+            raise RuntimeError(job_id)
+        return job_id
+
+    def get_collections(self):
+        """Firestore collection names, cached for ``collections_ttl`` seconds.
+
+        Failures are cached too (as an empty list), so an unreachable server
+        costs one timeout per TTL instead of one per page render.
+        """
+        with self._lock:
+            if self._collections is not None and time.monotonic() - self._collections_at < self.collections_ttl:
+                return self._collections
+        try:
+            cols = self.call("get_collections", timeout=min(self.timeout, 5.0))
+            cols = cols if isinstance(cols, list) else []
+        except Exception:
+            cols = []
+        with self._lock:
+            self._collections = cols
+            self._collections_at = time.monotonic()
+        return cols
+
+    def invalidate_collections(self):
+        with self._lock:
+            self._collections = None
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(url=None):
+    """Shared client for ``url`` (``XMLRPC_SERVER_URL`` by default)."""
+    url = url or os.environ.get("XMLRPC_SERVER_URL", DEFAULT_URL)
+    with _clients_lock:
+        client = _clients.get(url)
+        if client is None:
+            client = _clients[url] = RpcClient(
+                url,
+                timeout=float(os.environ.get("XMLRPC_TIMEOUT", 10)),
+                collections_ttl=float(os.environ.get("COLLECTIONS_CACHE_TTL", 30)),
+                pool_size=int(os.environ.get("XMLRPC_POOL_SIZE", 8)),
+            )
+        return client
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+CHUNK_READ_SIZE = 1024 * 1024
+
+
+class UploadError(Exception):
+    """Upload request that can't be applied; ``status`` is the HTTP code."""
+
+    def __init__(self, message, status=400, **extra):
+        super().__init__(message)
+        self.status = status
+        self.extra = extra
+
+
+class UploadStore:
+    """Resumable uploads written straight into the shared folder.
+
+    Each upload is a ``<id>.part`` file plus a small ``<id>.json`` with its
+    metadata, both under ``<folder>/.uploads`` so they sit on the same
+    filesystem as the final file and completing an upload is a rename, not a
+    copy. The current offset is always the size of the ``.part`` file, so an
+    upload can be resumed after a network error or a restart of the app.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.dir = folder / ".uploads"
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._complete_lock = threading.Lock()
+        # Running sha256 per upload, valid while chunks arrive in order in
+        # this process; otherwise the checksum is computed from the file
+        self._hashers = {}
+
+    def _lock(self, upload_id):
+        with self._locks_guard:
+            return self._locks.setdefault(upload_id, threading.Lock())
+
+    def _paths(self, upload_id):
+        if not upload_id.isalnum():
+            raise UploadError("Unknown upload.", 404)
+        return self.dir / f"{upload_id}.json", self.dir / f"{upload_id}.part"
+
+    def create(self, filename, size=None, sha256=None, convert=False):
+        upload_id = uuid.uuid4().hex
+        meta_path, part_path = self._paths(upload_id)
+        meta = {"id": upload_id, "filename": filename, "size": size, "sha256": sha256, "convert": convert}
+        part_path.touch()
+        meta_path.write_text(json.dumps(meta))
+        self._hashers[upload_id] = (0, hashlib.sha256())
+        return self.status(upload_id)
+
+    def _meta(self, upload_id):
+        meta_path, part_path = self._paths(upload_id)
+        try:
+            meta = json.loads(meta_path.read_text())
+        except FileNotFoundError:
+            raise UploadError("Unknown upload.", 404)
+        return meta, part_path
+
+    def status(self, upload_id):
+        meta, part_path = self._meta(upload_id)
+        meta["offset"] = part_path.stat().st_size
+        return meta
+
+    def write(self, upload_id, offset, stream):
+        """Append the request body at ``offset``, which must be the current
+        end of the file (a mismatch returns 409 with the offset to resume from)."""
+        with self._lock(upload_id):
+            meta, part_path = self._meta(upload_id)
+            current = part_path.stat().st_size
+            if offset != current:
+                raise UploadError("Offset mismatch.", 409, offset=current)
+            done, hasher = self._hashers.get(upload_id, (-1, None))
+            if done != current:
+                hasher = None
+            # Never write past the declared size: an oversized body is
+            # rejected after at most that many bytes, not after all of it
+            remaining = None if meta["size"] is None else meta["size"] - offset
+            with open(part_path, "r+b") as f:
+                f.seek(offset)
+                while remaining is None or remaining > 0:
+                    block = stream.read(CHUNK_READ_SIZE if remaining is None else min(CHUNK_READ_SIZE, remaining))
+                    if not block:
+                        break
+                    f.write(block)
+                    if hasher is not None:
+                        hasher.update(block)
+                    if remaining is not None:
+                        remaining -= len(block)
+                end = f.tell()
+                if remaining == 0 and stream.read(1):
+                    f.truncate(offset)
+                    self._hashers.pop(upload_id, None)
+                    raise UploadError("Chunk goes past the declared size.", 400, offset=offset)
+            if hasher is not None:
+                self._hashers[upload_id] = (end, hasher)
+            else:
+                self._hashers.pop(upload_id, None)
+            return end
+
+    def _checksum(self, upload_id, part_path, size):
+        done, hasher = self._hashers.get(upload_id, (-1, None))
+        if hasher is not None and done == size:
+            return hasher.hexdigest()
+        hasher = hashlib.sha256()
+        with open(part_path, "rb") as f:
+            for block in iter(lambda: f.read(CHUNK_READ_SIZE), b""):
+                hasher.update(block)
+        return hasher.hexdigest()
+
+    def complete(self, upload_id, target, sha256=None):
+        """Check size and checksum, then move the upload to
+        ``target(filename)``, a function that picks a free path for the
+        upload's file name. It is called under a lock shared by all uploads,
+        so two uploads of the same name can't pick the same path."""
+        with self._lock(upload_id), self._complete_lock:
+            meta, part_path = self._meta(upload_id)
+            size = part_path.stat().st_size
+            if meta["size"] is not None and size != meta["size"]:
+                raise UploadError("Upload is incomplete.", 409, offset=size)
+            expected = (sha256 or meta["sha256"] or "").lower()
+            digest = self._checksum(upload_id, part_path, size)
+            if expected and digest != expected:
+                raise UploadError("Checksum mismatch.", 422, sha256=digest)
+            target_path = target(meta["filename"])
+            os.replace(part_path, target_path)
+            self._forget(upload_id)
+            meta.update(offset=size, sha256=digest, filename=target_path.name)
+            return meta
+
+    def abort(self, upload_id):
+        with self._lock(upload_id):
+            meta, part_path = self._meta(upload_id)
+            part_path.unlink(missing_ok=True)
+            self._forget(upload_id)
+
+    def _forget(self, upload_id):
+        meta_path, _ = self._paths(upload_id)
+        meta_path.unlink(missing_ok=True)
+        self._hashers.pop(upload_id, None)
+        with self._locks_guard:
+            self._locks.pop(upload_id, None)
@@ -1,156 +1,107 @@
-import firebase_admin
+import functools
+import multiprocessing
 import os
+import socketserver
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from firebase_admin import credentials, firestore
 from xmlrpc.server import SimpleXMLRPCServer
 from xmlrpc.server import SimpleXMLRPCRequestHandler
-import csv
-from xml.dom import minidom
 import xml.etree.ElementTree as ET
 from lxml import etree
+import columnar
+import compressed
+import incremental
+import ingest
+import instrumentation
+import jobs
+import storage
+import validation
+from conversion import DATAFOLDER, csv_to_xml, csv_to_xml_many, xml_to_xsd, validate_xml_against_xsd, schema_cache_stats
 
-cred = credentials.Certificate("chave-privada.json")
-firebase_admin.initialize_app(cred)
+STARTED = time.time()
 
-DATAFOLDER = Path("/data/shared").resolve()
-
-# Inicializa o Firestore
-db_firestore = firestore.client()
+# Destino da ingestão (Firestore por omissão; ver STORAGE_BACKEND em storage.py).
+# Só é inicializado no primeiro uso: as conversões não precisam de credenciais
+# e os processos do pool, que importam este módulo, arrancam sem esse custo.
+store = storage.LazyBackend()
 
 # Configuração do servidor XML-RPC
 class RequestHandler(SimpleXMLRPCRequestHandler):
     rpc_paths = ('/RPC2',)
 
-server = SimpleXMLRPCServer(('0.0.0.0', 8000), requestHandler=RequestHandler)
-server.register_introspection_functions()
 
-def csv_to_xml(csv_filename):
-    try:
-        # valida nome simples (evita path traversal)
-        if Path(csv_filename).name != csv_filename:
-            return "Erro: nome de arquivo inválido"
-        csv_file = DATAFOLDER / csv_filename
-        if not csv_file.exists():
-            return "Erro: arquivo CSV não encontrado"
-
-        with csv_file.open('r', encoding='utf-8', newline='') as f:
-            reader = csv.DictReader(f)
-            root = ET.Element("data")
-            for row in reader:
-                record_el = ET.SubElement(root, "record")
-                for key, value in row.items():
-                    tag = key.strip().replace(" ", "_")
-                    ET.SubElement(record_el, tag).text = (value or "").strip()
-
-        tree = ET.ElementTree(root)
-        # Tenta identação nativa (Python 3.9+)
+class KeepAliveRequestHandler(RequestHandler):
+    """HTTP/1.1: o cliente pode reutilizar a ligação TCP entre chamadas.
+
+    Só é usado no modo threaded (cada ligação ocupa uma thread enquanto está
+    aberta); ligações paradas há mais de ``XMLRPC_KEEPALIVE_TIMEOUT`` s são
+    fechadas para libertarem a vaga.
+    """
+    protocol_version = "HTTP/1.1"
+    timeout = float(os.environ.get("XMLRPC_KEEPALIVE_TIMEOUT", 15))
+
+
+class ThreadedXMLRPCServer(socketserver.ThreadingMixIn, SimpleXMLRPCServer):
+    """SimpleXMLRPCServer com uma thread por pedido, limitado a ``max_threads``.
+
+    Quando o limite é atingido o ciclo de accept fica à espera de uma vaga e os
+    novos pedidos aguardam na fila do socket, em vez de criar threads sem fim.
+    """
+    daemon_threads = True
+
+    def __init__(self, addr, max_threads=32, **kwargs):
+        self._slots = threading.BoundedSemaphore(max_threads)
+        super().__init__(addr, **kwargs)
+
+    def process_request(self, request, client_address):
+        self._slots.acquire()
         try:
-            ET.indent(tree, space="  ")
-            xml_bytes = ET.tostring(root, encoding='utf-8')
-        except AttributeError:
-            # Fallback para pretty print usando minidom
-            rough = ET.tostring(root, encoding='utf-8')
-            reparsed = minidom.parseString(rough)
-            xml_bytes = reparsed.toprettyxml(indent="  ", encoding="utf-8")
-
-        xml_file = DATAFOLDER / (csv_file.stem + ".xml")
-        with xml_file.open('wb') as out:
-            out.write(xml_bytes)
-
-        xml_str = xml_bytes.decode('utf-8')
-        
-        return xml_to_xsd(xml_file.name)
-    except Exception as e:
-        return f"Erro ao converter CSV: {e}"
-    
-def xml_to_xsd(xml_filename):
-    try:
-        xml_file = DATAFOLDER / xml_filename
-        if not xml_file.exists():
-            return "Erro: arquivo XML não encontrado"
-
-        ordered_tags = []  # preserves first appearance
-        seen = set()
-        for event, elem in etree.iterparse(str(xml_file), events=("end",)):
-            if elem.tag == "record":
-                for child in elem:
-                    t = child.tag
-                    if t not in seen:
-                        seen.add(t)
-                        ordered_tags.append(t)
-                # free memory for large files
-                elem.clear()
-
-        if os.environ.get("XSD_SORT", "").lower() == "alpha":
-            ordered_tags = sorted(ordered_tags)
-
-        xsd_root = ET.Element("xs:schema", attrib={
-            "xmlns:xs": "http://www.w3.org/2001/XMLSchema"
-        })
-
-        record_el = ET.SubElement(xsd_root, "xs:element", attrib={"name": "data"})
-        complex_type = ET.SubElement(record_el, "xs:complexType")
-        sequence = ET.SubElement(complex_type, "xs:sequence")
-
-        record_type = ET.SubElement(sequence, "xs:element", attrib={
-            "name": "record",
-            "minOccurs": "0",
-            "maxOccurs": "unbounded"
-        })
-        rec_complex = ET.SubElement(record_type, "xs:complexType")
-        rec_seq = ET.SubElement(rec_complex, "xs:sequence")
-
-        for tag in ordered_tags:
-            ET.SubElement(rec_seq, "xs:element", attrib={
-                "name": tag,
-                "type": "xs:string",
-                "minOccurs": "0"
-            })
-
-        xsd_file = DATAFOLDER / (xml_file.stem + ".xsd")
-        tree = ET.ElementTree(xsd_root)
+            super().process_request(request, client_address)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
         try:
-            ET.indent(tree, space="  ")
-            tree.write(xsd_file, encoding='utf-8', xml_declaration=True)
-            xsd_str = ET.tostring(xsd_root, encoding='utf-8').decode('utf-8')
-        except AttributeError:
-            rough = ET.tostring(xsd_root, encoding='utf-8')
-            reparsed = minidom.parseString(rough)
-            xsd_str = reparsed.toprettyxml(indent="  ")
-            with xsd_file.open('w', encoding='utf-8') as f:
-                f.write(xsd_str)
-
-        return xsd_str
-    except Exception as e:
-        return f"Erro ao converter XML para XSD: {e}"
+            super().process_request_thread(request, client_address)
+        finally:
+            self._slots.release()
+
+
+def create_server(host='0.0.0.0', port=8000):
+    """Cria o servidor XML-RPC conforme ``XMLRPC_SERVER_MODE``.
+
+    ``simple`` mantém o servidor original de uma só thread; ``threaded``
+    (omissão) atende cada ligação numa thread, com no máximo
+    ``XMLRPC_MAX_THREADS`` em simultâneo, e mantém as ligações abertas
+    (keep-alive) entre pedidos.
+    """
+    mode = os.environ.get("XMLRPC_SERVER_MODE", "threaded").lower()
+    if mode == "simple":
+        return SimpleXMLRPCServer((host, port), requestHandler=RequestHandler)
+    max_threads = int(os.environ.get("XMLRPC_MAX_THREADS", 32))
+    return ThreadedXMLRPCServer((host, port), max_threads=max_threads,
+                                requestHandler=KeepAliveRequestHandler)
 
-def validate_xml_against_xsd(xml_filename, xsd_filename):
-    try:
-        xml_file = DATAFOLDER / xml_filename
-        xsd_file = DATAFOLDER / xsd_filename
-
-        if not xml_file.exists():
-            return "Erro: arquivo XML não encontrado"
-        if not xsd_file.exists():
-            return "Erro: arquivo XSD não encontrado"
-
-
-        schemas = etree.XMLSchema(etree.parse(str(xsd_file)))
-        # Coleta tags presentes no XML
-        for _, elem in etree.iterparse(str(xml_file), events=("end",), schema=schemas, huge_tree=True):
-            elem.clear()
-            parent = elem.getparent()
-            # if parent is not None:
-            #     while parent.getprevious() is not None:
-            #         del parent.getprevious()[0]
-        return "XML é válido contra o XSD"
-    except ImportError:
-        return "Erro: biblioteca 'xmlschema' não instalada"
-    except Exception as e:
-        return f"Erro ao validar XML contra XSD: {e}"
 
-# Função para processar o XML e salvar no Firestore
-def process_xml_and_save_to_firebase(xml_filename):
+def rpc_error(result):
+    """Tipo de erro das respostas "Erro: ..." (as funções não lançam exceções)."""
+    return "erro" if isinstance(result, str) and result.startswith("Erro") else None
+
+
+def offload(pool, func):
+    """Executa ``func`` num processo do pool, para conversões pesadas em CPU
+    não disputarem o GIL com as chamadas rápidas (ex.: get_collections)."""
+    @functools.wraps(func)
+    def call(*args):
+        return pool.submit(func, *args).result()
+    return call
+
+# Função para processar o XML e salvar no destino configurado
+def process_xml_and_save_to_firebase(xml_filename, batch_size=None, workers=None, queue_depth=None,
+                                     progress=None, mode=None, key=None):
     # valida nome simples (evita path traversal)
     if Path(xml_filename).name != xml_filename:
         return "Erro: nome de arquivo inválido"
@@ -158,55 +109,220 @@ def process_xml_and_save_to_firebase(xml_filename):
     xml_file = DATAFOLDER / xml_filename
     if not xml_file.exists():
         return "Erro: arquivo XML não encontrado"
+    try:
+        store.get()
+    except Exception as e:
+        return f"Erro: {store.label} indisponível ({e})"
+
+    if batch_size is None:
+        # Omissão: o maior lote que o destino aceita (500 no Firestore)
+        batch_size = int(os.environ.get("INGEST_BATCH_SIZE",
+                                        os.environ.get("FIRESTORE_BATCH_SIZE", store.max_batch)))
+    if workers is None:
+        workers = int(os.environ.get("INGEST_WORKERS", ingest.DEFAULT_WORKERS))
+    if queue_depth is None:
+        queue_depth = int(os.environ.get("INGEST_QUEUE_DEPTH", 2 * workers))
+    mode = mode or os.environ.get("INGEST_MODE", "append")
+    if mode not in ("append", "incremental"):
+        return f"Erro: modo de ingestão desconhecido '{mode}'"
+
+    collection_name = compressed.stem(xml_filename)
+    progresso = {"records": 0, "written": 0}
+    total = xml_file.stat().st_size
+    sidecar = columnar.fresh_sidecar(xml_file)
+    sidecar_rows = columnar.count_rows(sidecar) if sidecar is not None else 0
+
+    def report(stats):
+        progresso.update(stats)
+        print(f"[process_xml] {collection_name}: {stats['written']}/{stats['records']} registros gravados "
+              f"({stats['batches']} lotes, {len(stats['failed_batches'])} falhados)", flush=True)
+        if progress is not None:
+            if sidecar is not None:
+                # Sem posição no XML: estimativa proporcional aos registos lidos
+                progress(stats["written"], total * stats["records"] // max(sidecar_rows, 1), total)
+            else:
+                progress(stats["written"], compressed.position(fh), total)
 
     try:
         # Verifica se o XML está vazio rapidamente sem carregar tudo no parser
-        with xml_file.open('r', encoding='utf-8') as f:
+        with compressed.open_text(xml_file, encoding='utf-8') as f:
             preview = f.read(2048)
             if not preview.strip():
                 return "Erro: XML vazio"
 
-        collection_name = xml_filename.replace(".xml", "")
-        documentos = 0
-
-        # Usa iterparse para processamento em streaming (menor uso de memória)
-        for event, elem in etree.iterparse(str(xml_file), events=("end",)):
-            if elem.tag == "record":
-                data = {}
-                for child in elem:
-                    data[child.tag] = (child.text or "").strip()
-                db_firestore.collection(collection_name).add(data)
-                documentos += 1
-                # Libera memória do elemento já processado
-                elem.clear()
-                parent = elem.getparent()
-                if parent is not None:
-                    for ancestor in parent.iterancestors():
-                        ancestor.clear()
-
-        if documentos == 0:
+        # iterparse (ou leitura do sidecar colunar, se existir) numa thread
+        # produtora + commits em lotes por várias threads
+        with compressed.open_read(xml_file) as fh:
+            records = columnar.iter_records(sidecar) if sidecar is not None else ingest.iter_records(fh)
+            if mode == "incremental":
+                stats = incremental.run_incremental(
+                    store, collection_name, records,
+                    DATAFOLDER / ".manifests" / store.name / f"{collection_name}.json",
+                    key=key or None, batch_size=batch_size, workers=workers, queue_depth=queue_depth,
+                    progress=report,
+                )
+            else:
+                stats = ingest.run_pipeline(
+                    store, collection_name, records,
+                    batch_size=batch_size, workers=workers, queue_depth=queue_depth, progress=report,
+                )
+        stats["source"] = "arrow" if sidecar is not None else "xml"
+        stats["mode"] = mode
+
+        if stats["records"] == 0 and not stats.get("skipped_records"):
             return "Aviso: nenhum elemento <record> encontrado"
-        return f"Dados gravados com sucesso no Firestore ({documentos} registros)"
+        if stats["failed_batches"]:
+            falhas = ", ".join(
+                f"{b['first']}-{b['last']} ({b['written']} gravados; {b['error']})" if b["written"]
+                else f"{b['first']}-{b['last']} ({b['error']})"
+                for b in stats["failed_batches"][:5]
+            )
+            stats["message"] = (f"Aviso: {stats['written']} de {stats['records']} registros gravados no {store.label}; "
+                                f"{len(stats['failed_batches'])} lotes falharam (registros {falhas})")
+        elif mode == "incremental":
+            stats["message"] = (f"{store.label} atualizado: {stats['written']} registros gravados, "
+                                f"{stats['skipped_records']} inalterados, {stats['deleted']} apagados")
+        else:
+            stats["message"] = (f"Dados gravados com sucesso no {store.label} ({stats['written']} registros, "
+                                f"{stats['batches']} lotes, {stats['rows_per_sec']:.0f} registros/s)")
+        return stats
     except (etree.XMLSyntaxError, ET.ParseError):
-        return "Erro: XML mal formado"
+        return f"Erro: XML mal formado ({progresso['written']} registros já gravados)"
+    except Exception as e:
+        return f"Erro ao processar o XML: {str(e)} ({progresso['written']} registros já gravados)"
+
+def process_xml_incremental(xml_filename, key="", progress=None):
+    """RPC: ``process_xml`` em modo incremental. ``key`` é a coluna usada como
+    ID dos documentos ("" usa o hash de cada registo)."""
+    return process_xml_and_save_to_firebase(xml_filename, progress=progress, mode="incremental", key=key)
+
+def dataset_stats(xml_filename):
+    """RPC: estatísticas por coluna de um XML gerado pelo csv_to_xml, a partir
+    do sidecar colunar (criado a partir do XML se ainda não existir)."""
+    if Path(xml_filename).name != xml_filename:
+        return "Erro: nome de arquivo inválido"
+    xml_file = DATAFOLDER / xml_filename
+    if not xml_file.exists():
+        return "Erro: arquivo XML não encontrado"
+    if not columnar.enabled():
+        return "Erro: sidecar colunar indisponível (pyarrow não instalado ou COLUMNAR_SIDECAR=0)"
+    try:
+        sidecar = columnar.fresh_sidecar(xml_file)
+        if sidecar is None:
+            with compressed.open_read(xml_file) as fh:
+                sidecar = columnar.build_from_xml(xml_file, ingest.iter_records(fh))
+        table = columnar.read_table(sidecar)
+        profile = columnar.profile_from_table(table)
+        return {"xml": xml_filename, "records": table.num_rows,
+                "columns": columnar.column_stats(table, profile)}
     except Exception as e:
-        return f"Erro ao processar o XML: {str(e)}"
+        return f"Erro ao calcular estatísticas: {e}"
+
+def health(deep=False):
+    """RPC de liveness/readiness; responde sem inicializar o destino.
+
+    ``deep`` inicializa o destino (se ainda não estiver) e lista as coleções,
+    para confirmar que está acessível. ``status`` é "ready" quando a pasta
+    partilhada está acessível e, com ``deep``, o destino também.
+    """
+    storage_state = {"backend": store.name, "initialized": store.initialized, "error": store.error}
+    if deep:
+        try:
+            store.get().collections()
+            storage_state.update(initialized=True, error="")
+        except Exception as e:
+            storage_state["error"] = f"{type(e).__name__}: {e}"
+    datafolder_ok = DATAFOLDER.is_dir() and os.access(DATAFOLDER, os.R_OK | os.W_OK)
+    ready = datafolder_ok and not (deep and storage_state["error"])
+    return {
+        "status": "ready" if ready else "degraded",
+        "uptime": time.time() - STARTED,
+        "datafolder": datafolder_ok,
+        "storage": storage_state,
+    }
 
 def getFirebaseCollections():
     try:
-        collections = db_firestore.collections()
-        collection_names = [collection.id for collection in collections]
-        return collection_names
+        return store.collections()
     except Exception as e:
-        return f"Erro ao obter coleções do Firestore: {str(e)}"
+        return f"Erro ao obter coleções do {store.label}: {str(e)}"
 
 # Inicia o servidor XML-RPC
 if __name__ == "__main__":
+    # Métricas Prometheus e profiler em http://0.0.0.0:METRICS_PORT (0 desativa)
+    instrumentation.configure("xmlrpc-server")
+    instrumentation.start_sidecar(os.environ.get("METRICS_PORT", 9100))
+
+    port = int(os.environ.get("XMLRPC_PORT", 8000))
+    server = create_server(port=port)
+    server.register_introspection_functions()
+
+    def register(func, name):
+        # Latência, pedidos em curso e erros por método
+        server.register_function(instrumentation.instrument("rpc", name, is_error=rpc_error)(func), name)
+
+    # Conversões pesadas correm num pool de processos (0 desativa o pool)
+    process_workers = int(os.environ.get("XMLRPC_PROCESS_WORKERS", os.cpu_count() or 1))
+    if process_workers > 0:
+        pool = ProcessPoolExecutor(max_workers=process_workers,
+                                   mp_context=multiprocessing.get_context("forkserver"))
+        convert_csv, convert_xsd = (offload(pool, f) for f in (csv_to_xml, xml_to_xsd))
+    else:
+        pool = None
+        convert_csv, convert_xsd = csv_to_xml, xml_to_xsd
+
     # Registra a função XML-RPC no servidor
-    server.register_function(process_xml_and_save_to_firebase, 'process_xml')
-    server.register_function(csv_to_xml, 'csv_to_xml')
-    server.register_function(xml_to_xsd, 'xml_to_xsd')
-    server.register_function(validate_xml_against_xsd, 'validate_xml')
-    server.register_function(getFirebaseCollections, 'get_collections')
-    print("Servidor XML-RPC rodando em http://0.0.0.0:8000")
+    register(process_xml_and_save_to_firebase, 'process_xml')
+    register(convert_csv, 'csv_to_xml')
+    register(convert_xsd, 'xml_to_xsd')
+    # Lote de CSV (lista de nomes ou glob), um ficheiro por processo do pool
+    convert_many = functools.partial(csv_to_xml_many, executor=pool)
+    register(convert_many, 'csv_to_xml_many')
+    # A validação corre no processo do servidor para aproveitar a cache de XSD
+    # compilados (o lxml liberta o GIL durante o parse)
+    register(validate_xml_against_xsd, 'validate_xml')
+    register(schema_cache_stats, 'schema_cache_stats')
+    # Validação de ficheiros grandes em blocos <record>, repartidos pelo pool
+    register(functools.partial(validation.validate_xml_parallel, executor=pool),
+             'validate_xml_parallel')
+    validate_report = functools.partial(validation.validate_xml_report, executor=pool)
+    register(validate_report, 'validate_xml_report')
+    register(process_xml_incremental, 'process_xml_incremental')
+    register(dataset_stats, 'dataset_stats')
+    register(getFirebaseCollections, 'get_collections')
+    register(health, 'health')
+
+    # Jobs assíncronos: submit_job devolve um id, consultado com job_status/job_result
+    job_manager = jobs.JobManager(
+        jobs.JobStore(Path(os.environ.get("JOBS_DB", "jobs.sqlite")).resolve()),
+        process_pool=pool,
+        threads=int(os.environ.get("JOB_THREADS", 4)),
+        ingest_threads=int(os.environ.get("INGEST_JOB_THREADS", 2)),
+    )
+    job_manager.register('csv_to_xml', csv_to_xml, in_process=False)
+    job_manager.register('xml_to_xsd', xml_to_xsd, in_process=False)
+    # Corre numa thread do servidor, que distribui os ficheiros pelo pool
+    job_manager.register('csv_to_xml_many', convert_many)
+    job_manager.register('validate_xml', validate_xml_against_xsd)
+    job_manager.register('validate_xml_report', validate_report)
+    # Ingestões numa fila própria: não atrasam validações nem conversões
+    job_manager.register('process_xml', process_xml_and_save_to_firebase, ingest=True)
+    job_manager.register('process_xml_incremental', process_xml_incremental, ingest=True)
+    job_manager.resume()
+    register(job_manager.submit_job, 'submit_job')
+    register(job_manager.job_status, 'job_status')
+    register(job_manager.job_result, 'job_result')
+    register(job_manager.job_items, 'job_items')
+
+    if os.environ.get("STORAGE_PRELOAD", "0") == "1":
+        # Inicializa o destino em segundo plano, já com a porta aberta, para
+        # a primeira ingestão não pagar esse custo (os erros ficam em health)
+        def preload():
+            try:
+                store.get()
+            except Exception as e:
+                print(f"Aviso: {store.label} indisponível ({e})", flush=True)
+        threading.Thread(target=preload, name="storage-preload", daemon=True).start()
+    print(f"Servidor XML-RPC rodando em http://0.0.0.0:{port} "
+          f"(pronto em {(time.time() - STARTED) * 1000:.0f} ms)", flush=True)
     server.serve_forever()
@@ -0,0 +1,87 @@
+"""Compara os escritores CSV→XML (``stream`` e ``tree``) em tempo e pico de RSS.
+
+Uso:
+    python benchmarks/bench_csv_to_xml.py --rows 1000000 --columns 8
+
+Cada engine corre num subprocesso próprio, para que o pico de memória
+(``ru_maxrss``) de um não contamine o outro. O resultado sai em JSON.
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent))
+
+from synthetic import generate_csv  # noqa: E402
+
+ENGINES = ("tree", "stream")
+
+
+def peak_rss_mb():
+    # ru_maxrss vem em KB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_engine(engine, csv_path, xml_path):
+    import conversion
+
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+    records = conversion.convert_csv_file(csv_path, xml_path, engine=engine)
+    wall = time.perf_counter() - started
+    return {
+        "engine": engine,
+        "records": records,
+        "wall_seconds": round(wall, 3),
+        "rows_per_sec": round(records / wall) if wall > 0 else 0,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "baseline_rss_mb": round(baseline, 1),
+        "xml_bytes": Path(xml_path).stat().st_size,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--columns", type=int, default=8)
+    parser.add_argument("--value-size", type=int, default=12)
+    parser.add_argument("--engines", default=",".join(ENGINES))
+    parser.add_argument("--workdir", help="pasta para os ficheiros gerados (omissão: temporária)")
+    parser.add_argument("--child", nargs=3, metavar=("ENGINE", "CSV", "XML"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_engine(*args.child)))
+        return
+
+    with tempfile.TemporaryDirectory(dir=args.workdir) as tmp:
+        csv_path = Path(tmp) / "bench.csv"
+        # Só texto, para comparar os escritores sem o custo da inferência de tipos
+        generate_csv(csv_path, args.rows, args.columns, args.value_size, kinds=("text",))
+        report = {
+            "rows": args.rows,
+            "columns": args.columns,
+            "value_size": args.value_size,
+            "csv_bytes": csv_path.stat().st_size,
+            "results": [],
+        }
+        for engine in args.engines.split(","):
+            xml_path = Path(tmp) / f"bench_{engine}.xml"
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", engine, str(csv_path), str(xml_path)],
+                check=True, capture_output=True, text=True,
+            )
+            report["results"].append(json.loads(out.stdout))
+            xml_path.unlink()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
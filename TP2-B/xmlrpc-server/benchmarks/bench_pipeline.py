@@ -0,0 +1,215 @@
+"""Mede o pipeline CSV→XML→XSD→validação→ingestão em tempo, registos/s,
+pico de RSS e bytes escritos.
+
+Uso:
+    python benchmarks/bench_pipeline.py --rows 1k,100k,1M --columns 8,32 --value-size 12
+    python benchmarks/bench_pipeline.py --rows 10M --output resultados.jsonl
+    python benchmarks/bench_pipeline.py --rows 1M --compression zst
+
+Para cada combinação de ``--rows``, ``--columns`` e ``--value-size`` (listas
+separadas por vírgulas) gera um CSV sintético (benchmarks/synthetic.py) e
+corre por ordem ``csv_to_xml``, ``xml_to_xsd``, ``validate_xml_against_xsd``
+e ``process_xml_and_save_to_firebase``, cada uma num subprocesso próprio
+para que o pico de memória de uma etapa não contamine a seguinte. A
+ingestão grava no MemoryBackend (STORAGE_BACKEND=memory), sem serviços
+externos. Com ``--compression gz|zst`` o CSV é comprimido antes de começar
+e o XML é escrito com a mesma compressão (XML_COMPRESSION), para comparar o
+custo de CPU com os bytes poupados. O resultado sai em JSON; com ``--output`` cada execução é
+acrescentada como uma linha ao ficheiro, para comparar execuções ao longo
+do tempo.
+"""
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent))
+
+import compressed  # noqa: E402
+import synthetic  # noqa: E402
+
+STAGES = ("csv_to_xml", "xml_to_xsd", "validate", "process_xml")
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    # ru_maxrss vem em KB no Linux
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+def _size(*paths):
+    return sum(p.stat().st_size for p in paths if p.exists())
+
+
+def run_stage(stage, datafolder):
+    """Corre uma etapa sobre ``bench.*`` em ``datafolder`` (num subprocesso com
+    DATAFOLDER e STORAGE_BACKEND já definidos) e devolve as medições."""
+    datafolder = Path(datafolder)
+    csv_file = compressed.variants(datafolder, "bench.csv")[0]
+    xsd_file, arrow_file = datafolder / "bench.xsd", datafolder / "bench.arrow"
+    extra = {}
+
+    def xml_file():
+        # bench.xml, bench.xml.gz ou bench.xml.zst, conforme XML_COMPRESSION
+        found = compressed.variants(datafolder, "bench.xml")
+        return found[0] if found else datafolder / "bench.xml"
+
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+    if stage == "csv_to_xml":
+        import conversion
+        result = conversion.csv_to_xml(csv_file.name)
+        wall = time.perf_counter() - started
+        bytes_written = _size(xml_file(), xsd_file, arrow_file)
+        extra["sidecar_bytes"] = _size(arrow_file)
+    elif stage == "xml_to_xsd":
+        import conversion
+        result = conversion.xml_to_xsd(xml_file().name)
+        wall = time.perf_counter() - started
+        bytes_written = _size(xsd_file)
+    elif stage == "validate":
+        import conversion
+        result = conversion.validate_xml_against_xsd(xml_file().name, xsd_file.name)
+        wall = time.perf_counter() - started
+        bytes_written = 0
+    elif stage == "process_xml":
+        import app
+        result = app.process_xml_and_save_to_firebase(xml_file().name)
+        wall = time.perf_counter() - started
+        # Tamanho em JSON do que ficou no destino em memória
+        docs = app.store.data.get("bench", {})
+        bytes_written = sum(len(json.dumps(doc, ensure_ascii=False).encode("utf-8")) for doc in docs.values())
+        if isinstance(result, dict):
+            extra["source"] = result.get("source")
+            extra["batches"] = result.get("batches")
+            result = result.get("message")
+    else:
+        raise ValueError(f"etapa desconhecida: {stage}")
+
+    return {
+        "stage": stage,
+        "wall_seconds": round(wall, 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "peak_children_rss_mb": round(peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+        "baseline_rss_mb": round(baseline, 1),
+        "bytes_written": bytes_written,
+        "ok": isinstance(result, str) and not result.startswith("Erro"),
+        # csv_to_xml/xml_to_xsd devolvem o XSD inteiro; basta o início
+        "result": (result if isinstance(result, str) else repr(result))[:200],
+        **extra,
+    }
+
+
+def compress_file(path, codec):
+    """Comprime ``path`` para ``path + codec`` e apaga o original."""
+    target = Path(str(path) + codec)
+    with open(path, "rb") as src, compressed.open_write(target) as dst:
+        while True:
+            block = src.read(compressed.BUFFER_SIZE)
+            if not block:
+                break
+            dst.write(block)
+    os.remove(path)
+    return target.stat().st_size
+
+
+def run_case(rows, columns, value_size, stages, workdir, env, codec=""):
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        csv_path = Path(tmp) / "bench.csv"
+        started = time.perf_counter()
+        csv_bytes = synthetic.generate_csv(csv_path, rows, columns, value_size)
+        case = {
+            "rows": rows,
+            "columns": columns,
+            "value_size": value_size,
+            "csv_bytes": csv_bytes,
+            "generate_seconds": round(time.perf_counter() - started, 3),
+            "stages": [],
+        }
+        if codec:
+            case["csv_compressed_bytes"] = compress_file(csv_path, codec)
+        child_env = dict(env, DATAFOLDER=tmp, STORAGE_BACKEND="memory")
+        for stage in stages:
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", stage, tmp],
+                check=True, capture_output=True, text=True, env=child_env,
+            )
+            # A última linha é o JSON; as anteriores são registos das funções
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            wall = result["wall_seconds"]
+            result["rows_per_sec"] = round(rows / wall) if wall > 0 else 0
+            case["stages"].append(result)
+            print(f"  {rows} linhas x {columns} colunas, {stage}: {wall:.2f}s, "
+                  f"{result['rows_per_sec']} linhas/s, {result['peak_rss_mb']} MB", file=sys.stderr)
+    return case
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _int_list(value):
+    """``1k,100k,10M`` -> ``[1000, 100000, 10000000]``."""
+    return [synthetic.parse_count(v) for v in value.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=_int_list, default=[1000, 100_000, 1_000_000])
+    parser.add_argument("--columns", type=_int_list, default=[8])
+    parser.add_argument("--value-size", type=_int_list, default=[12])
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument("--sidecar", choices=("on", "off"), default="on",
+                        help="sidecar Arrow (off: COLUMNAR_SIDECAR=0, tudo a partir do XML)")
+    parser.add_argument("--compression", choices=("none", "gz", "zst"), default="none",
+                        help="CSV de entrada e XML gerado comprimidos (gzip ou zstd)")
+    parser.add_argument("--workdir", help="pasta para os ficheiros gerados (omissão: temporária)")
+    parser.add_argument("--output", help="acrescenta o resultado como uma linha JSON a este ficheiro")
+    parser.add_argument("--child", nargs=2, metavar=("STAGE", "DATAFOLDER"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_stage(*args.child)))
+        return
+
+    stages = [s for s in args.stages.split(",") if s]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"etapas desconhecidas: {', '.join(sorted(unknown))}")
+    codec = compressed.parse_codec(args.compression)
+    env = dict(os.environ, COLUMNAR_SIDECAR="1" if args.sidecar == "on" else "0",
+               XML_COMPRESSION=args.compression)
+
+    report = {
+        "started": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "sidecar": args.sidecar,
+        "compression": args.compression,
+        "runs": [],
+    }
+    for rows, columns, value_size in itertools.product(args.rows, args.columns, args.value_size):
+        report["runs"].append(run_case(rows, columns, value_size, stages, args.workdir, env, codec))
+
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(report) + "\n")
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Mede o arranque do servidor XML-RPC: importação de app.py, tempo até ficar
+pronto (primeira resposta ao ``health``) e primeira conversão.
+
+Uso:
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --backend firestore --output arranque.jsonl
+
+Cada execução arranca ``app.py`` num subprocesso novo, numa porta livre, com
+uma pasta de dados temporária e sem credenciais (o destino só é inicializado
+no primeiro uso, por isso o ``--backend`` não deve pesar no arranque). Mede:
+
+    import_ms            ``import app`` num interpretador novo
+    ready_ms             desde o lançamento até o ``health`` responder
+    first_convert_ms     primeiro ``csv_to_xml`` (inclui criar o processo do pool)
+    warm_convert_ms      segundo ``csv_to_xml``, com o processo já criado
+
+Os valores saem em JSON (mínimo, mediana e máximo de cada medida); com
+``--output`` o resultado é acrescentado como uma linha ao ficheiro.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import xmlrpc.client
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+SERVER_DIR = HERE.parent
+sys.path.insert(0, str(SERVER_DIR))
+
+import synthetic  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_import(env):
+    code = "import time; t = time.perf_counter(); import app; print((time.perf_counter() - t) * 1000)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=SERVER_DIR, env=env,
+                         check=True, capture_output=True, text=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def measure_server(env, timeout=30):
+    port = free_port()
+    env = dict(env, XMLRPC_PORT=str(port))
+    client = xmlrpc.client.ServerProxy(f"http://127.0.0.1:{port}")
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "app.py"], cwd=SERVER_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    try:
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"o servidor terminou ao arrancar: {proc.stderr.read()[-500:]}")
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError("o servidor não ficou pronto a tempo")
+            try:
+                health = client.health()
+                break
+            except OSError:
+                time.sleep(0.002)
+        ready = time.perf_counter() - started
+
+        timings = []
+        for _ in range(2):
+            t = time.perf_counter()
+            result = client.csv_to_xml("startup.csv")
+            timings.append(time.perf_counter() - t)
+            if result.startswith("Erro"):
+                raise RuntimeError(result)
+        return {
+            "ready_ms": ready * 1000,
+            "first_convert_ms": timings[0] * 1000,
+            "warm_convert_ms": timings[1] * 1000,
+            "storage_initialized": health["storage"]["initialized"],
+        }
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def _summary(values):
+    return {"min": round(min(values), 1), "median": round(statistics.median(values), 1),
+            "max": round(max(values), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--backend", default="firestore", help="STORAGE_BACKEND (omissão: firestore)")
+    parser.add_argument("--workers", type=int, default=2, help="XMLRPC_PROCESS_WORKERS")
+    parser.add_argument("--rows", type=synthetic.parse_count, default=1000, help="linhas do CSV convertido")
+    parser.add_argument("--output", help="acrescenta o resultado como uma linha JSON a este ficheiro")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        synthetic.generate_csv(Path(tmp) / "startup.csv", args.rows, 8, 12)
+        env = dict(os.environ, DATAFOLDER=tmp, STORAGE_BACKEND=args.backend, METRICS_PORT="0",
+                   XMLRPC_PROCESS_WORKERS=str(args.workers), JOBS_DB=str(Path(tmp) / "jobs.sqlite"),
+                   FIREBASE_CREDENTIALS=str(Path(tmp) / "sem-chave.json"))
+        env.pop("STORAGE_PRELOAD", None)
+        runs = []
+        for i in range(args.runs):
+            run = {"import_ms": measure_import(env), **measure_server(env)}
+            runs.append(run)
+            print(f"  execução {i + 1}: import {run['import_ms']:.0f} ms, pronto em {run['ready_ms']:.0f} ms, "
+                  f"1ª conversão {run['first_convert_ms']:.0f} ms", file=sys.stderr)
+
+    report = {
+        "started": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "backend": args.backend,
+        "workers": args.workers,
+        "rows": args.rows,
+        "storage_initialized_at_ready": any(r["storage_initialized"] for r in runs),
+        **{key: _summary([r[key] for r in runs])
+           for key in ("import_ms", "ready_ms", "first_convert_ms", "warm_convert_ms")},
+    }
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(report) + "\n")
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Gerador de CSV sintético para os benchmarks.
+
+Uso:
+    python benchmarks/synthetic.py dados.csv --rows 10000000 --columns 12 --value-size 24
+
+As colunas alternam entre tipos (inteiro, decimal, data, booleano e texto),
+para exercitar a inferência de tipos do XSD como um ficheiro real. Os valores
+saem de um conjunto pré-gerado por coluna e são escritos aos blocos, por isso
+10M de linhas geram-se em segundos e não dominam o tempo do benchmark. Com a
+mesma semente o ficheiro é sempre igual.
+"""
+import argparse
+import csv
+import datetime
+import random
+import string
+
+KINDS = ("int", "decimal", "date", "bool", "text")
+_ALPHABET = string.ascii_letters + string.digits
+_POOL_SIZE = 4096
+_BLOCK = 10_000
+_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+
+def parse_count(value):
+    """``"10M"`` -> 10000000 (aceita também ``k`` e ``_``)."""
+    value = value.strip().lower().replace("_", "")
+    scale = _SUFFIXES.get(value[-1:], 1)
+    return int(float(value[:-1]) * scale) if scale > 1 else int(value)
+
+
+def _pool(kind, value_size, rnd):
+    if kind == "int":
+        return [str(rnd.randrange(10 ** min(value_size, 18))) for _ in range(_POOL_SIZE)]
+    if kind == "decimal":
+        digits = max(1, min(value_size, 15) - 3)
+        return [f"{rnd.randrange(10 ** digits)}.{rnd.randrange(100):02d}" for _ in range(_POOL_SIZE)]
+    if kind == "date":
+        start = datetime.date(2000, 1, 1)
+        return [(start + datetime.timedelta(days=rnd.randrange(9000))).isoformat() for _ in range(_POOL_SIZE)]
+    if kind == "bool":
+        return ["true", "false"]
+    return ["".join(rnd.choices(_ALPHABET, k=value_size)) for _ in range(_POOL_SIZE)]
+
+
+def generate_csv(path, rows, columns, value_size, seed=42, kinds=KINDS):
+    """Escreve ``path`` com ``rows`` linhas de ``columns`` colunas; devolve o
+    tamanho do ficheiro em bytes. ``value_size`` é o nº de caracteres dos
+    valores de texto (e o nº máximo de dígitos dos numéricos)."""
+    rnd = random.Random(seed)
+    column_kinds = [kinds[i % len(kinds)] for i in range(columns)]
+    header = [f"{kind}_{i}" for i, kind in enumerate(column_kinds)]
+    pools = [_pool(kind, value_size, rnd) for kind in column_kinds]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        remaining = rows
+        while remaining > 0:
+            n = min(_BLOCK, remaining)
+            writer.writerows(zip(*(rnd.choices(pool, k=n) for pool in pools)))
+            remaining -= n
+        return f.tell()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--rows", type=parse_count, default=100_000)
+    parser.add_argument("--columns", type=int, default=8)
+    parser.add_argument("--value-size", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--kinds", default=",".join(KINDS), help="tipos das colunas, em ciclo")
+    args = parser.parse_args()
+    size = generate_csv(args.path, args.rows, args.columns, args.value_size, args.seed,
+                        tuple(args.kinds.split(",")))
+    print(f"{args.path}: {args.rows} linhas, {size} bytes")
+
+
+if __name__ == "__main__":
+    main()
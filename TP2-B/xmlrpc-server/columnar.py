@@ -0,0 +1,210 @@
+import os
+from pathlib import Path
+
+import compressed
+from xsdgen import TYPE_ORDER, SchemaProfile, is_date
+
+# Ficheiro colunar (Arrow IPC) escrito ao lado do XML pelo csv_to_xml. As
+# etapas que só precisam dos registos (ingestão, inferência do XSD,
+# estatísticas) leem-no por memory-map em vez de voltarem a fazer o parse do
+# XML. É opcional: sem pyarrow, ou com COLUMNAR_SIDECAR=0, tudo continua a
+# usar o XML.
+#
+# O pyarrow só é importado no primeiro ``enabled()`` (custa ~0,2 s), para o
+# servidor e os processos do pool arrancarem sem esse peso.
+pa = pc = ipc = None
+_available = None
+
+SUFFIX = ".arrow"
+BATCH_ROWS = 64 * 1024
+
+# Mesmas regras de xsdgen._CHECKS, em expressões RE2 para o pyarrow
+_PATTERNS = {
+    "boolean": r"^(true|false|1|0)$",
+    "integer": r"^[+-]?[0-9]+$",
+    "decimal": r"^[+-]?([0-9]+(\.[0-9]*)?|\.[0-9]+)$",
+    "date": r"^[0-9]{4}-[0-9]{2}-[0-9]{2}$",
+}
+
+
+def _load():
+    global pa, pc, ipc, _available
+    if _available is None:
+        try:
+            import pyarrow
+            import pyarrow.compute
+            import pyarrow.ipc
+        except ImportError:
+            _available = False
+        else:
+            pa, pc, ipc = pyarrow, pyarrow.compute, pyarrow.ipc
+            _available = True
+    return _available
+
+
+def enabled():
+    return os.environ.get("COLUMNAR_SIDECAR", "1") != "0" and _load()
+
+
+def sidecar_path(xml_file):
+    # a.xml e a.xml.gz partilham o mesmo a.arrow
+    xml_file = Path(xml_file)
+    return xml_file.with_name(compressed.stem(xml_file) + SUFFIX)
+
+
+def fresh_sidecar(xml_file):
+    """Caminho do ficheiro colunar de ``xml_file`` se existir e for posterior
+    ao XML (um XML regenerado ou editado invalida-o); caso contrário None."""
+    if not enabled():
+        return None
+    path = sidecar_path(xml_file)
+    try:
+        if path.stat().st_mtime_ns >= Path(xml_file).stat().st_mtime_ns:
+            return path
+    except FileNotFoundError:
+        pass
+    return None
+
+
+class SidecarWriter:
+    """Recebe os registos (lista de valores, pela ordem das colunas) à medida
+    que o XML é escrito e grava-os em lotes de ``BATCH_ROWS`` linhas.
+
+    Escreve num ficheiro temporário que só é renomeado em ``close()``, depois
+    de o XML estar completo, para o sidecar ficar sempre mais recente do que
+    o XML correspondente.
+    """
+
+    def __init__(self, path, batch_rows=BATCH_ROWS):
+        self.path = Path(path)
+        self.tmp_path = self.path.with_name(self.path.name + ".tmp")
+        self.batch_rows = batch_rows
+        self.columns = None
+        self._buffers = None
+        self._rows = 0
+        self._writer = None
+
+    def append(self, columns, values):
+        if self._writer is None:
+            self.columns = list(columns)
+            schema = pa.schema([(name, pa.string()) for name in self.columns])
+            self._writer = ipc.new_file(str(self.tmp_path), schema)
+            self._buffers = [[] for _ in self.columns]
+        for buf, value in zip(self._buffers, values):
+            buf.append(value)
+        self._rows += 1
+        if self._rows >= self.batch_rows:
+            self._flush()
+
+    def _flush(self):
+        if self._rows:
+            arrays = [pa.array(buf, type=pa.string()) for buf in self._buffers]
+            self._writer.write_batch(pa.record_batch(arrays, names=self.columns))
+            self._buffers = [[] for _ in self.columns]
+            self._rows = 0
+
+    def close(self):
+        if self._writer is None:
+            # Documento sem registos: não há sidecar (e um antigo deixa de valer)
+            self.path.unlink(missing_ok=True)
+            return
+        self._flush()
+        self._writer.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+        self.tmp_path.unlink(missing_ok=True)
+
+
+def build_from_xml(xml_file, records):
+    """Cria o sidecar de um XML já existente a partir dos seus ``records``
+    (dicts, ex.: ``ingest.iter_records``) e devolve o caminho."""
+    writer = SidecarWriter(sidecar_path(xml_file))
+    try:
+        for record in records:
+            if writer.columns is None:
+                writer.append(record.keys(), record.values())
+            else:
+                writer.append(writer.columns, [record.get(name, "") for name in writer.columns])
+    except Exception:
+        writer.abort()
+        raise
+    writer.close()
+    return writer.path
+
+
+def read_table(path):
+    """Tabela Arrow do sidecar, mapeada em memória (sem cópia dos dados)."""
+    with pa.memory_map(str(path)) as source:
+        return ipc.open_file(source).read_all()
+
+
+def iter_records(path):
+    """Registos do sidecar como dicts (o mesmo formato de ingest.iter_records),
+    convertidos lote a lote."""
+    with pa.memory_map(str(path)) as source:
+        reader = ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            yield from reader.get_batch(i).to_pylist()
+
+
+def count_rows(path):
+    with pa.memory_map(str(path)) as source:
+        reader = ipc.open_file(source)
+        return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+
+
+def _candidates(values):
+    """Tipos de xsdgen.TYPE_ORDER compatíveis com todos os ``values`` (não vazios)."""
+    candidates = []
+    for t in TYPE_ORDER:
+        if len(values) and not pc.all(pc.match_substring_regex(values, _PATTERNS[t])).as_py():
+            continue
+        if t == "date" and len(values):
+            # O padrão aceita datas impossíveis (2024-02-30) e o strptime do
+            # Arrow também; cada valor distinto passa pela mesma verificação
+            # do xsdgen, para o XSD sair igual ao inferido a partir do XML
+            if not all(is_date(v) for v in pc.unique(values).to_pylist()):
+                continue
+        candidates.append(t)
+    return candidates
+
+
+def profile_from_table(table):
+    """``SchemaProfile`` equivalente ao recolhido registo a registo, calculado
+    com operações vetorizadas sobre cada coluna."""
+    profile = SchemaProfile()
+    profile.records = table.num_rows
+    for name in table.column_names:
+        column = table.column(name)
+        stats = profile.column(name)
+        stats.present = table.num_rows
+        non_empty = pc.filter(column, pc.not_equal(column, ""))
+        stats.empty = table.num_rows - len(non_empty)
+        stats.candidates = _candidates(non_empty)
+        stats.word_boolean = pc.any(pc.is_in(non_empty, value_set=pa.array(["true", "false"]))).as_py() or False
+    return profile
+
+
+def column_stats(table, profile):
+    """Estatísticas por coluna: valores vazios, distintos e, para colunas
+    numéricas, mínimo/máximo/média. Números em float (limite de 32 bits do
+    XML-RPC)."""
+    result = []
+    for name, xsd_type, _, _ in profile.columns():
+        column = table.column(name)
+        non_empty = pc.filter(column, pc.not_equal(column, ""))
+        stats = {
+            "name": name,
+            "type": xsd_type,
+            "empty": float(table.num_rows - len(non_empty)),
+            "distinct": float(pc.count_distinct(non_empty).as_py()),
+        }
+        if xsd_type in ("integer", "decimal") and len(non_empty):
+            numbers = pc.cast(non_empty, pa.float64())
+            min_max = pc.min_max(numbers).as_py()
+            stats.update(min=min_max["min"], max=min_max["max"], mean=pc.mean(numbers).as_py())
+        result.append(stats)
+    return result
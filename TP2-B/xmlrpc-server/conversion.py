@@ -0,0 +1,405 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import as_completed
+from fnmatch import fnmatchcase
+from pathlib import Path
+import csv
+from xml.dom import minidom
+import xml.etree.ElementTree as ET
+from lxml import etree
+import columnar
+import compressed
+from xsdgen import SchemaProfile, build_xsd
+
+# Funções de conversão/validação. Não dependem do Firestore, por isso podem
+# correr nos processos de trabalho do servidor sem inicializar o firebase_admin.
+
+# Pasta partilhada com a xml-tool (DATAFOLDER permite apontar para outra, p.ex. nos benchmarks)
+DATAFOLDER = Path(os.environ.get("DATAFOLDER", "/data/shared")).resolve()
+
+# Frequência (em registos) com que o callback de progresso é chamado
+PROGRESS_EVERY = 1000
+
+# Os CSV podem vir comprimidos (.csv.gz, .csv.zst) e o XML pode ser escrito
+# comprimido (.xml.gz, .xml.zst); tudo é lido e escrito em streaming pelo
+# compressed.py. O XSD e o sidecar colunar ficam sempre sem compressão.
+
+def xml_codec(csv_file):
+    """Sufixo de compressão do XML gerado a partir de ``csv_file``:
+    ``XML_COMPRESSION`` (none, gz, zst) ou, com ``auto`` (omissão), o mesmo
+    do CSV."""
+    setting = os.environ.get("XML_COMPRESSION", "auto")
+    try:
+        suffix = compressed.codec(csv_file) if setting.lower() == "auto" else compressed.parse_codec(setting)
+    except ValueError:
+        raise ValueError(f"XML_COMPRESSION inválido: {setting}") from None
+    if not compressed.available(suffix):
+        raise ValueError("compressão zstd indisponível (instale o pacote zstandard)")
+    return suffix
+
+def csv_to_xml(csv_filename, progress=None, engine=None):
+    try:
+        # valida nome simples (evita path traversal)
+        if Path(csv_filename).name != csv_filename:
+            return "Erro: nome de arquivo inválido"
+        csv_file = DATAFOLDER / csv_filename
+        if not csv_file.exists():
+            return "Erro: arquivo CSV não encontrado"
+
+        # Uma só passagem: o XSD sai do perfil recolhido enquanto o XML é escrito,
+        # sem voltar a ler o XML com iterparse
+        stem = compressed.stem(csv_file)
+        xml_file = DATAFOLDER / (stem + ".xml" + xml_codec(csv_file))
+        profile = SchemaProfile()
+        sidecar = columnar.SidecarWriter(columnar.sidecar_path(xml_file)) if columnar.enabled() else None
+        try:
+            convert_csv_file(csv_file, xml_file, engine=engine, progress=progress, profile=profile,
+                             sidecar=sidecar)
+        except Exception:
+            if sidecar is not None:
+                sidecar.abort()
+            raise
+        if sidecar is not None:
+            sidecar.close()
+        # Um XML de uma conversão anterior com outra compressão ficaria desatualizado
+        for old in compressed.variants(DATAFOLDER, stem + ".xml"):
+            if old != xml_file:
+                old.unlink()
+
+        return build_xsd(profile.columns(), DATAFOLDER / (stem + ".xsd"))
+    except Exception as e:
+        return f"Erro ao converter CSV: {e}"
+
+def _batch_files(spec):
+    """CSVs de ``spec``: lista de nomes ou um padrão glob (``*.csv``,
+    ``vendas_2024*.csv``) relativo à pasta partilhada. O padrão também
+    apanha os CSV comprimidos pelo nome sem o sufixo (``*.csv`` inclui
+    ``a.csv.gz``)."""
+    if isinstance(spec, str):
+        if "/" in spec or "\\" in spec or ".." in spec:
+            raise ValueError("o padrão não pode conter caminhos")
+        return sorted(p for p in DATAFOLDER.iterdir()
+                      if p.is_file() and compressed.has_extension(p, ".csv")
+                      and (fnmatchcase(p.name, spec) or fnmatchcase(compressed.base_name(p), spec)))
+    files = []
+    for name in spec:
+        if Path(name).name != name or not compressed.has_extension(name, ".csv"):
+            raise ValueError(f"nome de arquivo inválido: {name}")
+        files.append(DATAFOLDER / name)
+    return files
+
+
+def _up_to_date(csv_file):
+    """XML (com a compressão que csv_to_xml usaria) e XSD existem e são mais
+    recentes que o CSV."""
+    try:
+        stem = compressed.stem(csv_file)
+        outputs = (stem + ".xml" + xml_codec(csv_file), stem + ".xsd")
+        csv_mtime = csv_file.stat().st_mtime
+        return all((DATAFOLDER / name).stat().st_mtime >= csv_mtime for name in outputs)
+    except (FileNotFoundError, ValueError):
+        return False
+
+
+def csv_to_xml_many(spec, force=False, progress=None, executor=None):
+    """Converte vários CSV (``csv_to_xml`` para cada um), repartidos pelos
+    processos de ``executor`` (sequencialmente sem ele).
+
+    Os ficheiros cujo XML e XSD já são mais recentes que o CSV são saltados,
+    a não ser com ``force``. O progresso conta ficheiros concluídos e bytes de
+    CSV; ``progress.item(nome, estado, mensagem)``, quando existe, recebe cada
+    ficheiro assim que termina. Devolve as listas ``converted``, ``skipped`` e
+    ``failed`` (nome e erro) e o tempo total.
+    """
+    started = time.perf_counter()
+    try:
+        files = _batch_files(spec)
+    except ValueError as e:
+        return f"Erro: {e}"
+    missing = [f.name for f in files if not f.exists()]
+    if missing:
+        return f"Erro: arquivo CSV não encontrado: {', '.join(missing[:5])}"
+    if not files:
+        return "Erro: nenhum arquivo CSV corresponde ao pedido"
+
+    report = getattr(progress, "item", None)
+    summary = {"converted": [], "skipped": [], "failed": []}
+    pending = []
+    for f in files:
+        if not force and _up_to_date(f):
+            summary["skipped"].append(f.name)
+            if report is not None:
+                report(f.name, "skipped", "XML e XSD já atualizados")
+        else:
+            pending.append(f)
+
+    total = sum(f.stat().st_size for f in pending)
+    done_files = done_bytes = 0
+    if progress is not None:
+        progress(0, 0, total)
+
+    def finished(f, result):
+        nonlocal done_files, done_bytes
+        failed = isinstance(result, str) and result.startswith("Erro")
+        if failed:
+            summary["failed"].append({"name": f.name, "error": result})
+        else:
+            summary["converted"].append(f.name)
+        done_files += 1
+        done_bytes += f.stat().st_size
+        if report is not None:
+            report(f.name, "failed" if failed else "done", result if failed else "")
+        if progress is not None:
+            progress(done_files, done_bytes, total)
+
+    if executor is None:
+        for f in pending:
+            finished(f, csv_to_xml(f.name))
+    else:
+        futures = {executor.submit(csv_to_xml, f.name): f for f in pending}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = f"Erro ao converter CSV: {e}"
+            finished(futures[future], result)
+
+    summary["converted"].sort()
+    summary["failed"].sort(key=lambda item: item["name"])
+    summary["elapsed"] = time.perf_counter() - started
+    return summary
+
+
+def convert_csv_file(csv_file, xml_file, engine=None, progress=None, profile=None, sidecar=None):
+    """Converte ``csv_file`` em ``xml_file`` e devolve o número de registos.
+
+    ``engine`` (ou ``CSV_XML_ENGINE``) escolhe o escritor: ``stream`` (omissão)
+    escreve registo a registo e usa memória constante; ``tree`` é o método
+    antigo, que monta a ElementTree inteira antes de escrever. Se for dado um
+    ``SchemaProfile``, os valores de cada coluna são registados nele; se for
+    dado um ``columnar.SidecarWriter``, recebe também cada registo.
+
+    O XML é escrito em ``<nome>.tmp`` e só substitui ``xml_file`` no fim,
+    para uma conversão que falhe a meio não estragar o XML anterior.
+    """
+    engine = engine or os.environ.get("CSV_XML_ENGINE", "stream")
+    writer = _write_xml_tree if engine == "tree" else _write_xml_stream
+    total = Path(csv_file).stat().st_size
+    xml_file = Path(xml_file)
+    tmp_file = xml_file.with_name(xml_file.name + ".tmp")
+    try:
+        with compressed.open_text(csv_file, encoding='utf-8', newline='') as f:
+            rows = _rows_with_progress(csv.DictReader(f), f, total, progress)
+            records = writer(rows, tmp_file, profile or SchemaProfile(), sidecar,
+                             codec=compressed.codec(xml_file))
+    except BaseException:
+        tmp_file.unlink(missing_ok=True)
+        raise
+    os.replace(tmp_file, xml_file)
+    return records
+
+def _rows_with_progress(reader, f, total, progress):
+    n = 0
+    for n, row in enumerate(reader, 1):
+        yield row
+        if progress is not None and n % PROGRESS_EVERY == 0:
+            progress(n, compressed.position(f.buffer), total)
+    if progress is not None:
+        progress(n, total, total)
+
+def _write_xml_stream(rows, xml_file, profile, sidecar=None, codec=None):
+    """Escreve o XML em streaming com ``lxml.etree.xmlfile``: cada <record> é
+    serializado e descartado logo a seguir, com a mesma identação de
+    ``ET.indent``."""
+    tags = {}
+    names = None
+    records = 0
+    with compressed.open_write(xml_file, suffix=codec) as out, \
+            etree.xmlfile(out, encoding='utf-8', buffered=True) as xf:
+        xf.write_declaration()
+        with xf.element("data"):
+            for row in rows:
+                record_el = etree.Element("record")
+                child = None
+                values = []
+                for key, value in row.items():
+                    column = tags.get(key)
+                    if column is None:
+                        tag = key.strip().replace(" ", "_")
+                        column = tags[key] = (tag, profile.column(tag))
+                    text = (value or "").strip()
+                    child = etree.SubElement(record_el, column[0])
+                    child.text = text
+                    child.tail = "\n    "
+                    column[1].add(text)
+                    values.append(text)
+                if child is not None:
+                    record_el.text = "\n    "
+                    child.tail = "\n  "
+                if sidecar is not None:
+                    if names is None:
+                        names = [tags[key][0] for key in row]
+                    sidecar.append(names, values)
+                xf.write("\n  ", record_el)
+                records += 1
+                profile.records += 1
+            if records:
+                xf.write("\n")
+    return records
+
+def _write_xml_tree(rows, xml_file, profile, sidecar=None, codec=None):
+    """Escritor original: monta o documento inteiro em memória."""
+    root = ET.Element("data")
+    for row in rows:
+        record_el = ET.SubElement(root, "record")
+        profile.records += 1
+        names, values = [], []
+        for key, value in row.items():
+            tag = key.strip().replace(" ", "_")
+            text = (value or "").strip()
+            ET.SubElement(record_el, tag).text = text
+            profile.column(tag).add(text)
+            names.append(tag)
+            values.append(text)
+        if sidecar is not None:
+            sidecar.append(names, values)
+
+    tree = ET.ElementTree(root)
+    # Tenta identação nativa (Python 3.9+)
+    try:
+        ET.indent(tree, space="  ")
+        xml_bytes = ET.tostring(root, encoding='utf-8')
+    except AttributeError:
+        # Fallback para pretty print usando minidom
+        rough = ET.tostring(root, encoding='utf-8')
+        reparsed = minidom.parseString(rough)
+        xml_bytes = reparsed.toprettyxml(indent="  ", encoding="utf-8")
+
+    with compressed.open_write(xml_file, suffix=codec) as out:
+        out.write(xml_bytes)
+    return len(root)
+    
+def xml_to_xsd(xml_filename, progress=None):
+    try:
+        xml_file = DATAFOLDER / xml_filename
+        if not xml_file.exists():
+            return "Erro: arquivo XML não encontrado"
+
+        xsd_file = DATAFOLDER / (compressed.stem(xml_file) + ".xsd")
+        sidecar = columnar.fresh_sidecar(xml_file)
+        if sidecar is not None:
+            # Mesmo perfil, calculado por colunas sem voltar a ler o XML
+            profile = columnar.profile_from_table(columnar.read_table(sidecar))
+            if progress is not None:
+                progress(profile.records, xml_file.stat().st_size, xml_file.stat().st_size)
+            return build_xsd(profile.columns(), xsd_file)
+
+        # Perfil das colunas (ordem de aparecimento, tipos e presença)
+        profile = SchemaProfile()
+        total = xml_file.stat().st_size
+        with compressed.open_read(xml_file) as fh:
+            for event, elem in etree.iterparse(fh, events=("end",), tag="record"):
+                profile.records += 1
+                for child in elem:
+                    profile.column(child.tag).add((child.text or "").strip())
+                # free memory for large files
+                elem.clear()
+                if progress is not None and profile.records % PROGRESS_EVERY == 0:
+                    progress(profile.records, compressed.position(fh), total)
+        if progress is not None:
+            progress(profile.records, total, total)
+
+        return build_xsd(profile.columns(), xsd_file)
+    except Exception as e:
+        return f"Erro ao converter XML para XSD: {e}"
+
+class SchemaCache:
+    """Cache LRU de ``etree.XMLSchema`` já compilados.
+
+    A chave inclui o mtime e o tamanho do XSD, por isso um XSD regenerado é
+    recompilado automaticamente. ``maxsize=0`` desativa a cache.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._schemas = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, xsd_file):
+        st = os.stat(xsd_file)
+        path = str(xsd_file)
+        key = (path, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            schema = self._schemas.get(key)
+            if schema is not None:
+                self._schemas.move_to_end(key)
+                self.hits += 1
+                return schema
+            self.misses += 1
+
+        # Compila fora do lock para não bloquear validações de outros XSD
+        schema = etree.XMLSchema(etree.parse(path))
+        if self.maxsize <= 0:
+            return schema
+        with self._lock:
+            # Versões antigas do mesmo ficheiro já não servem
+            for old in [k for k in self._schemas if k[0] == path and k != key]:
+                del self._schemas[old]
+            self._schemas[key] = schema
+            while len(self._schemas) > self.maxsize:
+                self._schemas.popitem(last=False)
+                self.evictions += 1
+        return schema
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._schemas),
+                "maxsize": self.maxsize,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+schema_cache = SchemaCache(int(os.environ.get("XSD_CACHE_SIZE", 32)))
+
+def schema_cache_stats():
+    return schema_cache.stats()
+
+def validate_xml_against_xsd(xml_filename, xsd_filename, progress=None):
+    try:
+        xml_file = DATAFOLDER / xml_filename
+        xsd_file = DATAFOLDER / xsd_filename
+
+        if not xml_file.exists():
+            return "Erro: arquivo XML não encontrado"
+        if not xsd_file.exists():
+            return "Erro: arquivo XSD não encontrado"
+
+
+        schemas = schema_cache.get(xsd_file)
+        total = xml_file.stat().st_size
+        records = 0
+        # Coleta tags presentes no XML
+        with compressed.open_read(xml_file) as fh:
+            for _, elem in etree.iterparse(fh, events=("end",), schema=schemas, huge_tree=True):
+                if elem.tag == "record":
+                    records += 1
+                    if progress is not None and records % PROGRESS_EVERY == 0:
+                        progress(records, compressed.position(fh), total)
+                elem.clear()
+        if progress is not None:
+            progress(records, total, total)
+        return "XML é válido contra o XSD"
+    except ImportError:
+        return "Erro: biblioteca 'xmlschema' não instalada"
+    except Exception as e:
+        return f"Erro ao validar XML contra XSD: {e}"
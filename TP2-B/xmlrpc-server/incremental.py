@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import re
+import threading
+
+import ingest
+
+# Ingestão incremental: cada registo recebe um ID determinístico (valor de uma
+# coluna-chave ou hash do conteúdo), os registos são agrupados em blocos
+# definidos pelo conteúdo e o manifesto da coleção guarda o hash de cada bloco
+# já gravado. Numa nova execução só os blocos novos/alterados são escritos
+# (``set`` com o mesmo ID substitui o documento) e os IDs que desapareceram
+# são apagados, por isso o custo é proporcional às diferenças.
+#
+# Os limites dos blocos dependem do hash de cada registo e não da posição,
+# por isso inserir ou remover uma linha só altera o bloco onde ela está.
+
+MANIFEST_VERSION = 1
+_INVALID_ID = re.compile(r"/|^\.\.?$|^__.*__$")
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+class Chunk(list):
+    """Lote de ``(doc_id, data)`` com o hash do seu conteúdo."""
+    digest = None
+
+
+def _row_hash(data):
+    raw = json.dumps(data, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def document_id(value):
+    """ID do documento a partir do valor da chave; valores que o Firestore
+    não aceita (com ``/``, ``.``, ``__x__`` ou demasiado longos) são
+    substituídos pelo seu hash."""
+    if value and len(value.encode("utf-8")) <= 1500 and not _INVALID_ID.search(value):
+        return value
+    return "k" + hashlib.blake2b(value.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def keyed_records(records, key=None, stats=None):
+    """Acrescenta a cada registo ``(doc_id, hash_do_registo)``.
+
+    Sem ``key`` o ID é o hash do conteúdo (linhas repetidas recebem IDs
+    diferentes pela ordem de ocorrência); com ``key`` é o valor dessa coluna.
+    """
+    seen = {}
+    for data in records:
+        row_hash = _row_hash(data)
+        if key:
+            if key not in data:
+                raise KeyError(f"coluna-chave '{key}' não existe no registo")
+            doc_id = document_id(data[key])
+            if doc_id in seen and stats is not None:
+                stats["duplicate_keys"] += 1
+            seen[doc_id] = True
+        else:
+            n = seen.get(row_hash, 0)
+            seen[row_hash] = n + 1
+            doc_id = row_hash if n == 0 else f"{row_hash}-{n}"
+        yield doc_id, row_hash, data
+
+
+def content_chunks(keyed, average=128, maximum=ingest.FIRESTORE_MAX_BATCH):
+    """Agrupa ``(doc_id, hash, data)`` em ``Chunk`` com em média ``average``
+    registos: um bloco termina quando o hash do registo cai na fração
+    1/average, ou ao atingir ``maximum``."""
+    chunk = Chunk()
+    h = hashlib.blake2b(digest_size=16)
+    for doc_id, row_hash, data in keyed:
+        chunk.append((doc_id, data))
+        h.update(f"{doc_id}\0{row_hash}\n".encode("utf-8"))
+        if int(row_hash[:8], 16) % average == 0 or len(chunk) >= maximum:
+            chunk.digest = h.hexdigest()
+            yield chunk
+            chunk = Chunk()
+            h = hashlib.blake2b(digest_size=16)
+    if chunk:
+        chunk.digest = h.hexdigest()
+        yield chunk
+
+
+def load_manifest(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return {"version": MANIFEST_VERSION, "key": None, "chunks": {}, "pending_delete": []}
+    return manifest
+
+
+def save_manifest(path, manifest):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+
+
+def _collection_lock(key):
+    with _locks_guard:
+        return _locks.setdefault(key, threading.Lock())
+
+
+def run_incremental(store, collection_name, records, manifest_path, key=None,
+                    batch_size=ingest.DEFAULT_BATCH_SIZE, workers=ingest.DEFAULT_WORKERS,
+                    queue_depth=None, progress=None):
+    """Grava ``records`` em ``collection_name`` escrevendo só os blocos que
+    mudaram desde a última execução registada em ``manifest_path``.
+
+    Devolve as estatísticas de ``ingest.run_pipeline`` (``records`` e
+    ``written`` contam só os blocos escritos) mais ``skipped_records``,
+    ``skipped_chunks``, ``deleted`` e ``duplicate_keys``. Só os blocos
+    gravados com sucesso entram no manifesto, por isso repetir depois de uma
+    falha escreve apenas o que faltou.
+    """
+    batch_size = ingest.clamp_batch_size(batch_size, store.max_batch)
+    with _collection_lock((store.name, collection_name)):
+        old = load_manifest(manifest_path)
+        old_chunks = old["chunks"]
+        new_chunks = {}
+        all_ids = set()
+        extra = {"skipped_records": 0, "skipped_chunks": 0, "deleted": 0, "duplicate_keys": 0}
+
+        def changed_chunks():
+            keyed = keyed_records(records, key, extra)
+            for chunk in content_chunks(keyed, average=max(1, batch_size // 4), maximum=batch_size):
+                all_ids.update(doc_id for doc_id, _ in chunk)
+                if chunk.digest in old_chunks:
+                    new_chunks[chunk.digest] = old_chunks[chunk.digest]
+                    extra["skipped_records"] += len(chunk)
+                    extra["skipped_chunks"] += 1
+                    continue
+                yield chunk
+
+        def on_batch(chunk, error):
+            if error is None:
+                new_chunks[chunk.digest] = [doc_id for doc_id, _ in chunk]
+
+        try:
+            stats = ingest.run_pipeline(
+                store, collection_name, None, batch_size=batch_size, workers=workers,
+                queue_depth=queue_depth, progress=progress, batches=changed_chunks(), on_batch=on_batch,
+            )
+        except Exception:
+            # Parse interrompido: guarda o que já foi escrito, sem apagar nada
+            save_manifest(manifest_path, dict(old, chunks={**old_chunks, **new_chunks}))
+            raise
+
+        # IDs que já não existem no ficheiro (incluindo os que ficaram por
+        # apagar numa execução anterior)
+        stale = set(old.get("pending_delete", []))
+        for ids in old_chunks.values():
+            stale.update(ids)
+        stale -= all_ids
+        deleted, failed = ingest.delete_documents(store, collection_name, sorted(stale), batch_size)
+        extra["deleted"] = deleted
+
+        save_manifest(manifest_path, {
+            "version": MANIFEST_VERSION,
+            "key": key,
+            "chunks": new_chunks,
+            "pending_delete": failed,
+        })
+    stats.update(extra)
+    return stats
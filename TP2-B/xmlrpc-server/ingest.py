@@ -0,0 +1,197 @@
+import queue
+import threading
+import time
+from lxml import etree
+import instrumentation
+
+# Limite de operações por WriteBatch imposto pelo Firestore (os outros
+# destinos indicam o seu em ``max_batch``)
+FIRESTORE_MAX_BATCH = 500
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_WORKERS = 4
+
+
+def iter_records(xml_file):
+    """Percorre os <record> do XML em streaming, devolvendo um dict por registo.
+
+    ``xml_file`` pode ser um caminho ou um ficheiro binário já aberto.
+    """
+    source = xml_file if hasattr(xml_file, "read") else str(xml_file)
+    for _, elem in etree.iterparse(source, events=("end",), tag="record"):
+        data = {}
+        for child in elem:
+            data[child.tag] = (child.text or "").strip()
+        yield data
+        # Liberta memória do elemento já processado e dos irmãos anteriores
+        elem.clear()
+        parent = elem.getparent()
+        if parent is not None:
+            while elem.getprevious() is not None:
+                del parent[0]
+
+
+def chunked(records, size):
+    """Agrupa um iterável de registos em listas de até ``size`` elementos."""
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def clamp_batch_size(batch_size, limit=FIRESTORE_MAX_BATCH):
+    return max(1, min(int(batch_size), limit))
+
+
+def delete_documents(store, collection_name, doc_ids, batch_size=DEFAULT_BATCH_SIZE):
+    """Apaga ``doc_ids`` em lotes de até ``batch_size`` operações e devolve
+    ``(apagados, ids_que_falharam)``."""
+    deleted, failed = 0, []
+    for ids in chunked(doc_ids, clamp_batch_size(batch_size, store.max_batch)):
+        try:
+            store.delete(collection_name, ids)
+            deleted += len(ids)
+        except Exception:
+            failed.extend(ids)
+    return deleted, failed
+
+
+def _written(error):
+    """Registos gravados de um lote que falhou (``storage.PartialWriteError``
+    indica quantos; qualquer outro erro conta o lote inteiro como perdido)."""
+    return getattr(error, "written", 0)
+
+
+def _failed(first, batch_records, error):
+    return {"first": first, "last": first + len(batch_records) - 1, "written": _written(error),
+            "error": str(error)}
+
+
+def write_batches(store, collection_name, records, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """Grava ``records`` na coleção em lotes de até ``batch_size`` operações
+    (limitado a ``store.max_batch``).
+
+    Cada lote é uma única escrita no destino (uma ida à rede em vez de uma por
+    registo). Um lote que falhe não interrompe a ingestão: fica em
+    ``failed_batches`` com o intervalo de registos afetado, para poder ser
+    repetido, e quantos deles chegaram a ser gravados (``written``; escritas
+    em massa não ordenadas podem falhar só em parte). ``store`` é um dos destinos de ``storage.py``.
+    """
+    batch_size = clamp_batch_size(batch_size, store.max_batch)
+    stats = {"records": 0, "written": 0, "batches": 0, "failed_batches": []}
+
+    for batch_records in chunked(records, batch_size):
+        first = stats["records"]
+        stats["records"] += len(batch_records)
+        stats["batches"] += 1
+        try:
+            store.write(collection_name, batch_records)
+            stats["written"] += len(batch_records)
+        except Exception as e:
+            stats["written"] += _written(e)
+            stats["failed_batches"].append(_failed(first, batch_records, e))
+        if progress is not None:
+            progress(stats)
+
+    return stats
+
+
+def run_pipeline(store, collection_name, records, batch_size=DEFAULT_BATCH_SIZE,
+                 workers=DEFAULT_WORKERS, queue_depth=None, progress=None, batches=None, on_batch=None):
+    """Versão concorrente de ``write_batches``.
+
+    Uma thread produtora consome ``records`` (o iterparse) e coloca lotes numa
+    fila limitada a ``queue_depth`` lotes; ``workers`` threads fazem os commits
+    em paralelo. Quando a fila enche a produtora bloqueia, pelo que a memória
+    fica limitada a ``(queue_depth + workers) * batch_size`` registos.
+
+    Devolve as mesmas contagens que ``write_batches`` mais ``rows_per_sec`` e
+    ``timings`` (segundos por etapa; ``write`` é a soma dos commits de todas
+    as threads, ``wall`` o tempo total). Se o parse falhar, os lotes já em fila
+    são gravados e a exceção é relançada no fim.
+
+    ``batches`` substitui o agrupamento por omissão (``chunked(records,
+    batch_size)``) por lotes já formados; ``on_batch(lote, erro)`` é chamado
+    depois de cada commit (``erro`` é None se correu bem).
+    """
+    batch_size = clamp_batch_size(batch_size, store.max_batch)
+    workers = max(1, int(workers))
+    queue_depth = max(1, int(queue_depth or 2 * workers))
+
+    q = queue.Queue(maxsize=queue_depth)
+    lock = threading.Lock()
+    stats = {"records": 0, "written": 0, "batches": 0, "failed_batches": []}
+    timings = {"parse": 0.0, "queue_wait": 0.0, "write": 0.0}
+    parse_error = []
+
+    def produce():
+        first = 0
+        started = time.perf_counter()
+        try:
+            for batch_records in batches if batches is not None else chunked(records, batch_size):
+                before_put = time.perf_counter()
+                q.put((first, batch_records))
+                timings["queue_wait"] += time.perf_counter() - before_put
+                first += len(batch_records)
+        except Exception as e:
+            parse_error.append(e)
+        finally:
+            timings["parse"] = time.perf_counter() - started - timings["queue_wait"]
+            for _ in range(workers):
+                q.put(None)
+
+    def consume():
+        while True:
+            item = q.get()
+            if item is None:
+                return
+            first, batch_records = item
+            started = time.perf_counter()
+            try:
+                store.write(collection_name, batch_records)
+                error = None
+            except Exception as e:
+                error = e
+            elapsed = time.perf_counter() - started
+            instrumentation.observe_stage("ingest_write", elapsed)
+            with lock:
+                timings["write"] += elapsed
+                stats["records"] += len(batch_records)
+                stats["batches"] += 1
+                if error is None:
+                    stats["written"] += len(batch_records)
+                else:
+                    stats["written"] += _written(error)
+                    stats["failed_batches"].append(_failed(first, batch_records, error))
+                if on_batch is not None:
+                    on_batch(batch_records, error)
+                if progress is not None:
+                    progress(stats)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=produce, name="ingest-parser", daemon=True)]
+    threads += [threading.Thread(target=consume, name=f"ingest-writer-{i}", daemon=True)
+                for i in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    stats["failed_batches"].sort(key=lambda b: b["first"])
+    timings["wall"] = wall
+    instrumentation.observe_stage("ingest_parse", timings["parse"])
+    instrumentation.add_rows("ingest_written", stats["written"])
+    if stats["failed_batches"]:
+        instrumentation.count_error("stage", "ingest_write", "failed_batch")
+    stats["timings"] = timings
+    stats["rows_per_sec"] = stats["written"] / wall if wall > 0 else 0.0
+    stats["workers"] = workers
+    stats["queue_depth"] = queue_depth
+
+    if parse_error:
+        raise parse_error[0]
+    return stats
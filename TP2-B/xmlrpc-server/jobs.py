@@ -0,0 +1,287 @@
+import json
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import instrumentation
+
+# Estados possíveis de um job
+QUEUED, RUNNING, DONE, FAILED, INTERRUPTED = "queued", "running", "done", "failed", "interrupted"
+FINISHED = (DONE, FAILED, INTERRUPTED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    kind        TEXT NOT NULL,
+    args        TEXT NOT NULL,
+    state       TEXT NOT NULL,
+    rows        INTEGER NOT NULL DEFAULT 0,
+    bytes_read  INTEGER NOT NULL DEFAULT 0,
+    bytes_total INTEGER NOT NULL DEFAULT 0,
+    result      TEXT,
+    error       TEXT,
+    created     REAL NOT NULL,
+    started     REAL,
+    finished    REAL
+)
+"""
+
+# Conclusão de cada ficheiro de um job em lote (csv_to_xml_many), pela ordem
+# em que terminam; ``seq`` permite ao cliente pedir só as novas
+ITEMS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_items (
+    seq      INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id   TEXT NOT NULL,
+    name     TEXT NOT NULL,
+    state    TEXT NOT NULL,
+    message  TEXT NOT NULL,
+    finished REAL NOT NULL
+)
+"""
+
+
+class JobStore:
+    """Persistência dos jobs num ficheiro SQLite local.
+
+    Cada operação abre a sua própria ligação, por isso a mesma base pode ser
+    usada pelas threads do servidor e pelos processos do pool de conversão.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(SCHEMA)
+            conn.execute(ITEMS_SCHEMA)
+            conn.execute("CREATE INDEX IF NOT EXISTS job_items_job ON job_items (job_id, seq)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _update(self, job_id, **fields):
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+
+    def create(self, kind, args):
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, args, state, created) VALUES (?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(args), QUEUED, time.time()),
+            )
+        return job_id
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["args"] = json.loads(job["args"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def start(self, job_id):
+        self._update(job_id, state=RUNNING, started=time.time())
+
+    def progress(self, job_id, rows, bytes_read, bytes_total):
+        self._update(job_id, rows=rows, bytes_read=bytes_read, bytes_total=bytes_total)
+
+    def add_item(self, job_id, name, state, message=""):
+        with self._connect() as conn:
+            conn.execute("INSERT INTO job_items (job_id, name, state, message, finished) VALUES (?, ?, ?, ?, ?)",
+                         (job_id, name, state, message, time.time()))
+
+    def items(self, job_id, after=0):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT seq, name, state, message FROM job_items WHERE job_id = ? AND seq > ? "
+                                "ORDER BY seq", (job_id, after)).fetchall()
+        return [dict(r) for r in rows]
+
+    def finish(self, job_id, result, failed=False):
+        self._update(job_id, state=FAILED if failed else DONE, result=json.dumps(result),
+                     finished=time.time())
+
+    def fail(self, job_id, error):
+        self._update(job_id, state=FAILED, error=error, finished=time.time())
+
+    def recover(self):
+        """Chamado no arranque: jobs que estavam a correr quando o servidor
+        parou ficam ``interrupted``; devolve os que ainda estavam em fila."""
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET state = ?, finished = ? WHERE state = ?",
+                         (INTERRUPTED, time.time(), RUNNING))
+            rows = conn.execute("SELECT id, kind, args FROM jobs WHERE state = ? ORDER BY created",
+                                (QUEUED,)).fetchall()
+        return [(r["id"], r["kind"], json.loads(r["args"])) for r in rows]
+
+
+class ProgressReporter:
+    """Callback ``progress(rows, bytes_read, bytes_total)`` passado às funções
+    de conversão; grava no SQLite no máximo uma vez a cada ``interval`` s."""
+
+    def __init__(self, store, job_id, interval=0.5):
+        self.store = store
+        self.job_id = job_id
+        self.interval = interval
+        self._last = 0.0
+        self.latest = None
+
+    def __call__(self, rows, bytes_read, bytes_total):
+        self.latest = (rows, bytes_read, bytes_total)
+        now = time.monotonic()
+        if now - self._last >= self.interval:
+            self._last = now
+            self.store.progress(self.job_id, rows, bytes_read, bytes_total)
+
+    def flush(self):
+        if self.latest is not None:
+            self.store.progress(self.job_id, *self.latest)
+
+    def item(self, name, state, message=""):
+        """Regista já (sem limite de frequência) a conclusão de um ficheiro."""
+        self.store.add_item(self.job_id, name, state, message)
+
+
+def run_job(db_path, job_id, func, args):
+    """Executa um job e grava o resultado. É uma função de módulo para poder
+    ser enviada para os processos do pool.
+
+    Devolve ``(segundos, linhas, bytes lidos, tipo de erro ou None)`` para as
+    métricas, registadas no processo do servidor (ver ``JobManager._done``).
+    """
+    store = JobStore(db_path)
+    store.start(job_id)
+    reporter = ProgressReporter(store, job_id)
+    started = time.perf_counter()
+
+    def summary(error):
+        rows, bytes_read, _ = reporter.latest or (0, 0, 0)
+        return time.perf_counter() - started, rows, bytes_read, error
+
+    try:
+        result = func(*args, progress=reporter)
+    except Exception as e:
+        reporter.flush()
+        store.fail(job_id, str(e))
+        return summary(type(e).__name__)
+    reporter.flush()
+    # As funções do servidor sinalizam erros com mensagens "Erro: ..."
+    failed = isinstance(result, str) and result.startswith("Erro")
+    store.finish(job_id, result, failed=failed)
+    return summary("erro" if failed else None)
+
+
+class JobManager:
+    """Submete e consulta jobs assíncronos (conversões, validação, ingestão).
+
+    Os jobs em thread correm em ``threads`` threads (JOB_THREADS); as
+    ingestões, que esperam pelo destino durante minutos, têm as suas
+    ``ingest_threads`` (INGEST_JOB_THREADS) para não deixarem as validações
+    e conversões em fila atrás delas.
+    """
+
+    def __init__(self, store, process_pool=None, threads=4, ingest_threads=2):
+        self.store = store
+        self.process_pool = process_pool
+        self.thread_pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="job")
+        self.ingest_pool = ThreadPoolExecutor(max_workers=ingest_threads, thread_name_prefix="ingest-job")
+        self.kinds = {}
+
+    def register(self, kind, func, in_process=True, ingest=False):
+        """Regista um tipo de job. ``in_process=False`` corre-o no pool de
+        processos (se existir); caso contrário corre numa thread do servidor,
+        das de ingestão se ``ingest``."""
+        self.kinds[kind] = (func, in_process, ingest)
+
+    def _dispatch(self, job_id, kind, args):
+        func, in_process, ingest = self.kinds[kind]
+        if ingest:
+            executor = self.ingest_pool
+        elif in_process or self.process_pool is None:
+            executor = self.thread_pool
+        else:
+            executor = self.process_pool
+        instrumentation.IN_FLIGHT.labels(instrumentation.SERVICE, "job", kind).inc()
+        future = executor.submit(run_job, self.store.path, job_id, func, args)
+        future.add_done_callback(lambda f: self._done(kind, f))
+
+    @staticmethod
+    def _done(kind, future):
+        # Corre no processo do servidor mesmo quando o job correu no pool
+        instrumentation.IN_FLIGHT.labels(instrumentation.SERVICE, "job", kind).dec()
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            instrumentation.count_error("job", kind, type(future.exception()).__name__)
+            return
+        seconds, rows, bytes_read, error = future.result()
+        instrumentation.observe("job", kind, seconds, error)
+        instrumentation.add_rows(kind, rows)
+        instrumentation.add_bytes(kind, bytes_read)
+
+    def resume(self):
+        """Volta a submeter os jobs que ficaram em fila antes de um reinício."""
+        for job_id, kind, args in self.store.recover():
+            if kind in self.kinds:
+                self._dispatch(job_id, kind, args)
+            else:
+                self.store.fail(job_id, f"tipo de job desconhecido: {kind}")
+
+    def submit_job(self, kind, args=()):
+        if kind not in self.kinds:
+            return f"Erro: tipo de job desconhecido '{kind}'"
+        args = list(args)
+        job_id = self.store.create(kind, args)
+        self._dispatch(job_id, kind, args)
+        return job_id
+
+    def job_status(self, job_id):
+        job = self.store.get(job_id)
+        if job is None:
+            return "Erro: job não encontrado"
+        status = {
+            "id": job["id"],
+            "kind": job["kind"],
+            "state": job["state"],
+            "rows": job["rows"],
+            # float: inteiros XML-RPC estão limitados a 32 bits
+            "bytes_read": float(job["bytes_read"]),
+            "bytes_total": float(job["bytes_total"]),
+            "elapsed": 0.0,
+            "eta": -1.0,
+        }
+        if job["started"] is not None:
+            end = job["finished"] if job["finished"] is not None else time.time()
+            status["elapsed"] = end - job["started"]
+            if job["state"] == RUNNING and 0 < job["bytes_read"] < job["bytes_total"]:
+                rate = job["bytes_read"] / status["elapsed"]
+                status["eta"] = (job["bytes_total"] - job["bytes_read"]) / rate
+            elif job["state"] in FINISHED:
+                status["eta"] = 0.0
+        if job["error"]:
+            status["error"] = job["error"]
+        return status
+
+    def job_items(self, job_id, after=0):
+        """Ficheiros concluídos de um job em lote com ``seq`` > ``after``;
+        ``next`` é o ``after`` a usar na consulta seguinte."""
+        if self.store.get(job_id) is None:
+            return "Erro: job não encontrado"
+        items = self.store.items(job_id, int(after))
+        return {"items": items, "next": items[-1]["seq"] if items else int(after)}
+
+    def job_result(self, job_id):
+        job = self.store.get(job_id)
+        if job is None:
+            return "Erro: job não encontrado"
+        result = {"id": job["id"], "kind": job["kind"], "args": job["args"], "state": job["state"]}
+        if job["result"] is not None:
+            result["result"] = job["result"]
+        if job["error"]:
+            result["error"] = job["error"]
+        return result
@@ -0,0 +1,276 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import instrumentation
+
+# Destinos possíveis da ingestão. Todos expõem a mesma interface, usada por
+# ingest.py e incremental.py:
+#
+#   write(collection, items)   grava um lote; cada item é um dict (ID gerado
+#                              pelo destino) ou um par (doc_id, dict), que
+#                              substitui o documento com esse ID
+#   delete(collection, ids)    apaga documentos pelo ID
+#   collections()              nomes das coleções existentes
+#   max_batch                  nº máximo de itens por chamada a write/delete
+#   name / label               identificador e nome para mensagens
+#
+# O destino é escolhido com STORAGE_BACKEND (firestore, mongo, sqlite, memory)
+# e criado só no primeiro uso (LazyBackend).
+
+
+class PartialWriteError(RuntimeError):
+    """Lote escrito só em parte: ``written`` documentos gravados, os restantes
+    rejeitados (mensagens em ``errors``)."""
+
+    def __init__(self, written, errors):
+        super().__init__(f"{len(errors)} documentos rejeitados: {errors[0]}")
+        self.written = written
+        self.errors = errors
+
+
+class FirestoreBackend:
+    """Firestore, com um WriteBatch (até 500 operações) por lote."""
+
+    name = "firestore"
+    label = "Firestore"
+    max_batch = 500
+
+    def __init__(self, client):
+        self.client = client
+
+    @classmethod
+    def from_credentials(cls, path):
+        """Cliente com a chave de serviço em ``path``; com
+        ``FIRESTORE_EMULATOR_HOST`` definido liga-se ao emulador (sem chave,
+        projeto em ``FIRESTORE_PROJECT_ID``)."""
+        if os.environ.get("FIRESTORE_EMULATOR_HOST"):
+            from google.auth.credentials import AnonymousCredentials
+            from google.cloud import firestore
+            return cls(firestore.Client(project=os.environ.get("FIRESTORE_PROJECT_ID", "is-tp"),
+                                        credentials=AnonymousCredentials()))
+        import firebase_admin
+        from firebase_admin import credentials, firestore
+        try:
+            # Já inicializada numa tentativa anterior que falhou depois disto
+            app = firebase_admin.get_app()
+        except ValueError:
+            app = firebase_admin.initialize_app(credentials.Certificate(path))
+        return cls(firestore.client(app))
+
+    def write(self, collection_name, items):
+        collection = self.client.collection(collection_name)
+        batch = self.client.batch()
+        for item in items:
+            if isinstance(item, tuple):
+                batch.set(collection.document(item[0]), item[1])
+            else:
+                batch.set(collection.document(), item)
+        batch.commit()
+
+    def delete(self, collection_name, ids):
+        collection = self.client.collection(collection_name)
+        batch = self.client.batch()
+        for doc_id in ids:
+            batch.delete(collection.document(doc_id))
+        batch.commit()
+
+    def collections(self):
+        return [collection.id for collection in self.client.collections()]
+
+
+class MongoBackend:
+    """MongoDB com escritas em massa não ordenadas: ``insert_many`` para
+    documentos novos e ``bulk_write`` de ``ReplaceOne(upsert)`` para IDs
+    determinísticos. ``ordered=False`` deixa o servidor aplicar o lote
+    inteiro mesmo que um documento falhe."""
+
+    name = "mongo"
+    label = "MongoDB"
+
+    def __init__(self, uri, database, batch_size=1000, client=None):
+        if client is None:
+            from pymongo import MongoClient
+            client = MongoClient(uri)
+        self.client = client
+        self.db = client[database]
+        self.max_batch = max(1, int(batch_size))
+
+    def write(self, collection_name, items):
+        from pymongo import ReplaceOne
+        from pymongo.errors import BulkWriteError
+        collection = self.db[collection_name]
+        new_docs = [dict(item) for item in items if not isinstance(item, tuple)]
+        replaces = [ReplaceOne({"_id": item[0]}, item[1], upsert=True) for item in items if isinstance(item, tuple)]
+        written, errors = 0, []
+        if new_docs:
+            try:
+                collection.insert_many(new_docs, ordered=False)
+                written += len(new_docs)
+            except BulkWriteError as e:
+                written += e.details.get("nInserted", 0)
+                errors += e.details.get("writeErrors", [])
+        if replaces:
+            try:
+                collection.bulk_write(replaces, ordered=False)
+                written += len(replaces)
+            except BulkWriteError as e:
+                written += e.details.get("nUpserted", 0) + e.details.get("nMatched", 0)
+                errors += e.details.get("writeErrors", [])
+        if errors:
+            raise PartialWriteError(written, [err.get("errmsg", "erro de escrita") for err in errors])
+
+    def delete(self, collection_name, ids):
+        self.db[collection_name].delete_many({"_id": {"$in": list(ids)}})
+
+    def collections(self):
+        return sorted(self.db.list_collection_names())
+
+
+class SQLiteBackend:
+    """Tabela ``documents(collection, id, data)`` num ficheiro SQLite local,
+    útil para testes e para correr sem serviços externos."""
+
+    name = "sqlite"
+    label = "SQLite"
+    max_batch = 5000
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    collection TEXT NOT NULL,
+                    id         TEXT NOT NULL,
+                    data       TEXT NOT NULL,
+                    PRIMARY KEY (collection, id)
+                )
+            """)
+
+    def _connect(self):
+        # Uma ligação por thread (as threads de escrita do pipeline)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30)
+        return conn
+
+    def write(self, collection_name, items):
+        rows = []
+        for item in items:
+            doc_id, data = item if isinstance(item, tuple) else (uuid.uuid4().hex, item)
+            rows.append((collection_name, doc_id, json.dumps(data, ensure_ascii=False)))
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO documents (collection, id, data) VALUES (?, ?, ?)", rows)
+
+    def delete(self, collection_name, ids):
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM documents WHERE collection = ? AND id = ?",
+                             [(collection_name, doc_id) for doc_id in ids])
+
+    def collections(self):
+        rows = self._connect().execute("SELECT DISTINCT collection FROM documents ORDER BY collection")
+        return [r[0] for r in rows]
+
+    def documents(self, collection_name):
+        rows = self._connect().execute("SELECT id, data FROM documents WHERE collection = ?", (collection_name,))
+        return {doc_id: json.loads(data) for doc_id, data in rows}
+
+
+class MemoryBackend:
+    """Coleções em dicts na memória do processo (para testes)."""
+
+    name = "memory"
+    label = "armazenamento em memória"
+    max_batch = 5000
+
+    def __init__(self):
+        self.data = {}
+        self._lock = threading.Lock()
+
+    def write(self, collection_name, items):
+        with self._lock:
+            collection = self.data.setdefault(collection_name, {})
+            for item in items:
+                doc_id, data = item if isinstance(item, tuple) else (uuid.uuid4().hex, item)
+                collection[doc_id] = dict(data)
+
+    def delete(self, collection_name, ids):
+        with self._lock:
+            collection = self.data.get(collection_name, {})
+            for doc_id in ids:
+                collection.pop(doc_id, None)
+
+    def collections(self):
+        with self._lock:
+            return sorted(name for name, docs in self.data.items() if docs)
+
+
+def create_backend(kind=None):
+    """Cria o destino indicado por ``kind`` ou ``STORAGE_BACKEND`` (omissão:
+    firestore, com a chave em ``FIREBASE_CREDENTIALS``)."""
+    kind = (kind or os.environ.get("STORAGE_BACKEND", "firestore")).lower()
+    if kind == "firestore":
+        return FirestoreBackend.from_credentials(os.environ.get("FIREBASE_CREDENTIALS", "chave-privada.json"))
+    if kind == "mongo":
+        return MongoBackend(os.environ.get("MONGO_URI", "mongodb://mongo:27017"),
+                            os.environ.get("MONGO_DB", "is_tp"),
+                            batch_size=int(os.environ.get("MONGO_BATCH_SIZE", 1000)))
+    if kind == "sqlite":
+        return SQLiteBackend(os.environ.get("SQLITE_STORAGE_PATH", "storage.sqlite"))
+    if kind == "memory":
+        return MemoryBackend()
+    raise ValueError(f"STORAGE_BACKEND desconhecido: {kind}")
+
+
+_BACKENDS = {"firestore": FirestoreBackend, "mongo": MongoBackend, "sqlite": SQLiteBackend, "memory": MemoryBackend}
+
+
+class LazyBackend:
+    """Destino criado só quando é usado pela primeira vez.
+
+    O servidor arranca e atende conversões e validações sem credenciais nem
+    ligação ao destino (e os processos do pool, que importam app.py, não o
+    inicializam). ``name`` e ``label`` estão disponíveis sem inicializar; os
+    restantes atributos passam para o destino, criando-o se preciso. Se a
+    criação falhar o erro fica em ``error`` e é tentada de novo no uso seguinte.
+    """
+
+    def __init__(self, kind=None):
+        self.kind = (kind or os.environ.get("STORAGE_BACKEND", "firestore")).lower()
+        if self.kind not in _BACKENDS:
+            raise ValueError(f"STORAGE_BACKEND desconhecido: {self.kind}")
+        self.name = _BACKENDS[self.kind].name
+        self.label = _BACKENDS[self.kind].label
+        self.error = ""
+        self._backend = None
+        self._lock = threading.Lock()
+
+    @property
+    def initialized(self):
+        return self._backend is not None
+
+    def get(self):
+        """O destino, criado na primeira chamada (uma só vez entre threads)."""
+        backend = self._backend
+        if backend is None:
+            with self._lock:
+                if self._backend is None:
+                    started = time.perf_counter()
+                    try:
+                        self._backend = create_backend(self.kind)
+                    except Exception as e:
+                        self.error = f"{type(e).__name__}: {e}"
+                        raise
+                    self.error = ""
+                    instrumentation.observe_stage("storage_init", time.perf_counter() - started)
+                backend = self._backend
+        return backend
+
+    def __getattr__(self, attr):
+        # Só chamado para atributos que não existem no proxy
+        return getattr(self.get(), attr)
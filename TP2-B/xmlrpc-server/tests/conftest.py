@@ -0,0 +1,15 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Os módulos do servidor importam-se pelo nome, como no container (WORKDIR /app)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+@pytest.fixture
+def datafolder(tmp_path, monkeypatch):
+    """Pasta partilhada temporária para as funções de conversion.py."""
+    import conversion
+    monkeypatch.setattr(conversion, "DATAFOLDER", tmp_path)
+    return tmp_path
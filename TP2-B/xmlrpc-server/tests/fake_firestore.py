@@ -0,0 +1,76 @@
+"""Cliente Firestore falso para os testes: só o que ``FirestoreBackend`` usa
+(``collection()``, ``batch()`` e ``collections()``).
+
+Guarda os documentos em memória e regista o tamanho de cada commit. Tal como
+o Firestore, recusa WriteBatch com mais de 500 operações; ``fail_commits``
+indica quais commits (contados a partir de 1) devem falhar.
+"""
+import itertools
+import threading
+
+MAX_WRITES = 500
+
+
+class FakeDocument:
+    def __init__(self, collection, doc_id):
+        self.collection = collection
+        self.id = doc_id
+
+
+class FakeCollection:
+    def __init__(self, client, name):
+        self.client = client
+        self.id = name
+
+    def document(self, doc_id=None):
+        return FakeDocument(self, doc_id or f"auto-{next(self.client._ids)}")
+
+
+class FakeBatch:
+    def __init__(self, client):
+        self.client = client
+        self.ops = []
+
+    def set(self, ref, data):
+        self.ops.append(("set", ref, dict(data)))
+
+    def delete(self, ref):
+        self.ops.append(("delete", ref, None))
+
+    def commit(self):
+        self.client._commit(self.ops)
+
+
+class FakeFirestore:
+    def __init__(self, fail_commits=()):
+        self.data = {}
+        self.commits = []
+        self.fail_commits = set(fail_commits)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def collections(self):
+        return [FakeCollection(self, name) for name, docs in self.data.items() if docs]
+
+    def _commit(self, ops):
+        with self._lock:
+            self.commits.append(len(ops))
+            if len(ops) > MAX_WRITES:
+                raise ValueError(f"maximum {MAX_WRITES} writes allowed per request")
+            if len(self.commits) in self.fail_commits:
+                raise RuntimeError("503 Service Unavailable")
+            for kind, ref, data in ops:
+                docs = self.data.setdefault(ref.collection.id, {})
+                if kind == "set":
+                    docs[ref.id] = data
+                else:
+                    docs.pop(ref.id, None)
+
+    def documents(self, collection_name):
+        return list(self.data.get(collection_name, {}).values())
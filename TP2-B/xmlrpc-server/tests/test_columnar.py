@@ -0,0 +1,49 @@
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import columnar  # noqa: E402
+import conversion  # noqa: E402
+from xsdgen import SchemaProfile  # noqa: E402
+
+# Uma coluna por caso-limite da inferência de tipos
+EDGE_COLUMNS = {
+    "data_impossivel": ["2024-02-28", "2024-02-30"],
+    "bissexto": ["2024-02-29", "2023-02-28"],
+    "nao_bissexto": ["2024-02-29", "2023-02-29"],
+    "ano_zero": ["0000-01-01", "2020-01-01"],
+    "mes_13": ["2020-13-01", "2020-01-01"],
+    "datas_com_vazio": ["2020-01-01", ""],
+    "inteiros": ["+1", "-20", "007"],
+    "decimais": [".5", "5.", "-1.25"],
+    "zero_um": ["0", "1", "1"],
+    "booleanos": ["true", "0", "false"],
+    "texto": ["1", "x", "2020-01-01"],
+    "vazia": ["", "", ""],
+}
+
+
+def test_sidecar_profile_matches_xml_profile(datafolder):
+    assert columnar.enabled()  # carrega o pyarrow (importado só no primeiro uso)
+    names = list(EDGE_COLUMNS)
+    rows = zip(*EDGE_COLUMNS.values())
+    (datafolder / "limites.csv").write_text(
+        ",".join(names) + "\n" + "".join(",".join(row) + "\n" for row in rows), encoding="utf-8")
+
+    streamed = SchemaProfile()
+    sidecar = columnar.SidecarWriter(columnar.sidecar_path(datafolder / "limites.xml"))
+    conversion.convert_csv_file(datafolder / "limites.csv", datafolder / "limites.xml",
+                                profile=streamed, sidecar=sidecar)
+    sidecar.close()
+
+    table = columnar.read_table(columnar.fresh_sidecar(datafolder / "limites.xml"))
+    assert columnar.profile_from_table(table).columns() == streamed.columns()
+
+
+def test_xml_validates_against_xsd_built_from_sidecar(datafolder):
+    (datafolder / "datas.csv").write_text("d\n2024-02-28\n2024-02-30\n", encoding="utf-8")
+    assert not conversion.csv_to_xml("datas.csv").startswith("Erro")
+    assert columnar.fresh_sidecar(datafolder / "datas.xml") is not None
+
+    assert not conversion.xml_to_xsd("datas.xml").startswith("Erro")
+    assert conversion.validate_xml_against_xsd("datas.xml", "datas.xsd") == "XML é válido contra o XSD"
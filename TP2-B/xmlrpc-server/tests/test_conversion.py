@@ -0,0 +1,16 @@
+import gzip
+
+import conversion
+
+
+def test_failed_conversion_keeps_previous_xml(datafolder):
+    (datafolder / "dados.csv.gz").write_bytes(gzip.compress(b"a,b\n1,2\n3,4\n"))
+    assert not conversion.csv_to_xml("dados.csv.gz").startswith("Erro")
+    good = gzip.decompress((datafolder / "dados.xml.gz").read_bytes())
+
+    # Linha com mais campos do que o cabeçalho: falha a meio da escrita
+    (datafolder / "dados.csv.gz").write_bytes(gzip.compress(b"a,b\n1,2\n3,4,5\n"))
+    assert conversion.csv_to_xml("dados.csv.gz").startswith("Erro")
+
+    assert gzip.decompress((datafolder / "dados.xml.gz").read_bytes()) == good
+    assert not list(datafolder.glob("*.tmp"))
@@ -0,0 +1,222 @@
+import os
+
+import pytest
+
+import incremental
+import ingest
+import storage
+from fake_firestore import FakeFirestore
+
+
+def _records(n):
+    return [{"id": str(i), "valor": str(i * 10)} for i in range(n)]
+
+
+def test_batches_are_capped_at_500_operations():
+    client = FakeFirestore()
+    store = storage.FirestoreBackend(client)
+
+    stats = ingest.write_batches(store, "vendas", _records(1203), batch_size=1000)
+
+    assert client.commits == [500, 500, 203]
+    assert stats["batches"] == 3
+    assert stats["written"] == stats["records"] == 1203
+    assert stats["failed_batches"] == []
+    assert len(client.documents("vendas")) == 1203
+
+
+def test_pipeline_batches_are_capped_at_500_operations():
+    client = FakeFirestore()
+    store = storage.FirestoreBackend(client)
+
+    stats = ingest.run_pipeline(store, "vendas", iter(_records(2600)), batch_size=5000, workers=3)
+
+    assert sorted(client.commits) == [100, 500, 500, 500, 500, 500]
+    assert stats["written"] == 2600
+    assert len(client.documents("vendas")) == 2600
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_failed_batch_is_reported_and_ingestion_continues(workers):
+    client = FakeFirestore(fail_commits={2})
+    store = storage.FirestoreBackend(client)
+
+    stats = ingest.run_pipeline(store, "vendas", iter(_records(1200)), batch_size=500, workers=workers)
+
+    assert stats["records"] == 1200
+    assert stats["batches"] == 3
+    assert len(stats["failed_batches"]) == 1
+    failed = stats["failed_batches"][0]
+    assert failed["last"] - failed["first"] + 1 == (200 if failed["first"] == 1000 else 500)
+    assert "503" in failed["error"]
+    assert stats["written"] == 1200 - (failed["last"] - failed["first"] + 1)
+    assert len(client.documents("vendas")) == stats["written"]
+
+
+def test_write_batches_reports_failed_range():
+    client = FakeFirestore(fail_commits={2})
+    stats = ingest.write_batches(storage.FirestoreBackend(client), "vendas", _records(1200), batch_size=500)
+
+    assert stats["failed_batches"] == [{"first": 500, "last": 999, "written": 0, "error": "503 Service Unavailable"}]
+    assert stats["written"] == 700
+
+
+def test_progress_is_called_once_per_batch():
+    client = FakeFirestore(fail_commits={3})
+    calls = []
+
+    ingest.write_batches(storage.FirestoreBackend(client), "vendas", _records(1100), batch_size=500,
+                         progress=lambda stats: calls.append((stats["records"], stats["written"])))
+
+    assert calls == [(500, 500), (1000, 1000), (1100, 1000)]
+
+
+def test_pipeline_progress_counts_grow_to_the_total():
+    calls = []
+    ingest.run_pipeline(storage.FirestoreBackend(FakeFirestore()), "vendas", iter(_records(1750)),
+                        batch_size=500, workers=2,
+                        progress=lambda stats: calls.append((stats["batches"], stats["records"])))
+
+    assert [batches for batches, _ in calls] == [1, 2, 3, 4]
+    assert [records for _, records in calls] == sorted(records for _, records in calls)
+    assert calls[-1] == (4, 1750)
+
+
+def test_mongo_partial_batch_counts_inserted_documents():
+    mongomock = pytest.importorskip("mongomock")
+    store = storage.MongoBackend(None, "is_tp", batch_size=500, client=mongomock.MongoClient())
+    store.db["vendas"].create_index("id", unique=True)
+    records = _records(1000)
+    records[10] = records[620] = records[630] = {"id": "1", "valor": "repetido"}
+
+    stats = ingest.write_batches(store, "vendas", records, batch_size=500)
+
+    assert stats["written"] == 997
+    assert [(b["first"], b["last"], b["written"]) for b in stats["failed_batches"]] == [(0, 499, 499), (500, 999, 498)]
+    assert "E11000" in stats["failed_batches"][0]["error"]
+    assert store.db["vendas"].count_documents({}) == 997
+
+
+def _write_xml(path, n):
+    rows = "".join(f"<record><id>{i}</id><valor>{i * 10}</valor></record>" for i in range(n))
+    path.write_text(f"<?xml version='1.0' encoding='utf-8'?><data>{rows}</data>", encoding="utf-8")
+
+
+@pytest.fixture
+def firestore_app(datafolder, monkeypatch):
+    """app.py com o destino trocado por um Firestore falso."""
+    import app
+    client = FakeFirestore()
+    monkeypatch.setattr(app, "DATAFOLDER", datafolder)
+    monkeypatch.setattr(storage, "create_backend", lambda kind=None: storage.FirestoreBackend(client))
+    monkeypatch.setattr(app, "store", storage.LazyBackend("firestore"))
+    monkeypatch.setenv("COLUMNAR_SIDECAR", "0")
+    for name in ("INGEST_BATCH_SIZE", "FIRESTORE_BATCH_SIZE", "INGEST_WORKERS", "INGEST_MODE"):
+        monkeypatch.delenv(name, raising=False)
+    return app, client
+
+
+def test_process_xml_writes_all_records_in_capped_batches(firestore_app, datafolder):
+    app, client = firestore_app
+    _write_xml(datafolder / "vendas.xml", 1234)
+    progress = []
+
+    stats = app.process_xml_and_save_to_firebase("vendas.xml", batch_size=900,
+                                                 progress=lambda *args: progress.append(args))
+
+    assert stats["written"] == stats["records"] == 1234
+    assert sorted(client.commits) == [234, 500, 500]
+    assert stats["message"].startswith("Dados gravados com sucesso no Firestore")
+    assert len(progress) == 3
+    assert max(written for written, _, _ in progress) == 1234
+    assert {doc["id"] for doc in client.documents("vendas")} == {str(i) for i in range(1234)}
+
+
+def test_process_xml_reports_failed_batches(firestore_app, datafolder):
+    app, client = firestore_app
+    client.fail_commits = {1}
+    _write_xml(datafolder / "vendas.xml", 600)
+
+    stats = app.process_xml_and_save_to_firebase("vendas.xml", workers=1)
+
+    assert stats["records"] == 600
+    assert stats["written"] == 100
+    assert stats["failed_batches"][0]["first"] == 0
+    assert stats["message"].startswith("Aviso: 100 de 600 registros gravados no Firestore; 1 lotes falharam")
+
+
+@pytest.mark.skipif(not os.environ.get("FIRESTORE_EMULATOR_HOST"),
+                    reason="precisa do emulador do Firestore (FIRESTORE_EMULATOR_HOST)")
+def test_emulator_round_trip():
+    store = storage.create_backend("firestore")
+    collection_name = f"teste_{os.getpid()}"
+
+    stats = ingest.write_batches(store, collection_name, [(r["id"], r) for r in _records(700)])
+
+    assert stats["written"] == 700 and stats["batches"] == 2
+    assert collection_name in store.collections()
+    assert ingest.delete_documents(store, collection_name, [str(i) for i in range(700)]) == (700, [])
+
+
+def _incremental(client, records, manifest, batch_size=4):
+    # batch_size=4 dá blocos de 1 registo (média batch_size // 4), o que
+    # torna as contagens exatas
+    return incremental.run_incremental(storage.FirestoreBackend(client), "vendas", iter(records), manifest,
+                                       key="id", batch_size=batch_size, workers=2)
+
+
+def test_incremental_rerun_writes_nothing(tmp_path):
+    client = FakeFirestore()
+    manifest = tmp_path / "vendas.json"
+    assert _incremental(client, _records(50), manifest)["written"] == 50
+    commits = len(client.commits)
+
+    stats = _incremental(client, _records(50), manifest)
+
+    assert stats["written"] == 0
+    assert stats["skipped_records"] == 50
+    assert stats["deleted"] == 0
+    assert len(client.commits) == commits
+
+
+def test_incremental_writes_only_the_changed_row(tmp_path):
+    client = FakeFirestore()
+    manifest = tmp_path / "vendas.json"
+    _incremental(client, _records(50), manifest)
+    records = _records(50)
+    records[17] = {"id": "17", "valor": "alterado"}
+
+    stats = _incremental(client, records, manifest)
+
+    assert stats["written"] == 1
+    assert stats["skipped_records"] == 49
+    assert client.data["vendas"]["17"] == {"id": "17", "valor": "alterado"}
+
+
+def test_incremental_deletes_removed_rows(tmp_path):
+    client = FakeFirestore()
+    manifest = tmp_path / "vendas.json"
+    _incremental(client, _records(50), manifest)
+    records = [r for r in _records(50) if r["id"] != "30"]
+
+    stats = _incremental(client, records, manifest)
+
+    assert stats["written"] == 0
+    assert stats["deleted"] == 1
+    assert "30" not in client.data["vendas"] and len(client.data["vendas"]) == 49
+    # O manifesto já não conta com ele: a execução seguinte não apaga nada
+    assert _incremental(client, records, manifest)["deleted"] == 0
+
+
+def test_incremental_change_rewrites_one_chunk_with_default_batches(tmp_path):
+    client = FakeFirestore()
+    manifest = tmp_path / "vendas.json"
+    _incremental(client, _records(2000), manifest, batch_size=500)
+    records = _records(2000)
+    records[1234] = {"id": "1234", "valor": "alterado"}
+
+    stats = _incremental(client, records, manifest, batch_size=500)
+
+    assert 1 <= stats["written"] <= 500
+    assert stats["skipped_records"] == 2000 - stats["written"]
+    assert client.data["vendas"]["1234"]["valor"] == "alterado"
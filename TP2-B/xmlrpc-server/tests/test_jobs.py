@@ -0,0 +1,38 @@
+import threading
+import time
+
+import jobs
+
+
+def _wait(manager, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = manager.job_status(job_id)
+        if status["state"] in jobs.FINISHED:
+            return status
+        time.sleep(0.01)
+    return manager.job_status(job_id)
+
+
+def test_long_ingestions_do_not_queue_validations(tmp_path):
+    manager = jobs.JobManager(jobs.JobStore(tmp_path / "jobs.sqlite"), threads=1, ingest_threads=2)
+    release = threading.Event()
+
+    def ingest(name, progress=None):
+        release.wait(5)
+        return "ok"
+
+    def validate(name, progress=None):
+        return "XML é válido"
+
+    manager.register("process_xml", ingest, ingest=True)
+    manager.register("validate_xml", validate)
+    try:
+        ingestions = [manager.submit_job("process_xml", [f"{i}.xml"]) for i in range(3)]
+        validation = manager.submit_job("validate_xml", ["a.xml"])
+
+        assert _wait(manager, validation, timeout=2)["state"] == "done"
+        assert [manager.job_status(j)["state"] for j in ingestions].count("done") == 0
+    finally:
+        release.set()
+    assert all(_wait(manager, j)["state"] == "done" for j in ingestions)
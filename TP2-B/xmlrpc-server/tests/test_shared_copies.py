@@ -0,0 +1,23 @@
+"""Cada serviço é um contexto de build Docker próprio, por isso os módulos
+partilhados são copiados para cada pasta. Este teste falha quando as cópias
+deixam de ser iguais (corrigir uma e copiá-la para as restantes)."""
+from pathlib import Path
+
+import pytest
+
+REPO = Path(__file__).resolve().parents[3]
+
+SHARED = {
+    "instrumentation.py": ["TP2-B/xmlrpc-server", "TP2-B/xml-tool", "TP3/grpc-server", "TP3/rest-api"],
+    "compressed.py": ["TP2-B/xmlrpc-server", "TP2-B/xml-tool"],
+    "xsdgen.py": ["TP2-B/xmlrpc-server", "TP3/grpc-server"],
+}
+
+
+@pytest.mark.parametrize("name", sorted(SHARED))
+def test_copies_are_identical(name):
+    copies = [REPO / folder / name for folder in SHARED[name]]
+    if not all(path.is_file() for path in copies):
+        pytest.skip("fora do repositório (ex.: dentro de um container)")
+    original = copies[0].read_bytes()
+    assert [str(p.relative_to(REPO)) for p in copies if p.read_bytes() != original] == []
@@ -0,0 +1,53 @@
+import sys
+import types
+
+import pytest
+
+import storage
+
+
+@pytest.fixture
+def fake_firebase(monkeypatch):
+    """firebase_admin falso: ``initialize_app`` só pode ser chamado uma vez,
+    como no verdadeiro, e ``firestore.client`` falha na primeira chamada."""
+    state = {"app": None, "initialized": 0, "clients": 0}
+
+    def get_app():
+        if state["app"] is None:
+            raise ValueError("The default Firebase app does not exist.")
+        return state["app"]
+
+    def initialize_app(credential):
+        if state["app"] is not None:
+            raise ValueError("The default Firebase app already exists.")
+        state["initialized"] += 1
+        state["app"] = object()
+        return state["app"]
+
+    def client(app=None):
+        state["clients"] += 1
+        if state["clients"] == 1:
+            raise RuntimeError("DNS resolution failed")
+        return "client"
+
+    admin = types.ModuleType("firebase_admin")
+    admin.get_app, admin.initialize_app = get_app, initialize_app
+    admin.credentials = types.SimpleNamespace(Certificate=lambda path: path)
+    admin.firestore = types.SimpleNamespace(client=client)
+    monkeypatch.setitem(sys.modules, "firebase_admin", admin)
+    monkeypatch.setitem(sys.modules, "firebase_admin.credentials", admin.credentials)
+    monkeypatch.setitem(sys.modules, "firebase_admin.firestore", admin.firestore)
+    monkeypatch.delenv("FIRESTORE_EMULATOR_HOST", raising=False)
+    return state
+
+
+def test_lazy_firestore_recovers_after_a_failed_first_init(fake_firebase):
+    store = storage.LazyBackend("firestore")
+
+    with pytest.raises(RuntimeError):
+        store.get()
+    assert store.error is not None
+
+    backend = store.get()
+    assert backend.client == "client"
+    assert fake_firebase["initialized"] == 1
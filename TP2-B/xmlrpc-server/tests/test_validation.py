@@ -0,0 +1,86 @@
+import gzip
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import validation
+
+XSD = """<?xml version="1.0" encoding="utf-8"?>
+<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">
+  <xs:element name="data"><xs:complexType><xs:sequence>
+    <xs:element name="record" minOccurs="0" maxOccurs="unbounded"><xs:complexType><xs:sequence>
+      <xs:element name="id" type="xs:integer"/>
+    </xs:sequence></xs:complexType></xs:element>
+  </xs:sequence></xs:complexType></xs:element>
+</xs:schema>
+"""
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    """Executor que regista quantos blocos estiveram submetidos e ainda por
+    recolher ao mesmo tempo."""
+
+    def __init__(self, max_workers):
+        super().__init__(max_workers=max_workers)
+        self.submitted = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._count_lock = threading.Lock()
+
+    def submit(self, fn, *args):
+        with self._count_lock:
+            self.submitted += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        future = super().submit(fn, *args)
+        original = future.result
+
+        def result(timeout=None):
+            r = original(timeout)
+            with self._count_lock:
+                self.in_flight -= 1
+            return r
+        future.result = result
+        return future
+
+
+def _xml(ids):
+    rows = "".join(f"<record><id>{i}</id></record>\n" for i in ids)
+    return f'<?xml version="1.0" encoding="utf-8"?>\n<data>\n{rows}</data>\n'.encode()
+
+
+@pytest.fixture
+def files(tmp_path):
+    (tmp_path / "d.xsd").write_text(XSD)
+    return tmp_path
+
+
+@pytest.mark.parametrize("name", ["d.xml", "d.xml.gz"])
+def test_chunks_in_flight_are_bounded(files, name):
+    data = _xml(range(3000))
+    (files / name).write_bytes(gzip.compress(data) if name.endswith(".gz") else data)
+    executor = CountingExecutor(max_workers=1)
+
+    result = validation.validate_chunks(files / name, files / "d.xsd", chunk_size=1024, executor=executor)
+    executor.shutdown()
+
+    assert result["error_count"] == 0 and result["complete"]
+    assert result["records"] == 3000
+    assert executor.submitted == result["chunks"] > 20
+    assert executor.max_in_flight <= 2
+
+
+@pytest.mark.parametrize("name", ["d.xml", "d.xml.gz"])
+def test_fail_fast_stops_within_the_window(files, name):
+    data = _xml(["x", *range(3000)])
+    (files / name).write_bytes(gzip.compress(data) if name.endswith(".gz") else data)
+    executor = CountingExecutor(max_workers=1)
+
+    result = validation.validate_chunks(files / name, files / "d.xsd", chunk_size=1024,
+                                        executor=executor, fail_fast=True)
+    executor.shutdown()
+
+    assert not result["complete"]
+    assert result["error_count"] == 1 and result["errors"][0]["line"] == 3
+    assert executor.submitted <= 2
@@ -0,0 +1,332 @@
+import mmap
+import multiprocessing
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from lxml import etree
+
+import compressed
+from conversion import DATAFOLDER, schema_cache
+
+# Validação paralela de documentos planos data/record*: o ficheiro é dividido
+# em blocos que começam sempre num <record>, cada bloco é reembrulhado no
+# elemento raiz e validado contra o XSD num processo do pool. Parte do
+# princípio (válido para os XML gerados por csv_to_xml) de que "<record" não
+# aparece dentro de comentários ou CDATA.
+#
+# Os XML comprimidos (.xml.gz, .xml.zst) não podem ser mapeados em memória:
+# são descomprimidos em streaming e os blocos, cortados da mesma forma, vão
+# para o pool já em memória, com no máximo ``2 * workers`` blocos em curso.
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+MAX_ERRORS = 1000
+
+_RECORD = b"<record"
+_ROOT = re.compile(rb"<(?![?!])([^\s/>]+)")
+_RECORD_PATH = re.compile(r"^(/[^/]+/record)(?:\[(\d+)\])?")
+
+
+def _find_record(mm, pos):
+    """Posição do próximo ``<record`` (seguido de ``>``, ``/`` ou espaço)."""
+    while True:
+        pos = mm.find(_RECORD, pos)
+        if pos < 0:
+            return -1
+        nxt = mm[pos + len(_RECORD):pos + len(_RECORD) + 1]
+        if nxt in (b">", b"/", b" ", b"\t", b"\r", b"\n"):
+            return pos
+        pos += len(_RECORD)
+
+
+def find_chunks(xml_file, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Divide o ficheiro em intervalos ``(início, fim)`` de ~``chunk_size``
+    bytes, cortados imediatamente antes de um ``<record``. Devolve também o
+    nome do elemento raiz."""
+    size = os.path.getsize(xml_file)
+    if size == 0:
+        return [], b""
+    with open(xml_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        m = _ROOT.search(mm[:64 * 1024])
+        root = m.group(1) if m else b"data"
+        bounds = [0]
+        first = _find_record(mm, 0)
+        if first >= 0:
+            pos = first + chunk_size
+            while pos < size:
+                nxt = _find_record(mm, pos)
+                if nxt < 0:
+                    break
+                bounds.append(nxt)
+                pos = nxt + chunk_size
+        bounds.append(size)
+    return list(zip(bounds, bounds[1:])), root
+
+
+def validate_chunk(xml_file, xsd_file, start, end, root, is_first, is_last, max_errors=MAX_ERRORS):
+    """Valida um bloco e devolve as linhas, registos e erros encontrados.
+
+    Os números de linha devolvidos são relativos ao início do bloco; o prefixo
+    ``<raiz>`` não tem quebras de linha, por isso basta somar as linhas dos
+    blocos anteriores.
+    """
+    with open(xml_file, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return validate_data(data, xsd_file, root, is_first, is_last, max_errors)
+
+
+def validate_data(data, xsd_file, root, is_first, is_last, max_errors=MAX_ERRORS):
+    """Como ``validate_chunk``, para um bloco já lido (XML comprimido)."""
+    prefix = b"" if is_first else b"<" + root + b">"
+    suffix = b"" if is_last else b"</" + root + b">"
+    result = {"lines": data.count(b"\n"), "records": 0, "errors": [], "error_count": 0}
+
+    try:
+        doc = etree.fromstring(prefix + data + suffix, etree.XMLParser(huge_tree=True))
+    except etree.XMLSyntaxError as e:
+        log = e.error_log or []
+        entries = [(x.line, x.column, x.message, "") for x in log] or [(e.lineno or 0, 0, str(e), "")]
+        result["errors"] = entries[:max_errors]
+        result["error_count"] = len(entries)
+        return result
+
+    result["records"] = len(doc)
+    schema = schema_cache.get(xsd_file)
+    if not schema.validate(doc):
+        log = schema.error_log
+        result["error_count"] = len(log)
+        result["errors"] = [(x.line, x.column, x.message, getattr(x, "path", "") or "")
+                            for x in list(log)[:max_errors]]
+    return result
+
+
+def _shift_path(path, records_before):
+    """Corrige o índice do <record> no caminho do elemento (relativo ao bloco)."""
+    if not path or not records_before:
+        return path
+    return _RECORD_PATH.sub(
+        lambda m: f"{m.group(1)}[{int(m.group(2) or 1) + records_before}]", path, count=1)
+
+
+def merge_results(results, max_errors=MAX_ERRORS):
+    """Junta os resultados dos blocos, convertendo linhas e caminhos em
+    posições do ficheiro original."""
+    merged = {"records": 0, "error_count": 0, "errors": []}
+    line_offset = 0
+    for r in results:
+        merged["error_count"] += r["error_count"]
+        for line, column, message, path in r["errors"]:
+            if len(merged["errors"]) < max_errors:
+                merged["errors"].append({
+                    "line": line + line_offset,
+                    "column": column,
+                    "message": message,
+                    "path": _shift_path(path, merged["records"]),
+                })
+        line_offset += r["lines"]
+        merged["records"] += r["records"]
+    merged["chunks"] = len(results)
+    return merged
+
+
+def _validate_inline(func, *args):
+    # O error_log de um XMLSchema é partilhado: na validação dentro do processo
+    # do servidor (várias threads) as chamadas à mesma cache são serializadas
+    with _inline_lock:
+        return func(*args)
+
+
+_inline_lock = threading.Lock()
+
+
+def stream_chunks(xml_file, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Blocos ``(dados, raiz, primeiro, último, bytes lidos do ficheiro)`` de
+    um XML lido em streaming (comprimido), cortados antes de um ``<record``
+    como em ``find_chunks``."""
+    with compressed.open_read(xml_file) as fh:
+        buf = b""
+        root = None
+        first = True
+        eof = False
+        while True:
+            cut = _find_record(buf, chunk_size) if len(buf) > chunk_size else -1
+            while cut < 0 and not eof:
+                block = fh.read(chunk_size)
+                eof = not block
+                buf += block
+                if len(buf) > chunk_size:
+                    cut = _find_record(buf, chunk_size)
+            if root is None:
+                m = _ROOT.search(buf[:64 * 1024])
+                root = m.group(1) if m else b"data"
+            if cut < 0:
+                if buf or first:
+                    yield buf, root, first, True, compressed.position(fh)
+                return
+            yield buf[:cut], root, first, False, compressed.position(fh)
+            buf = buf[cut:]
+            first = False
+
+
+def _run_windowed(func, jobs, executor, total, fail_fast, progress):
+    """Corre ``func(*args)`` para cada ``(args, posição)`` de ``jobs`` e
+    devolve ``(resultados, completo)``.
+
+    No máximo ``2 * workers`` blocos estão submetidos de cada vez: os
+    seguintes só são lidos/submetidos à medida que os primeiros terminam, pelo
+    que a memória não cresce com o ficheiro e o ``fail_fast`` só tem essa
+    janela para cancelar. Sem ``executor`` valida um bloco de cada vez.
+    """
+    window = 2 * (getattr(executor, "_max_workers", None) or os.cpu_count() or 1)
+    pending = deque()
+    results = []
+    records = 0
+
+    def collect():
+        nonlocal records
+        future, position = pending.popleft()
+        r = future.result() if executor is not None else future
+        results.append(r)
+        records += r["records"]
+        if progress is not None:
+            progress(records, position, total)
+        return not (fail_fast and r["error_count"])
+
+    try:
+        for args, position in jobs:
+            if executor is None:
+                pending.append((_validate_inline(func, *args), position))
+            else:
+                pending.append((executor.submit(func, *args), position))
+            while len(pending) >= window or (executor is None and pending):
+                if not collect():
+                    return results, False
+        while pending:
+            if not collect():
+                return results, False
+        return results, True
+    finally:
+        for future, _ in pending:
+            if executor is not None:
+                future.cancel()
+
+
+def _stream_jobs(xml_file, xsd_file, chunk_size, max_errors):
+    for data, root, is_first, is_last, position in stream_chunks(xml_file, chunk_size):
+        if not data.strip() and is_first and is_last:
+            raise ValueError("XML vazio")
+        yield (data, str(xsd_file), root, is_first, is_last, max_errors), position
+
+
+def validate_chunks(xml_file, xsd_file, workers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                    executor=None, max_errors=MAX_ERRORS, fail_fast=False, progress=None):
+    """Valida ``xml_file`` por blocos e devolve o resultado agregado.
+
+    Usa ``executor`` se for dado (o pool do servidor); caso contrário cria um
+    pool temporário com ``workers`` processos, ou valida os blocos no próprio
+    processo se ``workers == 1``. Com ``fail_fast`` pára no primeiro bloco com
+    erros e cancela os restantes.
+    """
+    if compressed.codec(xml_file):
+        func = validate_data
+        jobs = _stream_jobs(xml_file, xsd_file, chunk_size, max_errors)
+        total = os.path.getsize(xml_file)
+    else:
+        chunks, root = find_chunks(xml_file, chunk_size)
+        if not chunks:
+            raise ValueError("XML vazio")
+        func = validate_chunk
+        jobs = (((str(xml_file), str(xsd_file), start, end, root, i == 0, i == len(chunks) - 1, max_errors), end)
+                for i, (start, end) in enumerate(chunks))
+        total = chunks[-1][1]
+
+    own_pool = executor is None and workers != 1
+    if own_pool:
+        executor = ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1,
+                                       mp_context=multiprocessing.get_context("forkserver"))
+    try:
+        results, complete = _run_windowed(func, jobs, executor, total, fail_fast, progress)
+    finally:
+        if own_pool:
+            executor.shutdown()
+    merged = merge_results(results, max_errors)
+    merged["complete"] = complete
+    return merged
+
+
+def validate_xml_parallel(xml_filename, xsd_filename, workers=0, executor=None):
+    """RPC: valida em blocos paralelos e reporta todos os erros (até
+    ``MAX_ERRORS``) com a linha original. ``workers=0`` usa o pool do servidor."""
+    try:
+        xml_file = DATAFOLDER / xml_filename
+        xsd_file = DATAFOLDER / xsd_filename
+
+        if not xml_file.exists():
+            return "Erro: arquivo XML não encontrado"
+        if not xsd_file.exists():
+            return "Erro: arquivo XSD não encontrado"
+
+        chunk_size = int(os.environ.get("VALIDATION_CHUNK_SIZE", DEFAULT_CHUNK_SIZE))
+        result = validate_chunks(xml_file, xsd_file, workers=workers or None, chunk_size=chunk_size,
+                                 executor=None if workers else executor)
+        if result["error_count"] == 0:
+            return f"XML é válido contra o XSD ({result['records']} registros, {result['chunks']} blocos)"
+        erros = "\n".join(f"linha {e['line']}, coluna {e['column']}: {e['message']}"
+                          for e in result["errors"])
+        return f"Erro: XML inválido ({result['error_count']} erros)\n{erros}"
+    except Exception as e:
+        return f"Erro ao validar XML contra XSD: {e}"
+
+
+def validate_xml_report(xml_filename, xsd_filename, options=None, progress=None, executor=None):
+    """RPC: validação com relatório estruturado.
+
+    ``options`` (todas opcionais):
+      - ``mode``: ``collect_all`` (omissão) recolhe todos os erros;
+        ``fail_fast`` pára no primeiro bloco inválido.
+      - ``max_errors``: nº máximo de erros detalhados no relatório (100).
+      - ``workers``: 0 usa o pool do servidor, 1 valida sem processos extra,
+        N cria um pool de N processos.
+
+    Devolve ``valid``, ``error_count``, ``errors`` (linha, coluna, caminho do
+    elemento e mensagem), ``records`` verificados, ``elapsed`` em segundos e
+    ``complete`` (falso se o fail-fast parou antes do fim).
+    """
+    options = options or {}
+    mode = options.get("mode", "collect_all")
+    if mode not in ("collect_all", "fail_fast"):
+        return f"Erro: modo de validação desconhecido '{mode}'"
+    max_errors = int(options.get("max_errors", 100))
+    workers = int(options.get("workers", 0))
+
+    xml_file = DATAFOLDER / xml_filename
+    xsd_file = DATAFOLDER / xsd_filename
+    if not xml_file.exists():
+        return "Erro: arquivo XML não encontrado"
+    if not xsd_file.exists():
+        return "Erro: arquivo XSD não encontrado"
+
+    started = time.perf_counter()
+    try:
+        chunk_size = int(os.environ.get("VALIDATION_CHUNK_SIZE", DEFAULT_CHUNK_SIZE))
+        result = validate_chunks(xml_file, xsd_file, workers=workers or None, chunk_size=chunk_size,
+                                 executor=None if workers else executor, max_errors=max_errors,
+                                 fail_fast=mode == "fail_fast", progress=progress)
+    except Exception as e:
+        return f"Erro ao validar XML contra XSD: {e}"
+
+    return {
+        "xml": xml_filename,
+        "xsd": xsd_filename,
+        "mode": mode,
+        "valid": result["error_count"] == 0,
+        "error_count": result["error_count"],
+        "errors": result["errors"],
+        "records": result["records"],
+        "chunks": result["chunks"],
+        "complete": result["complete"],
+        "elapsed": time.perf_counter() - started,
+    }
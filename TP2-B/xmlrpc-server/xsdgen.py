@@ -0,0 +1,159 @@
+"""Geração do XSD de um documento data/record* a partir dos valores das colunas.
+
+Cada serviço é um contexto de build Docker próprio, por isso este ficheiro é
+copiado para TP3/grpc-server (como instrumentation.py e compressed.py), que
+gera o XSD ao converter; manter as cópias iguais.
+"""
+import os
+import re
+from datetime import date
+from xml.dom import minidom
+import xml.etree.ElementTree as ET
+
+# Inferência de tipos por coluna e geração do XSD. Os tipos candidatos são
+# eliminados à medida que aparecem valores incompatíveis; o que sobrar em
+# primeiro lugar (pela ordem abaixo) é o tipo da coluna.
+_INTEGER = re.compile(r"[+-]?[0-9]+\Z")
+_DECIMAL = re.compile(r"[+-]?([0-9]+(\.[0-9]*)?|\.[0-9]+)\Z")
+_DATE = re.compile(r"[0-9]{4}-[0-9]{2}-[0-9]{2}\Z")
+_BOOLEAN = {"true", "false", "1", "0"}
+
+TYPE_ORDER = ("boolean", "integer", "decimal", "date")
+
+
+def is_date(value):
+    if not _DATE.match(value):
+        return False
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+_CHECKS = {
+    "boolean": lambda v: v in _BOOLEAN,
+    "integer": lambda v: _INTEGER.match(v) is not None,
+    "decimal": lambda v: _DECIMAL.match(v) is not None,
+    "date": is_date,
+}
+
+
+class ColumnStats:
+    """Estatísticas de uma coluna recolhidas durante a conversão."""
+
+    __slots__ = ("name", "candidates", "present", "empty", "word_boolean")
+
+    def __init__(self, name):
+        self.name = name
+        self.candidates = list(TYPE_ORDER)
+        self.present = 0
+        self.empty = 0
+        # só é boolean se aparecer "true"/"false" (colunas só com 0/1 são integer)
+        self.word_boolean = False
+
+    def add(self, value):
+        self.present += 1
+        if not value:
+            self.empty += 1
+            return
+        if not self.candidates:
+            return
+        self.candidates = [t for t in self.candidates if _CHECKS[t](value)]
+        if value in ("true", "false"):
+            self.word_boolean = True
+
+    def xsd_type(self):
+        for t in self.candidates:
+            if t == "boolean" and not self.word_boolean:
+                continue
+            return t
+        return "string"
+
+
+class SchemaProfile:
+    """Perfil de um documento: colunas por ordem de aparecimento e nº de registos."""
+
+    def __init__(self):
+        self.records = 0
+        self._columns = {}
+
+    def column(self, name):
+        stats = self._columns.get(name)
+        if stats is None:
+            stats = self._columns[name] = ColumnStats(name)
+        return stats
+
+    def columns(self):
+        """Lista de (nome, tipo, minOccurs, opcional) para ``build_xsd``.
+
+        Uma coluna presente e não vazia em todos os registos tem minOccurs=1;
+        as restantes ficam com minOccurs=0 e aceitam também o valor vazio.
+        ``XSD_INFER_TYPES=0`` volta a gerar tudo como xs:string.
+        """
+        infer = os.environ.get("XSD_INFER_TYPES", "1") != "0"
+        cols = []
+        for stats in self._columns.values():
+            required = stats.present == self.records and stats.empty == 0 and self.records > 0
+            xsd_type = stats.xsd_type() if infer else "string"
+            cols.append((stats.name, xsd_type, 1 if required else 0, not required))
+        if os.environ.get("XSD_SORT", "").lower() == "alpha":
+            cols.sort(key=lambda c: c[0])
+        return cols
+
+
+def build_xsd(columns, xsd_file):
+    """Escreve o XSD de um documento data/record* e devolve-o como string.
+
+    ``columns`` vem de ``SchemaProfile.columns()``.
+    """
+    xsd_root = ET.Element("xs:schema", attrib={
+        "xmlns:xs": "http://www.w3.org/2001/XMLSchema"
+    })
+
+    # Tipos "X ou vazio" para colunas tipadas que têm valores em falta
+    nullable = sorted({t for _, t, _, optional in columns if optional and t != "string"})
+    if nullable:
+        empty = ET.SubElement(xsd_root, "xs:simpleType", attrib={"name": "empty"})
+        restriction = ET.SubElement(empty, "xs:restriction", attrib={"base": "xs:string"})
+        ET.SubElement(restriction, "xs:length", attrib={"value": "0"})
+        for t in nullable:
+            union_type = ET.SubElement(xsd_root, "xs:simpleType", attrib={"name": f"{t}_or_empty"})
+            ET.SubElement(union_type, "xs:union", attrib={"memberTypes": f"xs:{t} empty"})
+
+    record_el = ET.SubElement(xsd_root, "xs:element", attrib={"name": "data"})
+    complex_type = ET.SubElement(record_el, "xs:complexType")
+    sequence = ET.SubElement(complex_type, "xs:sequence")
+
+    record_type = ET.SubElement(sequence, "xs:element", attrib={
+        "name": "record",
+        "minOccurs": "0",
+        "maxOccurs": "unbounded"
+    })
+    rec_complex = ET.SubElement(record_type, "xs:complexType")
+    rec_seq = ET.SubElement(rec_complex, "xs:sequence")
+
+    for name, xsd_type, min_occurs, optional in columns:
+        if xsd_type == "string" or not optional:
+            type_name = f"xs:{xsd_type}"
+        else:
+            type_name = f"{xsd_type}_or_empty"
+        ET.SubElement(rec_seq, "xs:element", attrib={
+            "name": name,
+            "type": type_name,
+            "minOccurs": str(min_occurs)
+        })
+
+    tree = ET.ElementTree(xsd_root)
+    try:
+        ET.indent(tree, space="  ")
+        tree.write(xsd_file, encoding='utf-8', xml_declaration=True)
+        xsd_str = ET.tostring(xsd_root, encoding='utf-8').decode('utf-8')
+    except AttributeError:
+        rough = ET.tostring(xsd_root, encoding='utf-8')
+        reparsed = minidom.parseString(rough)
+        xsd_str = reparsed.toprettyxml(indent="  ")
+        with open(xsd_file, 'w', encoding='utf-8') as f:
+            f.write(xsd_str)
+
+    return xsd_str
@@ -0,0 +1,478 @@
+import asyncio
+import base64
+import csv
+import hashlib
+import logging
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import grpc
+from lxml import etree
+
+import grpc_pb2
+import grpc_pb2_grpc
+import instrumentation
+from xsdgen import SchemaProfile, build_xsd
+
+DATAFOLDER = Path(os.environ.get("DATAFOLDER", "/data/shared")).resolve()
+DEFAULT_BATCH_SIZE = 1000
+# Progress events are sent once per batch, but never more often than this
+PROGRESS_EVERY = 1000
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = int(os.environ.get("QUERY_MAX_PAGE_SIZE", 1000))
+
+Progress = grpc_pb2.IngestProgress
+log = logging.getLogger(__name__)
+
+
+def connect_mongo():
+    """Database named by MONGO_DB on the MONGO_URI server (the compose `mongo`)."""
+    from pymongo import MongoClient
+    client = MongoClient(os.environ.get("MONGO_URI", "mongodb://mongo:27017"))
+    return client[os.environ.get("MONGO_DB", "is_tp")]
+
+
+def encode_cursor(doc_id):
+    """Opaque cursor for a document _id (ObjectId or string)."""
+    kind = "s" if isinstance(doc_id, str) else "o"
+    return base64.urlsafe_b64encode(f"{kind}:{doc_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    kind, _, value = raw.partition(":")
+    if kind == "s":
+        return value
+    if kind == "o":
+        from bson import ObjectId
+        return ObjectId(value)
+    raise ValueError("unknown cursor kind")
+
+
+class DataPlaneError(Exception):
+    """Request error, reported to the client as ``code`` with this message."""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+def _check_name(value, what):
+    """Collection and field names go to Mongo as keys: "$" operators (e.g.
+    ``$where``, which runs JavaScript on the server) and NUL are refused."""
+    if not value or value.startswith("$") or "\0" in value:
+        raise DataPlaneError(grpc.StatusCode.INVALID_ARGUMENT, f"invalid {what}: {value!r}")
+    return value
+
+
+def _check_collection(value):
+    """``_check_name`` plus MongoDB's own collection name rules, so a bad name
+    is INVALID_ARGUMENT instead of the driver's InvalidName."""
+    _check_name(value, "collection")
+    if ("$" in value or ".." in value or value.startswith((".", "system."))
+            or value.endswith(".")):
+        raise DataPlaneError(grpc.StatusCode.INVALID_ARGUMENT, f"invalid collection: {value!r}")
+    return value
+
+
+def _equality_filter(request):
+    """Mongo query for ``request.filters``: plain field equality only."""
+    return {_check_name(field, "filter field"): value for field, value in request.filters.items()}
+
+
+def _database_error(e):
+    # The driver's message can carry query details; clients only get the code
+    log.error("database error: %s", e)
+    return DataPlaneError(grpc.StatusCode.INTERNAL, "database error")
+
+
+def _safe_csv_name(filename):
+    name = Path(filename or "").name
+    if not name or name.startswith("."):
+        return None
+    return name if name.lower().endswith(".csv") else name + ".csv"
+
+
+class CsvUpload:
+    """Receives the chunks of an UploadCsv call into ``.uploads`` in the shared
+    folder and moves the file into place when complete (a rename, as it is
+    written next to its destination)."""
+
+    def __init__(self, datafolder):
+        self.datafolder = Path(datafolder)
+        tmp_dir = self.datafolder / ".uploads"
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        self.tmp_path = tmp_dir / f"{uuid.uuid4().hex}.part"
+        self.out = open(self.tmp_path, "wb")
+        self.name = None
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, chunk):
+        if self.name is None:
+            self.name = _safe_csv_name(chunk.filename)
+            if self.name is None:
+                raise DataPlaneError(grpc.StatusCode.INVALID_ARGUMENT, "first chunk must carry a valid file name")
+        self.out.write(chunk.data)
+        self.digest.update(chunk.data)
+        self.size += len(chunk.data)
+
+    def finish(self):
+        self.out.close()
+        if self.name is None:
+            raise DataPlaneError(grpc.StatusCode.INVALID_ARGUMENT, "empty upload")
+        os.replace(self.tmp_path, self.datafolder / self.name)
+        instrumentation.add_bytes("upload", self.size)
+        return grpc_pb2.UploadReply(filename=self.name, size=self.size, sha256=self.digest.hexdigest())
+
+    def cleanup(self):
+        self.out.close()
+        self.tmp_path.unlink(missing_ok=True)
+
+
+def convert_and_ingest(db, datafolder, request, default_batch_size):
+    """Generator of progress events for ConvertAndIngest (see the proto)."""
+    name = _safe_csv_name(request.filename)
+    csv_file = Path(datafolder) / name if name else None
+    if csv_file is None or not csv_file.exists():
+        raise DataPlaneError(grpc.StatusCode.NOT_FOUND, f"CSV not found: {request.filename}")
+    collection = db[_check_collection(request.collection or csv_file.stem)]
+    batch_size = request.batch_size or default_batch_size
+    xml_file = csv_file.with_suffix(".xml")
+    xsd_file = csv_file.with_suffix(".xsd")
+    profile = SchemaProfile()
+
+    progress = Progress(stage=Progress.STARTED, bytes_total=csv_file.stat().st_size)
+    yield _snapshot(progress)
+    progress.stage = Progress.RUNNING
+
+    # One insert in flight while the next batch is parsed
+    writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mongo-writer")
+    pending = None
+    last_sent = 0
+    try:
+        with open(csv_file, "r", encoding="utf-8", newline="") as f:
+            for batch in _convert_csv(f, xml_file, batch_size, progress, profile):
+                if request.convert_only:
+                    progress.rows_written += len(batch)
+                else:
+                    if pending is not None:
+                        _account(pending, progress)
+                    pending = writer.submit(_insert, collection, batch)
+                progress.bytes_read = f.buffer.tell()
+                if progress.rows_parsed - last_sent >= PROGRESS_EVERY or last_sent == 0:
+                    last_sent = progress.rows_parsed
+                    yield _snapshot(progress)
+        if pending is not None:
+            _account(pending, progress)
+        with instrumentation.stage("xsd_generate"):
+            build_xsd(profile.columns(), xsd_file)
+    except Exception as e:
+        progress.stage = Progress.FAILED
+        progress.message = str(e)
+        instrumentation.count_error("stage", "ingest", type(e).__name__)
+        yield _snapshot(progress)
+        return
+    finally:
+        writer.shutdown(wait=True)
+        instrumentation.add_rows("csv_parsed", progress.rows_parsed)
+        if not request.convert_only:
+            instrumentation.add_rows("mongo_written", progress.rows_written)
+        instrumentation.add_bytes("csv_read", progress.bytes_read)
+
+    progress.stage = Progress.DONE
+    progress.bytes_read = progress.bytes_total
+    if request.convert_only:
+        progress.message = (f"{progress.rows_written} of {progress.rows_parsed} rows written to "
+                            f"{xml_file.name}, {progress.errors} errors; XSD in {xsd_file.name}")
+    else:
+        progress.message = (f"{progress.rows_written} of {progress.rows_parsed} rows written to "
+                            f"'{collection.name}', {progress.errors} errors; XML in {xml_file.name}, "
+                            f"XSD in {xsd_file.name}")
+    yield _snapshot(progress)
+
+
+def query_records(db, request):
+    """Generator of the Records of one QueryRecords page (see the proto)."""
+    if not request.collection:
+        raise DataPlaneError(grpc.StatusCode.INVALID_ARGUMENT, "collection is required")
+    if request.page_size < 0:
+        raise DataPlaneError(grpc.StatusCode.INVALID_ARGUMENT, "page_size must be positive")
+    _check_collection(request.collection)
+    page_size = min(request.page_size or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    query = _equality_filter(request)
+    if request.cursor:
+        # Keyset pagination: the next page starts after the last _id seen,
+        # so deep pages cost the same as the first (no skip)
+        try:
+            query["_id"] = {"$gt": decode_cursor(request.cursor)}
+        except Exception:
+            raise DataPlaneError(grpc.StatusCode.INVALID_ARGUMENT, "invalid cursor")
+    projection = {_check_name(field, "field"): 1 for field in request.fields} or None
+
+    cursor = (db[request.collection].find(query, projection)
+              .sort("_id", 1).limit(page_size).batch_size(min(page_size, 1000)))
+    rows = 0
+    try:
+        while True:
+            try:
+                doc = next(cursor, None)
+            except Exception as e:
+                raise _database_error(e)
+            if doc is None:
+                break
+            rows += 1
+            doc_id = doc.pop("_id")
+            yield grpc_pb2.Record(
+                id=str(doc_id),
+                fields={k: v if isinstance(v, str) else str(v) for k, v in doc.items()},
+                cursor=encode_cursor(doc_id),
+            )
+    finally:
+        cursor.close()
+        instrumentation.add_rows("query", rows)
+
+
+def list_collections(db):
+    """CollectionsReply with every collection and its estimated size (from
+    the collection metadata, without scanning)."""
+    reply = grpc_pb2.CollectionsReply()
+    for name in sorted(db.list_collection_names()):
+        reply.collections.add(name=name, count=db[name].estimated_document_count())
+    return reply
+
+
+def count_records(db, request):
+    if not request.collection:
+        raise DataPlaneError(grpc.StatusCode.INVALID_ARGUMENT, "collection is required")
+    collection = _check_collection(request.collection)
+    query = _equality_filter(request)
+    try:
+        return grpc_pb2.CountReply(count=db[collection].count_documents(query))
+    except Exception as e:
+        raise _database_error(e)
+
+
+def validate_xml(datafolder, request):
+    """ValidateReply for an XML in ``datafolder`` checked against its XSD."""
+    xml_name = Path(request.xml).name
+    xml_file = Path(datafolder) / xml_name
+    xsd_file = Path(datafolder) / (Path(request.xsd).name if request.xsd else Path(xml_name).stem + ".xsd")
+    for path in (xml_file, xsd_file):
+        if not path.name or path.name.startswith(".") or not path.is_file():
+            raise DataPlaneError(grpc.StatusCode.NOT_FOUND, f"file not found: {path.name}")
+    try:
+        with instrumentation.stage("xsd_compile"):
+            schema = etree.XMLSchema(etree.parse(str(xsd_file)))
+    except (etree.XMLSyntaxError, etree.XMLSchemaParseError) as e:
+        raise DataPlaneError(grpc.StatusCode.INVALID_ARGUMENT, f"invalid XSD: {e}")
+    reply = grpc_pb2.ValidateReply()
+    max_errors = request.max_errors or 50
+    # Streamed: each record is validated as it is parsed and then dropped, so
+    # memory doesn't grow with the document. libxml2 doesn't give line numbers
+    # for schema errors found this way (they come back as line 0).
+    events = etree.iterparse(str(xml_file), events=("end",), schema=schema, huge_tree=True)
+    try:
+        with instrumentation.stage("validate"):
+            for _, element in events:
+                parent = element.getparent()
+                if parent is not None and parent.getparent() is None:
+                    reply.records += 1
+                    element.clear()
+                    while element.getprevious() is not None:
+                        del parent[0]
+        reply.valid = True
+    except etree.XMLSyntaxError as e:
+        errors = [(err.line, err.column, err.message) for err in events.error_log
+                  if err.level_name in ("ERROR", "FATAL")]
+        if not errors:
+            errors = [(e.lineno or 0, e.offset or 0, str(e))]
+        reply.error_count = len(errors)
+        for line, column, message in errors[:request.max_errors or 50]:
+            reply.errors.add(line=line, column=column, message=message)
+    return reply
+
+
+class DataPlaneServicer(grpc_pb2_grpc.DataPlaneServicer):
+    """CSV upload and CSV -> XML -> MongoDB ingestion with streamed progress,
+    for the thread-pool server (each call holds a thread until it ends)."""
+
+    def __init__(self, db, datafolder=DATAFOLDER, batch_size=None):
+        self.db = db
+        self.datafolder = Path(datafolder)
+        self.batch_size = batch_size or int(os.environ.get("MONGO_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+
+    def UploadCsv(self, request_iterator, context):
+        upload = CsvUpload(self.datafolder)
+        try:
+            for chunk in request_iterator:
+                upload.write(chunk)
+            return upload.finish()
+        except DataPlaneError as e:
+            context.abort(e.code, str(e))
+        finally:
+            upload.cleanup()
+
+    def ConvertAndIngest(self, request, context):
+        try:
+            yield from convert_and_ingest(self.db, self.datafolder, request, self.batch_size)
+        except DataPlaneError as e:
+            context.abort(e.code, str(e))
+
+    def QueryRecords(self, request, context):
+        try:
+            yield from query_records(self.db, request)
+        except DataPlaneError as e:
+            context.abort(e.code, str(e))
+
+    def ValidateXml(self, request, context):
+        try:
+            return validate_xml(self.datafolder, request)
+        except DataPlaneError as e:
+            context.abort(e.code, str(e))
+
+    def ListCollections(self, request, context):
+        return list_collections(self.db)
+
+    def CountRecords(self, request, context):
+        try:
+            return count_records(self.db, request)
+        except DataPlaneError as e:
+            context.abort(e.code, str(e))
+
+
+_DONE = object()
+
+
+async def _iterate_in_thread(gen):
+    """Async iterator over a blocking generator: each step runs in the loop's
+    executor, so a waiting stream holds no thread. Closes the generator (in
+    the executor too) if the call ends early."""
+    try:
+        while True:
+            item = await asyncio.to_thread(next, gen, _DONE)
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        await asyncio.to_thread(gen.close)
+
+
+class AsyncDataPlaneServicer(grpc_pb2_grpc.DataPlaneServicer):
+    """Same calls for the grpc.aio server. pymongo, lxml and file I/O stay
+    blocking but run step by step in worker threads; streams waiting on the
+    network cost nothing, so long calls don't starve short ones."""
+
+    def __init__(self, db, datafolder=DATAFOLDER, batch_size=None):
+        self.db = db
+        self.datafolder = Path(datafolder)
+        self.batch_size = batch_size or int(os.environ.get("MONGO_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+
+    async def UploadCsv(self, request_iterator, context):
+        upload = await asyncio.to_thread(CsvUpload, self.datafolder)
+        try:
+            async for chunk in request_iterator:
+                await asyncio.to_thread(upload.write, chunk)
+            return await asyncio.to_thread(upload.finish)
+        except DataPlaneError as e:
+            await context.abort(e.code, str(e))
+        finally:
+            await asyncio.to_thread(upload.cleanup)
+
+    async def ConvertAndIngest(self, request, context):
+        try:
+            async for event in _iterate_in_thread(
+                    convert_and_ingest(self.db, self.datafolder, request, self.batch_size)):
+                yield event
+        except DataPlaneError as e:
+            await context.abort(e.code, str(e))
+
+    async def QueryRecords(self, request, context):
+        try:
+            async for record in _iterate_in_thread(query_records(self.db, request)):
+                yield record
+        except DataPlaneError as e:
+            await context.abort(e.code, str(e))
+
+    async def ValidateXml(self, request, context):
+        try:
+            return await asyncio.to_thread(validate_xml, self.datafolder, request)
+        except DataPlaneError as e:
+            await context.abort(e.code, str(e))
+
+    async def ListCollections(self, request, context):
+        return await asyncio.to_thread(list_collections, self.db)
+
+    async def CountRecords(self, request, context):
+        try:
+            return await asyncio.to_thread(count_records, self.db, request)
+        except DataPlaneError as e:
+            await context.abort(e.code, str(e))
+
+
+def _account(future, progress):
+    written, errors = future.result()
+    progress.rows_written += written
+    if errors:
+        progress.errors += len(errors)
+        progress.message = errors[-1]
+
+
+def _snapshot(progress):
+    # The same message keeps being updated; send a copy of its current state
+    event = Progress()
+    event.CopyFrom(progress)
+    return event
+
+
+def _insert(collection, batch):
+    """Unordered insert_many; returns (written, error messages)."""
+    from pymongo.errors import BulkWriteError
+    try:
+        with instrumentation.stage("mongo_insert"):
+            collection.insert_many(batch, ordered=False)
+        return len(batch), []
+    except BulkWriteError as e:
+        errors = [err.get("errmsg", "write error") for err in e.details.get("writeErrors", [])]
+        return e.details.get("nInserted", 0), errors
+
+
+def _convert_csv(f, xml_file, batch_size, progress, profile):
+    """Write ``xml_file`` from the CSV rows (streamed with lxml.etree.xmlfile)
+    and yield the same rows as record dicts in batches of ``batch_size``.
+    Column values are added to ``profile`` (xsdgen) for the XSD.
+
+    Rows with a different number of fields than the header are counted as
+    errors and left out of both outputs.
+    """
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if header is None:
+        return
+    tags = [h.strip().replace(" ", "_") for h in header]
+    batch = []
+    with open(xml_file, "wb", buffering=1 << 20) as out, \
+            etree.xmlfile(out, encoding="utf-8", buffered=True) as xf:
+        xf.write_declaration()
+        with xf.element("data"):
+            for row in reader:
+                progress.rows_parsed += 1
+                if len(row) != len(tags):
+                    progress.errors += 1
+                    progress.message = f"line {reader.line_num}: expected {len(tags)} fields, got {len(row)}"
+                    continue
+                record = {tag: value.strip() for tag, value in zip(tags, row)}
+                record_el = etree.Element("record")
+                profile.records += 1
+                for tag, value in record.items():
+                    etree.SubElement(record_el, tag).text = value
+                    profile.column(tag).add(value)
+                xf.write(record_el)
+                batch.append(record)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+    if batch:
+        yield batch
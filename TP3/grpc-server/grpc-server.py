@@ -1,3 +1,4 @@
+import asyncio
 import os
 import subprocess
 import sys
@@ -37,6 +38,9 @@ _maybe_generate_protos()
 
 import grpc_pb2
 import grpc_pb2_grpc
+import dataplane
+import instrumentation
+import interceptors
 
 
 class GreeterServicer(grpc_pb2_grpc.GreeterServicer):
@@ -47,13 +51,54 @@ class GreeterServicer(grpc_pb2_grpc.GreeterServicer):
         return grpc_pb2.HelloReply(message=f"Hello, {name}!")
 
 
+class AsyncGreeterServicer(grpc_pb2_grpc.GreeterServicer):
+    """Greeter for the grpc.aio server."""
+
+    async def SayHello(self, request, context):
+        name = request.name or "world"
+        return grpc_pb2.HelloReply(message=f"Hello, {name}!")
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def server_options():
+    """Channel options shared by both server modes, from the environment.
+
+    GRPC_MAX_CONCURRENT_STREAMS  HTTP/2 streams per client connection (100)
+    GRPC_MAX_MESSAGE_MB          largest message sent or received (16)
+    GRPC_KEEPALIVE_TIME_MS       ping idle connections this often (30000)
+    GRPC_KEEPALIVE_TIMEOUT_MS    drop them if a ping is not answered (10000)
+    """
+    max_message = _env_int("GRPC_MAX_MESSAGE_MB", 16) * 1024 * 1024
+    keepalive_time = _env_int("GRPC_KEEPALIVE_TIME_MS", 30000)
+    return [
+        ("grpc.max_concurrent_streams", _env_int("GRPC_MAX_CONCURRENT_STREAMS", 100)),
+        ("grpc.max_send_message_length", max_message),
+        ("grpc.max_receive_message_length", max_message),
+        ("grpc.keepalive_time_ms", keepalive_time),
+        ("grpc.keepalive_timeout_ms", _env_int("GRPC_KEEPALIVE_TIMEOUT_MS", 10000)),
+        ("grpc.keepalive_permit_without_calls", 1),
+        # Accept client pings as often as we send ours
+        ("grpc.http2.min_ping_interval_without_data_ms", min(keepalive_time, 10000)),
+        ("grpc.http2.max_pings_without_data", 0),
+    ]
+
+
 def serve(host="0.0.0.0", port=50051):
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    """Thread-pool server: each call, streams included, holds one of the
+    GRPC_MAX_WORKERS threads until it ends."""
+    workers = _env_int("GRPC_MAX_WORKERS", 10)
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=workers), options=server_options(),
+                         interceptors=[interceptors.MetricsInterceptor()])
     grpc_pb2_grpc.add_GreeterServicer_to_server(GreeterServicer(), server)
+    grpc_pb2_grpc.add_DataPlaneServicer_to_server(dataplane.DataPlaneServicer(dataplane.connect_mongo()), server)
     address = f"{host}:{port}"
     server.add_insecure_port(address)
     server.start()
-    print(f"gRPC Greeter server started on {address}")
+    print(f"gRPC Greeter/DataPlane server started on {address} ({workers} worker threads)")
     try:
         while True:
             time.sleep(60)
@@ -62,5 +107,35 @@ def serve(host="0.0.0.0", port=50051):
         server.stop(0)
 
 
+async def serve_aio(host="0.0.0.0", port=50051):
+    """asyncio server: calls waiting on the network hold no thread, so long
+    streams don't starve unary calls. GRPC_MAX_CONCURRENT_RPCS (0: no limit)
+    caps the calls in progress; beyond it new calls fail with
+    RESOURCE_EXHAUSTED instead of queueing."""
+    max_rpcs = _env_int("GRPC_MAX_CONCURRENT_RPCS", 0) or None
+    server = grpc.aio.server(options=server_options(), maximum_concurrent_rpcs=max_rpcs,
+                             interceptors=[interceptors.AsyncMetricsInterceptor()])
+    grpc_pb2_grpc.add_GreeterServicer_to_server(AsyncGreeterServicer(), server)
+    grpc_pb2_grpc.add_DataPlaneServicer_to_server(dataplane.AsyncDataPlaneServicer(dataplane.connect_mongo()), server)
+    address = f"{host}:{port}"
+    server.add_insecure_port(address)
+    await server.start()
+    print(f"gRPC Greeter/DataPlane server (asyncio) started on {address}")
+    try:
+        await server.wait_for_termination()
+    finally:
+        await server.stop(5)
+
+
 if __name__ == "__main__":
-    serve()
+    # Prometheus metrics and the sampling profiler on http://0.0.0.0:METRICS_PORT (0 disables)
+    instrumentation.configure("grpc-server")
+    instrumentation.start_sidecar(os.environ.get("METRICS_PORT", 9100))
+    # GRPC_SERVER_MODE=thread keeps the thread-pool server
+    if os.environ.get("GRPC_SERVER_MODE", "aio") == "thread":
+        serve()
+    else:
+        try:
+            asyncio.run(serve_aio())
+        except KeyboardInterrupt:
+            print("Shutting down server...")
@@ -2,7 +2,7 @@
 # Generated by the protocol buffer compiler.  DO NOT EDIT!
 # NO CHECKED-IN PROTOBUF GENCODE
 # source: grpc.proto
-# Protobuf Python Version: 6.31.1
+# Protobuf Python Version: 7.35.1
 """Generated protocol buffer code."""
 from google.protobuf import descriptor as _descriptor
 from google.protobuf import descriptor_pool as _descriptor_pool
@@ -11,8 +11,8 @@ from google.protobuf import symbol_database as _symbol_database
 from google.protobuf.internal import builder as _builder
 _runtime_version.ValidateProtobufRuntimeVersion(
     _runtime_version.Domain.PUBLIC,
-    6,
-    31,
+    7,
+    35,
     1,
     '',
     'grpc.proto'
@@ -24,17 +24,61 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\ngrpc.proto\x12\x03rpc\"\x1c\n\x0cHelloRequest\x12\x0c\n\x04name\x18\x01 \x01(\t\"\x1d\n\nHelloReply\x12\x0f\n\x07message\x18\x01 \x01(\t2;\n\x07Greeter\x12\x30\n\x08SayHello\x12\x11.rpc.HelloRequest\x1a\x0f.rpc.HelloReply\"\x00\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\ngrpc.proto\x12\x03rpc\"\x1c\n\x0cHelloRequest\x12\x0c\n\x04name\x18\x01 \x01(\t\"\x1d\n\nHelloReply\x12\x0f\n\x07message\x18\x01 \x01(\t\"*\n\x08\x43svChunk\x12\x10\n\x08\x66ilename\x18\x01 \x01(\t\x12\x0c\n\x04\x64\x61ta\x18\x02 \x01(\x0c\"=\n\x0bUploadReply\x12\x10\n\x08\x66ilename\x18\x01 \x01(\t\x12\x0c\n\x04size\x18\x02 \x01(\x03\x12\x0e\n\x06sha256\x18\x03 \x01(\t\"_\n\rIngestRequest\x12\x10\n\x08\x66ilename\x18\x01 \x01(\t\x12\x12\n\ncollection\x18\x02 \x01(\t\x12\x12\n\nbatch_size\x18\x03 \x01(\x05\x12\x14\n\x0c\x63onvert_only\x18\x04 \x01(\x08\"\xe8\x01\n\x0eIngestProgress\x12(\n\x05stage\x18\x01 \x01(\x0e\x32\x19.rpc.IngestProgress.Stage\x12\x13\n\x0brows_parsed\x18\x02 \x01(\x03\x12\x14\n\x0crows_written\x18\x03 \x01(\x03\x12\x0e\n\x06\x65rrors\x18\x04 \x01(\x03\x12\x12\n\nbytes_read\x18\x05 \x01(\x03\x12\x13\n\x0b\x62ytes_total\x18\x06 \x01(\x03\x12\x0f\n\x07message\x18\x07 \x01(\t\"7\n\x05Stage\x12\x0b\n\x07STARTED\x10\x00\x12\x0b\n\x07RUNNING\x10\x01\x12\x08\n\x04\x44ONE\x10\x02\x12\n\n\x06\x46\x41ILED\x10\x03\"\xb6\x01\n\x0cQueryRequest\x12\x12\n\ncollection\x18\x01 \x01(\t\x12/\n\x07\x66ilters\x18\x02 \x03(\x0b\x32\x1e.rpc.QueryRequest.FiltersEntry\x12\x0e\n\x06\x66ields\x18\x03 \x03(\t\x12\x0e\n\x06\x63ursor\x18\x04 \x01(\t\x12\x11\n\tpage_size\x18\x05 \x01(\x05\x1a.\n\x0c\x46iltersEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\"|\n\x06Record\x12\n\n\x02id\x18\x01 \x01(\t\x12\'\n\x06\x66ields\x18\x02 \x03(\x0b\x32\x17.rpc.Record.FieldsEntry\x12\x0e\n\x06\x63ursor\x18\x03 \x01(\t\x1a-\n\x0b\x46ieldsEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\"?\n\x0fValidateRequest\x12\x0b\n\x03xml\x18\x01 \x01(\t\x12\x0b\n\x03xsd\x18\x02 \x01(\t\x12\x12\n\nmax_errors\x18\x03 \x01(\x05\"@\n\x0fValidationError\x12\x0c\n\x04line\x18\x01 \x01(\x05\x12\x0e\n\x06\x63olumn\x18\x02 \x01(\x05\x12\x0f\n\x07message\x18\x03 \x01(\t\"j\n\rValidateReply\x12\r\n\x05valid\x18\x01 \x01(\x08\x12\x0f\n\x07records\x18\x02 \x01(\x03\x12\x13\n\x0b\x65rror_count\x18\x03 \x01(\x03\x12$\n\x06\x65rrors\x18\x04 \x03(\x0b\x32\x14.rpc.ValidationError\"\x14\n\x12\x43ollectionsRequest\"-\n\x0e\x43ollectionInfo\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\r\n\x05\x63ount\x18\x02 \x01(\x03\"<\n\x10\x43ollectionsReply\x12(\n\x0b\x63ollections\x18\x01 \x03(\x0b\x32\x13.rpc.CollectionInfo\"\x83\x01\n\x0c\x43ountRequest\x12\x12\n\ncollection\x18\x01 \x01(\t\x12/\n\x07\x66ilters\x18\x02 \x03(\x0b\x32\x1e.rpc.CountRequest.FiltersEntry\x1a.\n\x0c\x46iltersEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\"\x1b\n\nCountReply\x12\r\n\x05\x63ount\x18\x01 \x01(\x03\x32;\n\x07Greeter\x12\x30\n\x08SayHello\x12\x11.rpc.HelloRequest\x1a\x0f.rpc.HelloReply\"\x00\x32\xe8\x02\n\tDataPlane\x12\x30\n\tUploadCsv\x12\r.rpc.CsvChunk\x1a\x10.rpc.UploadReply\"\x00(\x01\x12?\n\x10\x43onvertAndIngest\x12\x12.rpc.IngestRequest\x1a\x13.rpc.IngestProgress\"\x00\x30\x01\x12\x32\n\x0cQueryRecords\x12\x11.rpc.QueryRequest\x1a\x0b.rpc.Record\"\x00\x30\x01\x12\x39\n\x0bValidateXml\x12\x14.rpc.ValidateRequest\x1a\x12.rpc.ValidateReply\"\x00\x12\x43\n\x0fListCollections\x12\x17.rpc.CollectionsRequest\x1a\x15.rpc.CollectionsReply\"\x00\x12\x34\n\x0c\x43ountRecords\x12\x11.rpc.CountRequest\x1a\x0f.rpc.CountReply\"\x00\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'grpc_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
+  _globals['_QUERYREQUEST_FILTERSENTRY']._loaded_options = None
+  _globals['_QUERYREQUEST_FILTERSENTRY']._serialized_options = b'8\001'
+  _globals['_RECORD_FIELDSENTRY']._loaded_options = None
+  _globals['_RECORD_FIELDSENTRY']._serialized_options = b'8\001'
+  _globals['_COUNTREQUEST_FILTERSENTRY']._loaded_options = None
+  _globals['_COUNTREQUEST_FILTERSENTRY']._serialized_options = b'8\001'
   _globals['_HELLOREQUEST']._serialized_start=19
   _globals['_HELLOREQUEST']._serialized_end=47
   _globals['_HELLOREPLY']._serialized_start=49
   _globals['_HELLOREPLY']._serialized_end=78
-  _globals['_GREETER']._serialized_start=80
-  _globals['_GREETER']._serialized_end=139
+  _globals['_CSVCHUNK']._serialized_start=80
+  _globals['_CSVCHUNK']._serialized_end=122
+  _globals['_UPLOADREPLY']._serialized_start=124
+  _globals['_UPLOADREPLY']._serialized_end=185
+  _globals['_INGESTREQUEST']._serialized_start=187
+  _globals['_INGESTREQUEST']._serialized_end=282
+  _globals['_INGESTPROGRESS']._serialized_start=285
+  _globals['_INGESTPROGRESS']._serialized_end=517
+  _globals['_INGESTPROGRESS_STAGE']._serialized_start=462
+  _globals['_INGESTPROGRESS_STAGE']._serialized_end=517
+  _globals['_QUERYREQUEST']._serialized_start=520
+  _globals['_QUERYREQUEST']._serialized_end=702
+  _globals['_QUERYREQUEST_FILTERSENTRY']._serialized_start=656
+  _globals['_QUERYREQUEST_FILTERSENTRY']._serialized_end=702
+  _globals['_RECORD']._serialized_start=704
+  _globals['_RECORD']._serialized_end=828
+  _globals['_RECORD_FIELDSENTRY']._serialized_start=783
+  _globals['_RECORD_FIELDSENTRY']._serialized_end=828
+  _globals['_VALIDATEREQUEST']._serialized_start=830
+  _globals['_VALIDATEREQUEST']._serialized_end=893
+  _globals['_VALIDATIONERROR']._serialized_start=895
+  _globals['_VALIDATIONERROR']._serialized_end=959
+  _globals['_VALIDATEREPLY']._serialized_start=961
+  _globals['_VALIDATEREPLY']._serialized_end=1067
+  _globals['_COLLECTIONSREQUEST']._serialized_start=1069
+  _globals['_COLLECTIONSREQUEST']._serialized_end=1089
+  _globals['_COLLECTIONINFO']._serialized_start=1091
+  _globals['_COLLECTIONINFO']._serialized_end=1136
+  _globals['_COLLECTIONSREPLY']._serialized_start=1138
+  _globals['_COLLECTIONSREPLY']._serialized_end=1198
+  _globals['_COUNTREQUEST']._serialized_start=1201
+  _globals['_COUNTREQUEST']._serialized_end=1332
+  _globals['_COUNTREQUEST_FILTERSENTRY']._serialized_start=656
+  _globals['_COUNTREQUEST_FILTERSENTRY']._serialized_end=702
+  _globals['_COUNTREPLY']._serialized_start=1334
+  _globals['_COUNTREPLY']._serialized_end=1361
+  _globals['_GREETER']._serialized_start=1363
+  _globals['_GREETER']._serialized_end=1422
+  _globals['_DATAPLANE']._serialized_start=1425
+  _globals['_DATAPLANE']._serialized_end=1785
 # @@protoc_insertion_point(module_scope)
@@ -5,7 +5,7 @@ import warnings
 
 import grpc_pb2 as grpc__pb2
 
-GRPC_GENERATED_VERSION = '1.76.0'
+GRPC_GENERATED_VERSION = '1.84.0'
 GRPC_VERSION = grpc.__version__
 _version_not_supported = False
 
@@ -25,7 +25,7 @@ if _version_not_supported:
     )
 
 
-class GreeterStub(object):
+class GreeterStub:
     """Missing associated documentation comment in .proto file."""
 
     def __init__(self, channel):
@@ -41,7 +41,7 @@ class GreeterStub(object):
                 _registered_method=True)
 
 
-class GreeterServicer(object):
+class GreeterServicer:
     """Missing associated documentation comment in .proto file."""
 
     def SayHello(self, request, context):
@@ -67,7 +67,7 @@ def add_GreeterServicer_to_server(servicer, server):
 
 
  # This class is part of an EXPERIMENTAL API.
-class Greeter(object):
+class Greeter:
     """Missing associated documentation comment in .proto file."""
 
     @staticmethod
@@ -96,3 +96,300 @@ class Greeter(object):
             timeout,
             metadata,
             _registered_method=True)
+
+
+class DataPlaneStub:
+    """Data plane: CSV upload, conversion and ingestion into MongoDB
+    """
+
+    def __init__(self, channel):
+        """Constructor.
+
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.UploadCsv = channel.stream_unary(
+                '/rpc.DataPlane/UploadCsv',
+                request_serializer=grpc__pb2.CsvChunk.SerializeToString,
+                response_deserializer=grpc__pb2.UploadReply.FromString,
+                _registered_method=True)
+        self.ConvertAndIngest = channel.unary_stream(
+                '/rpc.DataPlane/ConvertAndIngest',
+                request_serializer=grpc__pb2.IngestRequest.SerializeToString,
+                response_deserializer=grpc__pb2.IngestProgress.FromString,
+                _registered_method=True)
+        self.QueryRecords = channel.unary_stream(
+                '/rpc.DataPlane/QueryRecords',
+                request_serializer=grpc__pb2.QueryRequest.SerializeToString,
+                response_deserializer=grpc__pb2.Record.FromString,
+                _registered_method=True)
+        self.ValidateXml = channel.unary_unary(
+                '/rpc.DataPlane/ValidateXml',
+                request_serializer=grpc__pb2.ValidateRequest.SerializeToString,
+                response_deserializer=grpc__pb2.ValidateReply.FromString,
+                _registered_method=True)
+        self.ListCollections = channel.unary_unary(
+                '/rpc.DataPlane/ListCollections',
+                request_serializer=grpc__pb2.CollectionsRequest.SerializeToString,
+                response_deserializer=grpc__pb2.CollectionsReply.FromString,
+                _registered_method=True)
+        self.CountRecords = channel.unary_unary(
+                '/rpc.DataPlane/CountRecords',
+                request_serializer=grpc__pb2.CountRequest.SerializeToString,
+                response_deserializer=grpc__pb2.CountReply.FromString,
+                _registered_method=True)
+
+
+class DataPlaneServicer:
+    """Data plane: CSV upload, conversion and ingestion into MongoDB
+    """
+
+    def UploadCsv(self, request_iterator, context):
+        """Uploads a CSV in chunks; the first chunk must carry the file name
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ConvertAndIngest(self, request, context):
+        """Converts a CSV from the shared folder to XML and loads its records into
+        MongoDB, streaming progress events until done
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def QueryRecords(self, request, context):
+        """Streams one page of a collection's records, in _id order
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ValidateXml(self, request, context):
+        """Validates an XML from the shared folder against an XSD
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ListCollections(self, request, context):
+        """Collections in the database with their (estimated) record counts
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def CountRecords(self, request, context):
+        """Exact number of records matching the filters
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+
+def add_DataPlaneServicer_to_server(servicer, server):
+    rpc_method_handlers = {
+            'UploadCsv': grpc.stream_unary_rpc_method_handler(
+                    servicer.UploadCsv,
+                    request_deserializer=grpc__pb2.CsvChunk.FromString,
+                    response_serializer=grpc__pb2.UploadReply.SerializeToString,
+            ),
+            'ConvertAndIngest': grpc.unary_stream_rpc_method_handler(
+                    servicer.ConvertAndIngest,
+                    request_deserializer=grpc__pb2.IngestRequest.FromString,
+                    response_serializer=grpc__pb2.IngestProgress.SerializeToString,
+            ),
+            'QueryRecords': grpc.unary_stream_rpc_method_handler(
+                    servicer.QueryRecords,
+                    request_deserializer=grpc__pb2.QueryRequest.FromString,
+                    response_serializer=grpc__pb2.Record.SerializeToString,
+            ),
+            'ValidateXml': grpc.unary_unary_rpc_method_handler(
+                    servicer.ValidateXml,
+                    request_deserializer=grpc__pb2.ValidateRequest.FromString,
+                    response_serializer=grpc__pb2.ValidateReply.SerializeToString,
+            ),
+            'ListCollections': grpc.unary_unary_rpc_method_handler(
+                    servicer.ListCollections,
+                    request_deserializer=grpc__pb2.CollectionsRequest.FromString,
+                    response_serializer=grpc__pb2.CollectionsReply.SerializeToString,
+            ),
+            'CountRecords': grpc.unary_unary_rpc_method_handler(
+                    servicer.CountRecords,
+                    request_deserializer=grpc__pb2.CountRequest.FromString,
+                    response_serializer=grpc__pb2.CountReply.SerializeToString,
+            ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+            'rpc.DataPlane', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+    server.add_registered_method_handlers('rpc.DataPlane', rpc_method_handlers)
+
+
+ # This class is part of an EXPERIMENTAL API.
+class DataPlane:
+    """Data plane: CSV upload, conversion and ingestion into MongoDB
+    """
+
+    @staticmethod
+    def UploadCsv(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/rpc.DataPlane/UploadCsv',
+            grpc__pb2.CsvChunk.SerializeToString,
+            grpc__pb2.UploadReply.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ConvertAndIngest(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/rpc.DataPlane/ConvertAndIngest',
+            grpc__pb2.IngestRequest.SerializeToString,
+            grpc__pb2.IngestProgress.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def QueryRecords(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/rpc.DataPlane/QueryRecords',
+            grpc__pb2.QueryRequest.SerializeToString,
+            grpc__pb2.Record.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ValidateXml(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/rpc.DataPlane/ValidateXml',
+            grpc__pb2.ValidateRequest.SerializeToString,
+            grpc__pb2.ValidateReply.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ListCollections(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/rpc.DataPlane/ListCollections',
+            grpc__pb2.CollectionsRequest.SerializeToString,
+            grpc__pb2.CollectionsReply.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def CountRecords(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/rpc.DataPlane/CountRecords',
+            grpc__pb2.CountRequest.SerializeToString,
+            grpc__pb2.CountReply.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -0,0 +1,335 @@
+"""Metrics and profiling hooks shared by every service.
+
+Each service folder is its own Docker build context, so this file is copied
+into each of them (like the gRPC stubs in TP3); keep the copies identical.
+
+Metrics use prometheus_client when it is installed (and METRICS is not "0");
+otherwise every call here is a no-op, so the services run the same without it.
+All series carry a ``service`` label (SERVICE_NAME, or ``configure()``):
+
+    is_request_duration_seconds{kind,name}   latency of each RPC / HTTP route
+    is_requests_in_flight{kind,name}         calls currently running
+    is_errors_total{kind,name,error}         failures by exception type or status
+    is_stage_duration_seconds{stage}         time spent in pipeline stages
+    is_rows_processed_total{stage}           rows parsed / written per stage
+    is_bytes_processed_total{stage}          bytes read / written per stage
+
+With several worker processes (uvicorn --workers, the XML-RPC process pool)
+set PROMETHEUS_MULTIPROC_DIR to an empty directory shared by them before
+they start: each process then writes its samples there and ``render()``
+aggregates all of them.
+
+``profiler`` is an in-process sampling profiler that can be started and
+stopped at runtime (``/debug/profile`` on the metrics endpoints). It records
+every thread's stack each ``interval`` seconds and reports them in collapsed
+form (``frame;frame;frame count``), which flamegraph.pl and speedscope read.
+Stacks show file names and call paths, so the routes answer 404 unless
+PROFILER_TOKEN is set, and then only to requests carrying that token in the
+``X-Profiler-Token`` header.
+
+The sidecar port (``start_sidecar``) binds to METRICS_HOST, 127.0.0.1 by
+default; containers set it to 0.0.0.0 to be scraped from outside.
+"""
+import functools
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+try:
+    import prometheus_client as prom
+except ImportError:
+    prom = None
+
+SERVICE = os.environ.get("SERVICE_NAME", "app")
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900)
+
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount=1):
+        pass
+
+    def dec(self, amount=1):
+        pass
+
+    def observe(self, value):
+        pass
+
+
+def enabled():
+    return prom is not None and os.environ.get("METRICS", "1") != "0"
+
+
+def _metric(cls_name, name, documentation, labels, **kwargs):
+    if not enabled():
+        return _NoopMetric()
+    return getattr(prom, cls_name)(name, documentation, ["service", *labels], **kwargs)
+
+
+REQUEST_LATENCY = _metric("Histogram", "is_request_duration_seconds", "Latency of RPCs and HTTP routes",
+                          ["kind", "name"], buckets=LATENCY_BUCKETS)
+IN_FLIGHT = _metric("Gauge", "is_requests_in_flight", "RPCs and HTTP requests currently running",
+                    ["kind", "name"], multiprocess_mode="livesum")
+ERRORS = _metric("Counter", "is_errors", "Failed RPCs, routes and jobs by error type",
+                 ["kind", "name", "error"])
+STAGE_LATENCY = _metric("Histogram", "is_stage_duration_seconds", "Time spent in pipeline stages",
+                        ["stage"], buckets=LATENCY_BUCKETS)
+ROWS = _metric("Counter", "is_rows_processed", "Rows processed per pipeline stage", ["stage"])
+BYTES = _metric("Counter", "is_bytes_processed", "Bytes processed per pipeline stage", ["stage"])
+
+
+def configure(service):
+    """Set the ``service`` label (call once, before serving)."""
+    global SERVICE
+    SERVICE = service
+
+
+@contextmanager
+def track(kind, name):
+    """Time a call into the latency histogram and in-flight gauge; an
+    exception escaping it is counted by its type and re-raised."""
+    in_flight = IN_FLIGHT.labels(SERVICE, kind, name)
+    in_flight.inc()
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        count_error(kind, name, type(e).__name__)
+        raise
+    finally:
+        REQUEST_LATENCY.labels(SERVICE, kind, name).observe(time.perf_counter() - started)
+        in_flight.dec()
+
+
+def instrument(kind, name=None, is_error=None):
+    """Decorator form of ``track`` for plain functions. ``is_error(result)``
+    returns an error type for results that signal a failure without raising
+    (e.g. "Erro: ..." strings from the XML-RPC server), or None."""
+    def decorate(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with track(kind, label):
+                result = func(*args, **kwargs)
+            if is_error is not None:
+                error = is_error(result)
+                if error:
+                    count_error(kind, label, error)
+            return result
+        return wrapper
+    return decorate
+
+
+def observe(kind, name, seconds, error=None):
+    """Record a call timed elsewhere (e.g. a job that ran in another process)."""
+    REQUEST_LATENCY.labels(SERVICE, kind, name).observe(seconds)
+    if error:
+        count_error(kind, name, error)
+
+
+def count_error(kind, name, error):
+    ERRORS.labels(SERVICE, kind, name, error).inc()
+
+
+@contextmanager
+def stage(name):
+    """Time one stage of a pipeline (parse, write, validate, ...)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(SERVICE, name).observe(time.perf_counter() - started)
+
+
+def observe_stage(name, seconds):
+    """Record a stage duration measured by the caller."""
+    STAGE_LATENCY.labels(SERVICE, name).observe(seconds)
+
+
+def add_rows(stage_name, rows):
+    if rows > 0:
+        ROWS.labels(SERVICE, stage_name).inc(rows)
+
+
+def add_bytes(stage_name, nbytes):
+    if nbytes > 0:
+        BYTES.labels(SERVICE, stage_name).inc(nbytes)
+
+
+def render():
+    """(body, content type) of the metrics in the Prometheus text format."""
+    if not enabled():
+        return b"# metrics disabled (prometheus_client not installed or METRICS=0)\n", "text/plain; charset=utf-8"
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = prom.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return prom.generate_latest(registry), prom.CONTENT_TYPE_LATEST
+    return prom.generate_latest(), prom.CONTENT_TYPE_LATEST
+
+
+class SamplingProfiler:
+    """Samples the stacks of all threads from a background thread."""
+
+    def __init__(self, max_stacks=20000):
+        self.max_stacks = max_stacks
+        self._stacks = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.interval = 0.01
+        self.samples = 0
+        self.started = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=0.01, reset=True):
+        if self.running:
+            return False
+        if reset:
+            self.reset()
+        self.interval = max(0.001, float(interval))
+        self._stop.clear()
+        self.started = time.time()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        if not self.running:
+            return False
+        self._stop.set()
+        self._thread.join()
+        return True
+
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
+            self.samples = 0
+
+    def _run(self):
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()} if self.samples % 100 == 0 else names
+            frames = sys._current_frames()
+            with self._lock:
+                self.samples += 1
+                for ident, frame in frames.items():
+                    if ident == me:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                        frame = frame.f_back
+                    stack.append(names.get(ident, "thread"))
+                    key = ";".join(reversed(stack))
+                    if key in self._stacks or len(self._stacks) < self.max_stacks:
+                        self._stacks[key] += 1
+
+    def status(self):
+        return {"running": self.running, "interval": self.interval, "samples": self.samples,
+                "stacks": len(self._stacks), "started": self.started}
+
+    def collapsed(self, limit=None):
+        """Samples per distinct stack, most frequent first."""
+        with self._lock:
+            items = self._stacks.most_common(limit)
+        return "".join(f"{stack} {count}\n" for stack, count in items)
+
+
+profiler = SamplingProfiler()
+if os.environ.get("PROFILER", "0") == "1":
+    profiler.start(float(os.environ.get("PROFILER_INTERVAL", 0.01)))
+
+
+PROFILER_TOKEN_HEADER = "X-Profiler-Token"
+
+
+def profile_request(method, action, params, token=None):
+    """Shared handler of ``/debug/profile[/<action>]`` for every service.
+
+    GET                         collapsed stacks so far (``?limit=N``)
+    POST .../start?interval=s   start sampling (clears the previous samples)
+    POST .../stop               stop sampling (the samples are kept)
+    GET  .../status             state as text
+
+    ``token`` is the request's ``X-Profiler-Token`` header; it must match
+    PROFILER_TOKEN (without one the routes are disabled). Returns (status
+    code, body text).
+    """
+    expected = os.environ.get("PROFILER_TOKEN", "")
+    if not expected:
+        return 404, "profiler routes are disabled (set PROFILER_TOKEN)\n"
+    if not hmac.compare_digest((token or "").encode(), expected.encode()):
+        return 403, f"missing or wrong {PROFILER_TOKEN_HEADER}\n"
+    if method == "GET" and action in ("", None):
+        limit = params.get("limit")
+        return 200, profiler.collapsed(int(limit) if limit else None)
+    if method == "GET" and action == "status":
+        return 200, "".join(f"{k}: {v}\n" for k, v in profiler.status().items())
+    if method == "POST" and action == "start":
+        started = profiler.start(float(params.get("interval") or 0.01))
+        return 200 if started else 409, "started\n" if started else "already running\n"
+    if method == "POST" and action == "stop":
+        stopped = profiler.stop()
+        return 200 if stopped else 409, f"stopped after {profiler.samples} samples\n" if stopped else "not running\n"
+    return 404, "unknown profiler action\n"
+
+
+class _SidecarHandler(BaseHTTPRequestHandler):
+    def _respond(self, status, body, content_type="text/plain; charset=utf-8"):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, method):
+        url = urlsplit(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if url.path == "/metrics" and method == "GET":
+            self._respond(200, *render())
+        elif url.path == "/debug/profile" or url.path.startswith("/debug/profile/"):
+            self._respond(*profile_request(method, url.path[len("/debug/profile/"):], params,
+                                           self.headers.get(PROFILER_TOKEN_HEADER)))
+        else:
+            self._respond(404, "not found\n")
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_sidecar(port, host=None):
+    """Serve /metrics and /debug/profile on their own port from a daemon
+    thread (for the XML-RPC and gRPC servers, which don't speak plain HTTP
+    routes). Port 0 or a negative port disables it. ``host`` defaults to
+    METRICS_HOST or 127.0.0.1."""
+    port = int(port)
+    if port <= 0:
+        return None
+    host = host or os.environ.get("METRICS_HOST", "127.0.0.1")
+    server = ThreadingHTTPServer((host, port), _SidecarHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-sidecar", daemon=True).start()
+    return server
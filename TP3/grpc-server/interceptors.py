@@ -0,0 +1,121 @@
+import time
+
+import grpc
+
+import instrumentation
+
+# Server interceptors recording latency, in-flight calls and errors for every
+# RPC (see instrumentation.py). Streaming calls are measured over the whole
+# stream, from the first request to the last response.
+
+
+def _method_name(handler_call_details):
+    # "/rpc.DataPlane/UploadCsv" -> "DataPlane/UploadCsv"
+    return handler_call_details.method.rsplit(".", 1)[-1]
+
+
+def _error(context, exc=None):
+    """Error label of a finished call: its status code if the handler set
+    one (context.abort), else the exception type."""
+    code = context.code()
+    if isinstance(code, grpc.StatusCode) and code != grpc.StatusCode.OK:
+        return code.name
+    if exc is not None:
+        return type(exc).__name__
+    return None
+
+
+class _Call:
+    def __init__(self, name):
+        self.name = name
+        self.in_flight = instrumentation.IN_FLIGHT.labels(instrumentation.SERVICE, "rpc", name)
+        self.in_flight.inc()
+        self.started = time.perf_counter()
+
+    def finish(self, context, exc=None):
+        self.in_flight.dec()
+        instrumentation.observe("rpc", self.name, time.perf_counter() - self.started, _error(context, exc))
+
+
+def _rebuild(handler, wrap_unary, wrap_stream):
+    if handler.unary_unary:
+        factory, behavior, wrap = grpc.unary_unary_rpc_method_handler, handler.unary_unary, wrap_unary
+    elif handler.stream_unary:
+        factory, behavior, wrap = grpc.stream_unary_rpc_method_handler, handler.stream_unary, wrap_unary
+    elif handler.unary_stream:
+        factory, behavior, wrap = grpc.unary_stream_rpc_method_handler, handler.unary_stream, wrap_stream
+    else:
+        factory, behavior, wrap = grpc.stream_stream_rpc_method_handler, handler.stream_stream, wrap_stream
+    return factory(wrap(behavior), request_deserializer=handler.request_deserializer,
+                   response_serializer=handler.response_serializer)
+
+
+class MetricsInterceptor(grpc.ServerInterceptor):
+    """For the thread-pool server."""
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+        name = _method_name(handler_call_details)
+
+        def wrap_unary(behavior):
+            def call(request, context):
+                state = _Call(name)
+                try:
+                    response = behavior(request, context)
+                except BaseException as e:
+                    state.finish(context, e)
+                    raise
+                state.finish(context)
+                return response
+            return call
+
+        def wrap_stream(behavior):
+            def call(request, context):
+                state = _Call(name)
+                try:
+                    yield from behavior(request, context)
+                except BaseException as e:
+                    state.finish(context, e)
+                    raise
+                state.finish(context)
+            return call
+
+        return _rebuild(handler, wrap_unary, wrap_stream)
+
+
+class AsyncMetricsInterceptor(grpc.aio.ServerInterceptor):
+    """For the grpc.aio server."""
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        name = _method_name(handler_call_details)
+
+        def wrap_unary(behavior):
+            async def call(request, context):
+                state = _Call(name)
+                try:
+                    response = await behavior(request, context)
+                except BaseException as e:
+                    state.finish(context, e)
+                    raise
+                state.finish(context)
+                return response
+            return call
+
+        def wrap_stream(behavior):
+            async def call(request, context):
+                state = _Call(name)
+                try:
+                    async for response in behavior(request, context):
+                        yield response
+                except BaseException as e:
+                    state.finish(context, e)
+                    raise
+                state.finish(context)
+            return call
+
+        return _rebuild(handler, wrap_unary, wrap_stream)
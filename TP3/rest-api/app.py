@@ -1,10 +1,475 @@
-from typing import Optional, Dict
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Optional, Dict, List
 
-from fastapi import FastAPI, HTTPException
+import grpc
+from fastapi import FastAPI, File, HTTPException, Query, Request, UploadFile
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Match
+from google.protobuf.json_format import MessageToDict
 from pydantic import BaseModel
 
-app = FastAPI(title="Rest_api", version="0.1")
+# Stubs generated from ../grpc-server/grpc.proto (copied here, since each
+# service is built on its own)
+import grpc_pb2
+import grpc_pb2_grpc
+import instrumentation
+from cache import ResponseCache, etag_matches
+
+GRPC_TARGET = os.environ.get("GRPC_TARGET", "grpc-server:50051")
+MAX_PAGE_SIZE = int(os.environ.get("QUERY_MAX_PAGE_SIZE", 1000))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+NDJSON = "application/x-ndjson"
+log = logging.getLogger("uvicorn.error")
+
+# Collection listings, counts and validation results polled by dashboards.
+# Each worker process has its own cache; an ingest or conversion through this
+# worker drops the entries it affects, anything else shows up within CACHE_TTL.
+cache = ResponseCache(max_entries=int(os.environ.get("CACHE_MAX_ENTRIES", 1024)),
+                      ttl=float(os.environ.get("CACHE_TTL", 10)))
+
+# Same limits as the server (see ../grpc-server/README.md)
+CHANNEL_OPTIONS = [
+    ("grpc.max_send_message_length", int(os.environ.get("GRPC_MAX_MESSAGE_MB", 16)) * 1024 * 1024),
+    ("grpc.max_receive_message_length", int(os.environ.get("GRPC_MAX_MESSAGE_MB", 16)) * 1024 * 1024),
+    ("grpc.keepalive_time_ms", int(os.environ.get("GRPC_KEEPALIVE_TIME_MS", 30000))),
+    ("grpc.keepalive_timeout_ms", int(os.environ.get("GRPC_KEEPALIVE_TIMEOUT_MS", 10000))),
+    ("grpc.keepalive_permit_without_calls", 1),
+]
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # One channel per worker process for its whole life: calls are
+    # multiplexed over the same HTTP/2 connection instead of dialing each time
+    channel = grpc.aio.insecure_channel(GRPC_TARGET, options=CHANNEL_OPTIONS)
+    app.state.channel = channel
+    app.state.data_plane = grpc_pb2_grpc.DataPlaneStub(channel)
+    try:
+        yield
+    finally:
+        await channel.close()
+
+
+app = FastAPI(title="Rest_api", version="0.2", lifespan=lifespan)
+instrumentation.configure("rest-api")
+
+
+class MetricsMiddleware:
+    """Latency, in-flight requests and error statuses per route pattern. A
+    plain ASGI middleware, so streamed responses are timed until their last
+    chunk is sent."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def _route(self, scope):
+        for route in app.router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        name = self._route(scope)
+        status = []
+
+        async def send_status(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+            await send(message)
+
+        in_flight = instrumentation.IN_FLIGHT.labels(instrumentation.SERVICE, "route", name)
+        in_flight.inc()
+        started = time.perf_counter()
+        error = None
+        try:
+            await self.app(scope, receive, send_status)
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            in_flight.dec()
+            if error is None and status and status[0] >= 400:
+                error = f"http_{status[0]}"
+            instrumentation.observe("route", name, time.perf_counter() - started, error)
+
+
+app.add_middleware(MetricsMiddleware)
+
+
+def data_plane(request):
+    """DataPlane stub on the channel shared by all requests of this worker."""
+    return request.app.state.data_plane
+
+
+class ConvertBody(BaseModel):
+    filename: str
+
+
+class IngestBody(BaseModel):
+    filename: str
+    collection: Optional[str] = None
+    batch_size: int = 0
+
+
+class ValidateBody(BaseModel):
+    xml: str
+    xsd: Optional[str] = None
+    max_errors: int = 50
+
+
+_GRPC_HTTP_STATUS = {
+    grpc.StatusCode.INVALID_ARGUMENT: 400,
+    grpc.StatusCode.NOT_FOUND: 404,
+    grpc.StatusCode.RESOURCE_EXHAUSTED: 429,
+    grpc.StatusCode.UNAVAILABLE: 503,
+    grpc.StatusCode.DEADLINE_EXCEEDED: 504,
+}
+
+
+def _http_error(e):
+    status = _GRPC_HTTP_STATUS.get(e.code())
+    if status is None:
+        # INTERNAL/UNKNOWN details may carry server internals; log, don't echo
+        log.error("data plane error %s: %s", e.code().name, e.details())
+        return HTTPException(status_code=502, detail=f"data plane error ({e.code().name})")
+    return HTTPException(status_code=status, detail=e.details())
+
+
+def _check_name(value, what):
+    # Same rule as the servicer: no Mongo operators ($where, $ne, ...) or NUL
+    if not value or value.startswith("$") or "\0" in value:
+        raise HTTPException(status_code=400, detail=f"invalid {what}: {value!r}")
+    return value
+
+
+def _check_collection(value):
+    # Same rule as the servicer, including MongoDB's collection name limits
+    _check_name(value, "collection")
+    if ("$" in value or ".." in value or value.startswith((".", "system."))
+            or value.endswith(".")):
+        raise HTTPException(status_code=400, detail=f"invalid collection: {value!r}")
+    return value
+
+
+def _to_dict(message):
+    data = MessageToDict(message, preserving_proto_field_name=True,
+                         always_print_fields_with_no_presence=True)
+    # The proto JSON mapping writes int64 as strings; these are counts and sizes
+    for field in message.DESCRIPTOR.fields:
+        if field.type == field.TYPE_INT64:
+            data[field.name] = getattr(message, field.name)
+    return data
+
+
+def _json_bytes(data):
+    return json.dumps(data, separators=(",", ":")).encode()
+
+
+def _collection_stem(filename):
+    # Default collection / XML name the server derives from a CSV name
+    name = Path(filename).name
+    return name[:-4] if name.lower().endswith(".csv") else name
+
+
+async def cached_json(request, key, tags, produce):
+    """JSON response for ``key``, from the cache or ``await produce()``.
+
+    Sends an ETag with it; a request whose If-None-Match still matches gets
+    304 with no body. gRPC errors are not cached."""
+    async def build():
+        try:
+            return _json_bytes(await produce())
+        except grpc.RpcError as e:
+            raise _http_error(e)
+
+    entry = await cache.get_or_create(key, tags, build)
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        cache.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
+
+def _validation_key(xml, xsd, max_errors):
+    return ("validation", Path(xml).name, Path(xsd).name if xsd else "", max_errors)
+
+
+def _record_dict(record):
+    return {"_id": record.id, **record.fields}
+
+
+async def _first(call):
+    """First message of a server stream (None if empty). Reading it before
+    the response starts turns gRPC errors into HTTP errors instead of a
+    truncated 200 response."""
+    try:
+        message = await call.read()
+    except grpc.RpcError as e:
+        raise _http_error(e)
+    return None if message is grpc.aio.EOF else message
+
+
+async def _rest(call):
+    """Remaining messages of a stream already started with ``_first`` (the
+    aio API doesn't allow mixing read() and async iteration on one call)."""
+    while True:
+        message = await call.read()
+        if message is grpc.aio.EOF:
+            return
+        yield message
+
+
+def _query_request(collection, fields, filter, cursor, page_size):
+    filters = {}
+    for item in filter:
+        field, sep, value = item.partition(":")
+        if not sep or not field:
+            raise HTTPException(status_code=400, detail=f"filter must be field:value, got '{item}'")
+        filters[_check_name(field, "filter field")] = value
+    return grpc_pb2.QueryRequest(
+        collection=_check_collection(collection),
+        filters=filters,
+        fields=[_check_name(f.strip(), "field") for f in fields.split(",") if f.strip()] if fields else [],
+        cursor=cursor or "",
+        page_size=page_size,
+    )
+
 
 @app.get("/", tags=["root"])
-def read_root():
-    return {"message": "Hello from FastAPI REST API"}
\ No newline at end of file
+async def read_root():
+    return {"message": "Hello from FastAPI REST API"}
+
+
+@app.post("/upload", tags=["files"])
+async def upload_csv(request: Request, file: UploadFile = File(...)):
+    """Stream a CSV to the shared folder through DataPlane.UploadCsv."""
+    async def chunks():
+        first = True
+        while True:
+            data = await file.read(UPLOAD_CHUNK_SIZE)
+            if not data and not first:
+                return
+            instrumentation.add_bytes("upload", len(data))
+            yield grpc_pb2.CsvChunk(filename=file.filename if first else "", data=data)
+            first = False
+
+    try:
+        reply = await data_plane(request).UploadCsv(chunks())
+    except grpc.RpcError as e:
+        raise _http_error(e)
+    return _to_dict(reply)
+
+
+_FINISHED = (grpc_pb2.IngestProgress.DONE, grpc_pb2.IngestProgress.FAILED)
+
+
+async def _run_ingest(request, ingest_request, stream, tags):
+    """Run ConvertAndIngest; once it finishes, drop the cache entries
+    labelled with ``tags`` (even a failed run may have written some)."""
+    call = data_plane(request).ConvertAndIngest(ingest_request)
+    event = await _first(call)
+    if stream:
+        # One progress event per line, as the server sends them
+        async def body():
+            # Also when the client disconnects or the stream fails midway:
+            # rows already written must not stay behind cached responses
+            try:
+                yield json.dumps(_to_dict(event)) + "\n"
+                async for message in _rest(call):
+                    if message.stage in _FINISHED:
+                        cache.invalidate(*tags)
+                    yield json.dumps(_to_dict(message)) + "\n"
+            finally:
+                cache.invalidate(*tags)
+        return StreamingResponse(body(), media_type=NDJSON)
+    try:
+        async for message in _rest(call):
+            event = message
+    except grpc.RpcError as e:
+        raise _http_error(e)
+    finally:
+        cache.invalidate(*tags)
+    if event.stage == grpc_pb2.IngestProgress.FAILED:
+        raise HTTPException(status_code=500, detail=event.message)
+    return _to_dict(event)
+
+
+@app.post("/convert", tags=["files"])
+async def convert_csv(request: Request, body: ConvertBody,
+                      stream: bool = Query(False, description="Stream progress as NDJSON")):
+    """Convert a CSV in the shared folder to XML."""
+    tags = ["file:" + _collection_stem(body.filename)]
+    return await _run_ingest(request, grpc_pb2.IngestRequest(filename=body.filename, convert_only=True),
+                             stream, tags)
+
+
+@app.post("/ingest", tags=["files"])
+async def ingest_csv(request: Request, body: IngestBody,
+                     stream: bool = Query(False, description="Stream progress as NDJSON")):
+    """Convert a CSV to XML and load its records into MongoDB."""
+    collection = _check_collection(body.collection or _collection_stem(body.filename))
+    ingest_request = grpc_pb2.IngestRequest(filename=body.filename, collection=body.collection or "",
+                                            batch_size=body.batch_size)
+    tags = ["collections", "collection:" + collection, "file:" + _collection_stem(body.filename)]
+    return await _run_ingest(request, ingest_request, stream, tags)
+
+
+@app.post("/validate", tags=["files"])
+async def validate_xml(request: Request, body: ValidateBody):
+    """Validate an XML in the shared folder against its XSD. The result
+    also becomes the cached answer of ``GET /validation``."""
+    try:
+        reply = await data_plane(request).ValidateXml(
+            grpc_pb2.ValidateRequest(xml=body.xml, xsd=body.xsd or "", max_errors=body.max_errors))
+    except grpc.RpcError as e:
+        raise _http_error(e)
+    result = _to_dict(reply)
+    cache.put(_validation_key(body.xml, body.xsd, body.max_errors), _json_bytes(result),
+              ["file:" + Path(Path(body.xml).name).stem])
+    return result
+
+
+@app.get("/validation", tags=["files"])
+async def validation_status(
+    request: Request,
+    xml: str,
+    xsd: Optional[str] = None,
+    max_errors: int = Query(50, ge=0),
+):
+    """Validation result of an XML, cached (with an ETag) until the XML is
+    converted again or CACHE_TTL passes."""
+    async def produce():
+        reply = await data_plane(request).ValidateXml(
+            grpc_pb2.ValidateRequest(xml=xml, xsd=xsd or "", max_errors=max_errors))
+        return _to_dict(reply)
+    return await cached_json(request, _validation_key(xml, xsd, max_errors),
+                             ["file:" + Path(Path(xml).name).stem], produce)
+
+
+@app.get("/collections", tags=["records"])
+async def list_collections(request: Request):
+    """Collections with their estimated record counts (cached, with an ETag)."""
+    async def produce():
+        reply = await data_plane(request).ListCollections(grpc_pb2.CollectionsRequest())
+        return {"collections": [{"name": c.name, "count": c.count} for c in reply.collections]}
+    return await cached_json(request, ("collections",), ["collections"], produce)
+
+
+@app.get("/collections/{collection}/count", tags=["records"])
+async def count_records(
+    request: Request,
+    collection: str,
+    filter: List[str] = Query([], description="Equality filter as field:value (repeatable)"),
+):
+    """Exact number of matching records (cached, with an ETag)."""
+    query = _query_request(collection, None, filter, None, 0)
+    async def produce():
+        reply = await data_plane(request).CountRecords(
+            grpc_pb2.CountRequest(collection=collection, filters=query.filters))
+        return {"collection": collection, "count": reply.count}
+    key = ("count", collection, tuple(sorted(query.filters.items())))
+    return await cached_json(request, key, ["collection:" + collection], produce)
+
+
+@app.get("/metrics", tags=["root"])
+async def metrics():
+    """Prometheus metrics (see instrumentation.py)."""
+    body, content_type = instrumentation.render()
+    return Response(body, headers={"Content-Type": content_type})
+
+
+@app.api_route("/debug/profile", methods=["GET"], tags=["root"])
+@app.api_route("/debug/profile/{action}", methods=["GET", "POST"], tags=["root"])
+async def debug_profile(request: Request, action: str = ""):
+    """Sampling profiler of this worker; see instrumentation.profile_request."""
+    status, body = instrumentation.profile_request(
+        request.method, action, dict(request.query_params),
+        request.headers.get(instrumentation.PROFILER_TOKEN_HEADER))
+    return PlainTextResponse(body, status_code=status)
+
+
+@app.get("/metrics/cache", tags=["root"])
+async def cache_metrics():
+    """Response cache counters of this worker process."""
+    return cache.stats()
+
+
+@app.get("/collections/{collection}/records", tags=["records"])
+async def list_records(
+    request: Request,
+    collection: str,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    filter: List[str] = Query([], description="Equality filter as field:value (repeatable)"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+):
+    """One page of records, streamed from the gRPC QueryRecords call as it
+    arrives: ``{"records": [...], "next_cursor": ...}``. ``next_cursor`` is
+    null on the last page."""
+    call = data_plane(request).QueryRecords(_query_request(collection, fields, filter, cursor, limit))
+    first = await _first(call)
+
+    async def body():
+        count = 0
+        last = None
+        yield '{"records":['
+        if first is not None:
+            yield json.dumps(_record_dict(first))
+            count, last = 1, first.cursor
+            async for record in _rest(call):
+                yield "," + json.dumps(_record_dict(record))
+                count += 1
+                last = record.cursor
+        next_cursor = last if count == limit else None
+        yield '],"next_cursor":' + json.dumps(next_cursor) + "}"
+
+    return StreamingResponse(body(), media_type="application/json")
+
+
+@app.get("/collections/{collection}/records.ndjson", tags=["records"])
+async def export_records(
+    request: Request,
+    collection: str,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    filter: List[str] = Query([], description="Equality filter as field:value (repeatable)"),
+    cursor: Optional[str] = Query(None, description="Start after this record"),
+):
+    """Every matching record, one JSON object per line. Pages of
+    QueryRecords are fetched one after another, so the response starts
+    straight away and neither side holds the whole result in memory."""
+    query = _query_request(collection, fields, filter, cursor, MAX_PAGE_SIZE)
+    call = data_plane(request).QueryRecords(query)
+    first = await _first(call)
+
+    async def body():
+        if first is None:
+            return
+        yield json.dumps(_record_dict(first)) + "\n"
+        instrumentation.add_rows("export", 1)
+        query.cursor = first.cursor
+        page = _rest(call)
+        while True:
+            count = 0
+            async for record in page:
+                yield json.dumps(_record_dict(record)) + "\n"
+                query.cursor = record.cursor
+                count += 1
+            instrumentation.add_rows("export", count)
+            if count == 0:
+                return
+            page = data_plane(request).QueryRecords(query)
+
+    return StreamingResponse(body(), media_type=NDJSON)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("app:app", host="0.0.0.0", port=8080, workers=int(os.environ.get("UVICORN_WORKERS", 1)))
@@ -0,0 +1,135 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheEntry:
+    __slots__ = ("body", "etag", "tags", "expires")
+
+    def __init__(self, body, tags, expires):
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        self.tags = frozenset(tags)
+        self.expires = expires
+
+
+class ResponseCache:
+    """In-process LRU of serialized responses, each kept for at most ``ttl``
+    seconds and labelled with tags (e.g. ``collection:big``) so everything
+    derived from a collection can be dropped when it changes.
+
+    Concurrent misses for the same key share a single computation, so a burst
+    of dashboard polls costs one call to the gRPC server.
+    """
+
+    def __init__(self, max_entries=1024, ttl=10.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        # key -> (task, tags, generation of each tag when the task started)
+        self._inflight = {}
+        # Bumped by invalidate(); a body built across a bump isn't cached
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body, tags=()):
+        entry = CacheEntry(body, tags, time.monotonic() + self.ttl)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    async def get_or_create(self, key, tags, produce):
+        """Cached entry for ``key``, or the one built from ``await produce()``
+        (which returns the body as bytes).
+
+        If any of ``tags`` is invalidated while ``produce()`` runs, its body
+        may predate the change: it is returned to the requests waiting for it
+        but not cached, and later misses start a new ``produce()``.
+        """
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+        with self._lock:
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                generations = {tag: self._generations.get(tag, 0) for tag in tags}
+                task = asyncio.ensure_future(produce())
+                inflight = self._inflight[key] = (task, frozenset(tags), generations)
+                task.add_done_callback(lambda _: self._forget(key, task))
+        task, _, generations = inflight
+        body = await asyncio.shield(task)
+        with self._lock:
+            current = all(self._generations.get(tag, 0) == n for tag, n in generations.items())
+        if not current:
+            return CacheEntry(body, tags, 0.0)
+        return self.put(key, body, tags)
+
+    def _forget(self, key, task):
+        with self._lock:
+            inflight = self._inflight.get(key)
+            if inflight is not None and inflight[0] is task:
+                del self._inflight[key]
+
+    def invalidate(self, *tags):
+        """Drop every entry labelled with any of ``tags``, and keep bodies
+        being built for them right now out of the cache."""
+        tags = set(tags)
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+            stale = [key for key, entry in self._entries.items() if entry.tags & tags]
+            for key in stale:
+                del self._entries[key]
+            for key in [key for key, (_, t, _) in self._inflight.items() if t & tags]:
+                del self._inflight[key]
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "not_modified": self.not_modified,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+def etag_matches(if_none_match, etag):
+    """True if an If-None-Match header value covers ``etag`` (weak
+    comparison, as RFC 9110 asks for If-None-Match)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return any(t.removeprefix("W/") == etag for t in tags)
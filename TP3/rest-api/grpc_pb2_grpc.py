@@ -0,0 +1,395 @@
+# Generated by the gRPC Python protocol compiler plugin. DO NOT EDIT!
+"""Client and server classes corresponding to protobuf-defined services."""
+import grpc
+import warnings
+
+import grpc_pb2 as grpc__pb2
+
+GRPC_GENERATED_VERSION = '1.84.0'
+GRPC_VERSION = grpc.__version__
+_version_not_supported = False
+
+try:
+    from grpc._utilities import first_version_is_lower
+    _version_not_supported = first_version_is_lower(GRPC_VERSION, GRPC_GENERATED_VERSION)
+except ImportError:
+    _version_not_supported = True
+
+if _version_not_supported:
+    raise RuntimeError(
+        f'The grpc package installed is at version {GRPC_VERSION},'
+        + ' but the generated code in grpc_pb2_grpc.py depends on'
+        + f' grpcio>={GRPC_GENERATED_VERSION}.'
+        + f' Please upgrade your grpc module to grpcio>={GRPC_GENERATED_VERSION}'
+        + f' or downgrade your generated code using grpcio-tools<={GRPC_VERSION}.'
+    )
+
+
+class GreeterStub:
+    """Missing associated documentation comment in .proto file."""
+
+    def __init__(self, channel):
+        """Constructor.
+
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.SayHello = channel.unary_unary(
+                '/rpc.Greeter/SayHello',
+                request_serializer=grpc__pb2.HelloRequest.SerializeToString,
+                response_deserializer=grpc__pb2.HelloReply.FromString,
+                _registered_method=True)
+
+
+class GreeterServicer:
+    """Missing associated documentation comment in .proto file."""
+
+    def SayHello(self, request, context):
+        """Sends a greeting
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+
+def add_GreeterServicer_to_server(servicer, server):
+    rpc_method_handlers = {
+            'SayHello': grpc.unary_unary_rpc_method_handler(
+                    servicer.SayHello,
+                    request_deserializer=grpc__pb2.HelloRequest.FromString,
+                    response_serializer=grpc__pb2.HelloReply.SerializeToString,
+            ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+            'rpc.Greeter', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+    server.add_registered_method_handlers('rpc.Greeter', rpc_method_handlers)
+
+
+ # This class is part of an EXPERIMENTAL API.
+class Greeter:
+    """Missing associated documentation comment in .proto file."""
+
+    @staticmethod
+    def SayHello(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/rpc.Greeter/SayHello',
+            grpc__pb2.HelloRequest.SerializeToString,
+            grpc__pb2.HelloReply.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+
+class DataPlaneStub:
+    """Data plane: CSV upload, conversion and ingestion into MongoDB
+    """
+
+    def __init__(self, channel):
+        """Constructor.
+
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.UploadCsv = channel.stream_unary(
+                '/rpc.DataPlane/UploadCsv',
+                request_serializer=grpc__pb2.CsvChunk.SerializeToString,
+                response_deserializer=grpc__pb2.UploadReply.FromString,
+                _registered_method=True)
+        self.ConvertAndIngest = channel.unary_stream(
+                '/rpc.DataPlane/ConvertAndIngest',
+                request_serializer=grpc__pb2.IngestRequest.SerializeToString,
+                response_deserializer=grpc__pb2.IngestProgress.FromString,
+                _registered_method=True)
+        self.QueryRecords = channel.unary_stream(
+                '/rpc.DataPlane/QueryRecords',
+                request_serializer=grpc__pb2.QueryRequest.SerializeToString,
+                response_deserializer=grpc__pb2.Record.FromString,
+                _registered_method=True)
+        self.ValidateXml = channel.unary_unary(
+                '/rpc.DataPlane/ValidateXml',
+                request_serializer=grpc__pb2.ValidateRequest.SerializeToString,
+                response_deserializer=grpc__pb2.ValidateReply.FromString,
+                _registered_method=True)
+        self.ListCollections = channel.unary_unary(
+                '/rpc.DataPlane/ListCollections',
+                request_serializer=grpc__pb2.CollectionsRequest.SerializeToString,
+                response_deserializer=grpc__pb2.CollectionsReply.FromString,
+                _registered_method=True)
+        self.CountRecords = channel.unary_unary(
+                '/rpc.DataPlane/CountRecords',
+                request_serializer=grpc__pb2.CountRequest.SerializeToString,
+                response_deserializer=grpc__pb2.CountReply.FromString,
+                _registered_method=True)
+
+
+class DataPlaneServicer:
+    """Data plane: CSV upload, conversion and ingestion into MongoDB
+    """
+
+    def UploadCsv(self, request_iterator, context):
+        """Uploads a CSV in chunks; the first chunk must carry the file name
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ConvertAndIngest(self, request, context):
+        """Converts a CSV from the shared folder to XML and loads its records into
+        MongoDB, streaming progress events until done
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def QueryRecords(self, request, context):
+        """Streams one page of a collection's records, in _id order
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ValidateXml(self, request, context):
+        """Validates an XML from the shared folder against an XSD
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ListCollections(self, request, context):
+        """Collections in the database with their (estimated) record counts
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def CountRecords(self, request, context):
+        """Exact number of records matching the filters
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+
+def add_DataPlaneServicer_to_server(servicer, server):
+    rpc_method_handlers = {
+            'UploadCsv': grpc.stream_unary_rpc_method_handler(
+                    servicer.UploadCsv,
+                    request_deserializer=grpc__pb2.CsvChunk.FromString,
+                    response_serializer=grpc__pb2.UploadReply.SerializeToString,
+            ),
+            'ConvertAndIngest': grpc.unary_stream_rpc_method_handler(
+                    servicer.ConvertAndIngest,
+                    request_deserializer=grpc__pb2.IngestRequest.FromString,
+                    response_serializer=grpc__pb2.IngestProgress.SerializeToString,
+            ),
+            'QueryRecords': grpc.unary_stream_rpc_method_handler(
+                    servicer.QueryRecords,
+                    request_deserializer=grpc__pb2.QueryRequest.FromString,
+                    response_serializer=grpc__pb2.Record.SerializeToString,
+            ),
+            'ValidateXml': grpc.unary_unary_rpc_method_handler(
+                    servicer.ValidateXml,
+                    request_deserializer=grpc__pb2.ValidateRequest.FromString,
+                    response_serializer=grpc__pb2.ValidateReply.SerializeToString,
+            ),
+            'ListCollections': grpc.unary_unary_rpc_method_handler(
+                    servicer.ListCollections,
+                    request_deserializer=grpc__pb2.CollectionsRequest.FromString,
+                    response_serializer=grpc__pb2.CollectionsReply.SerializeToString,
+            ),
+            'CountRecords': grpc.unary_unary_rpc_method_handler(
+                    servicer.CountRecords,
+                    request_deserializer=grpc__pb2.CountRequest.FromString,
+                    response_serializer=grpc__pb2.CountReply.SerializeToString,
+            ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+            'rpc.DataPlane', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+    server.add_registered_method_handlers('rpc.DataPlane', rpc_method_handlers)
+
+
+ # This class is part of an EXPERIMENTAL API.
+class DataPlane:
+    """Data plane: CSV upload, conversion and ingestion into MongoDB
+    """
+
+    @staticmethod
+    def UploadCsv(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/rpc.DataPlane/UploadCsv',
+            grpc__pb2.CsvChunk.SerializeToString,
+            grpc__pb2.UploadReply.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ConvertAndIngest(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/rpc.DataPlane/ConvertAndIngest',
+            grpc__pb2.IngestRequest.SerializeToString,
+            grpc__pb2.IngestProgress.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def QueryRecords(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/rpc.DataPlane/QueryRecords',
+            grpc__pb2.QueryRequest.SerializeToString,
+            grpc__pb2.Record.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ValidateXml(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/rpc.DataPlane/ValidateXml',
+            grpc__pb2.ValidateRequest.SerializeToString,
+            grpc__pb2.ValidateReply.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ListCollections(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/rpc.DataPlane/ListCollections',
+            grpc__pb2.CollectionsRequest.SerializeToString,
+            grpc__pb2.CollectionsReply.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def CountRecords(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/rpc.DataPlane/CountRecords',
+            grpc__pb2.CountRequest.SerializeToString,
+            grpc__pb2.CountReply.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The gateway's modules are imported by name, as in the container (WORKDIR /app)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
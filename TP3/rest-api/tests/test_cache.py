@@ -0,0 +1,148 @@
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+import app
+from cache import ResponseCache, etag_matches
+
+
+def _request(if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+@pytest.fixture
+def fresh_cache(monkeypatch):
+    cache = ResponseCache(ttl=60)
+    monkeypatch.setattr(app, "cache", cache)
+    return cache
+
+
+def test_etag_round_trip_gives_304(fresh_cache):
+    calls = []
+
+    async def produce():
+        calls.append(1)
+        return {"count": 3}
+
+    async def run():
+        first = await app.cached_json(_request(), ("count", "c"), ["collection:c"], produce)
+        etag = first.headers["etag"]
+        again = await app.cached_json(_request(etag), ("count", "c"), ["collection:c"], produce)
+        other = await app.cached_json(_request('"other"'), ("count", "c"), ["collection:c"], produce)
+        return first, again, other
+
+    first, again, other = asyncio.run(run())
+    assert first.status_code == 200 and first.body == b'{"count":3}'
+    assert again.status_code == 304 and again.body == b""
+    assert other.status_code == 200
+    assert calls == [1]
+    assert fresh_cache.not_modified == 1 and fresh_cache.hits == 2
+
+
+def test_etag_matches_weak_and_lists():
+    assert etag_matches('W/"a", "b"', '"a"')
+    assert etag_matches("*", '"a"')
+    assert not etag_matches('"b"', '"a"')
+    assert not etag_matches(None, '"a"')
+
+
+def test_invalidate_changes_etag():
+    cache = ResponseCache(ttl=60)
+
+    async def run():
+        body = [b"old"]
+
+        async def produce():
+            return body[0]
+        first = await cache.get_or_create("k", ["collection:c"], produce)
+        body[0] = b"new"
+        assert cache.invalidate("collection:c") == 1
+        second = await cache.get_or_create("k", ["collection:c"], produce)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert second.body == b"new" and second.etag != first.etag
+
+
+def test_invalidate_during_inflight_produce_is_not_cached():
+    cache = ResponseCache(ttl=60)
+    calls = []
+
+    async def run():
+        started, release = asyncio.Event(), asyncio.Event()
+
+        async def slow_produce():
+            calls.append("slow")
+            started.set()
+            await release.wait()
+            return b"before ingest"
+
+        async def produce():
+            calls.append("fresh")
+            return b"after ingest"
+
+        waiting = asyncio.ensure_future(cache.get_or_create("k", ["collection:c"], slow_produce))
+        await started.wait()
+        # An ingest finishes while the first miss is still reading
+        cache.invalidate("collection:c")
+        during = await asyncio.wait_for(cache.get_or_create("k", ["collection:c"], produce), 5)
+        release.set()
+        stale = await waiting
+        after = await cache.get_or_create("k", ["collection:c"], produce)
+        return stale, during, after
+
+    stale, during, after = asyncio.run(run())
+    assert stale.body == b"before ingest"
+    assert during.body == after.body == b"after ingest"
+    assert calls == ["slow", "fresh"]
+    assert cache.stats()["entries"] == 1
+
+
+def test_concurrent_misses_share_one_produce():
+    cache = ResponseCache(ttl=60)
+    calls = []
+
+    async def run():
+        async def produce():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return b"x"
+        return await asyncio.gather(*(cache.get_or_create("k", ["t"], produce) for _ in range(5)))
+
+    entries = asyncio.run(run())
+    assert calls == [1]
+    assert {e.body for e in entries} == {b"x"}
+
+
+class _BrokenIngest:
+    """ConvertAndIngest call that sends one progress event and then fails."""
+
+    def __init__(self):
+        self.events = [app.grpc_pb2.IngestProgress(stage=app.grpc_pb2.IngestProgress.RUNNING, rows_written=10)]
+
+    async def read(self):
+        if self.events:
+            return self.events.pop(0)
+        raise app.grpc.aio.AioRpcError(app.grpc.StatusCode.UNAVAILABLE, None, None, "connection reset")
+
+
+def test_stream_that_fails_midway_still_invalidates(fresh_cache):
+    fresh_cache.put(("count", "c"), b'{"count":0}', ["collection:c"])
+    request = _request()
+    request.scope["app"] = type("App", (), {"state": type("State", (), {})()})()
+    request.app.state.data_plane = type("Stub", (), {"ConvertAndIngest": lambda self, r: _BrokenIngest()})()
+
+    async def run():
+        response = await app._run_ingest(request, app.grpc_pb2.IngestRequest(filename="c.csv"), True,
+                                         ["collection:c"])
+        lines = []
+        with pytest.raises(app.grpc.RpcError):
+            async for line in response.body_iterator:
+                lines.append(line)
+        return lines
+
+    lines = asyncio.run(run())
+    assert len(lines) == 1
+    assert fresh_cache.get(("count", "c")) is None